@@ -0,0 +1,95 @@
+"""Archive tier for completed tasks.
+
+Tasks completed more than `TASK_ARCHIVE_AFTER_DAYS` ago are flagged
+`archived` by `archive_completed_tasks` (a periodic Celery task). Archived
+tasks drop out of everything that lists a board — project payloads, column
+task ids, ranks — which all filter on `archived=False` and are served by the
+partial `(column, rank)` index, so long-running projects keep small boards.
+They stay in the table, searchable through `/tasks/archived/`, and `restore`
+puts one back at the end of its column.
+"""
+from datetime import timedelta
+from django.conf import settings
+from django.db import transaction
+from django.utils import timezone
+from .models import Column, Project, Task
+from . import changes, ranking
+
+try:
+    from celery import shared_task
+    _have_celery = True
+except Exception:
+    shared_task = None
+    _have_celery = False
+
+
+def archive(tasks, actor=None, now=None) -> int:
+    """Archive `tasks` (instances with `project` loaded); returns how many were archived.
+
+    Call inside `transaction.atomic()`.
+    """
+    now = now or timezone.now()
+    tasks = [task for task in tasks if not task.archived]
+    if not tasks:
+        return 0
+    Task.objects.filter(id__in=[task.id for task in tasks]).update(archived=True, archived_at=now, updated_at=now)
+    changes.record_many([("task", task.id, "archive", task.project, None) for task in tasks], actor=actor)
+    for task in tasks:
+        task.archived, task.archived_at = True, now
+    return len(tasks)
+
+
+def archive_completed(now=None, batch_size=500) -> int:
+    """Archive every task completed more than `TASK_ARCHIVE_AFTER_DAYS` ago.
+
+    Works in batches, one transaction each, so a large backlog never holds
+    locks for long. Returns the number of tasks archived.
+    """
+    days = getattr(settings, 'TASK_ARCHIVE_AFTER_DAYS', 30)
+    if days <= 0:
+        return 0
+    now = now or timezone.now()
+    due = Task.objects.filter(completed=True, archived=False, completed_at__lt=now - timedelta(days=days))
+    total = 0
+    while True:
+        with transaction.atomic():
+            batch = list(due.select_for_update().only("id", "project_id", "archived")[:batch_size])
+            if not batch:
+                return total
+            projects = Project.objects.in_bulk({task.project_id for task in batch})
+            for task in batch:
+                task.project = projects[task.project_id]
+            total += archive(batch, now=now)
+
+
+def restore(task, actor=None, now=None) -> Task:
+    """Put an archived task back at the end of its column (or the project's first one).
+
+    A completed task's `completed_at` is re-stamped, so the periodic archive
+    job gives it a fresh `TASK_ARCHIVE_AFTER_DAYS` instead of archiving it
+    again on its next run. Call inside `transaction.atomic()`.
+    """
+    column = task.column
+    if column is None:
+        column = Column.objects.filter(project_id=task.project_id).order_by("order", "id").first()
+    if column is not None:
+        column = Column.objects.select_for_update().get(id=column.id)
+    task.archived = False
+    task.archived_at = None
+    task.column = column
+    task.rank = ranking.rank_at(column, None) if column else ""
+    task.position_version += 1
+    if task.completed:
+        task.completed_at = now or timezone.now()
+    task.save(update_fields=["archived", "archived_at", "completed_at", "column", "rank", "position_version", "updated_at"])
+    changes.record("task", task.id, "restore", project=task.project, actor=actor, data={
+        "columnId": str(column.id) if column else None,
+    })
+    return task
+
+
+if _have_celery:
+    @shared_task
+    def archive_completed_tasks():
+        """Periodic Celery task (see CELERY_BEAT_SCHEDULE) wrapping `archive_completed`."""
+        return archive_completed()
@@ -0,0 +1,51 @@
+"""Windowed board loading: each column's first tasks plus its total count.
+
+A project's full payload holds every task of every column. Boards only show
+the top of each column, so `column_windows` reads just the first `limit`
+tasks per column (a ROW_NUMBER() window over the `(column, rank)` index)
+and one count per column; the rest of a column is fetched page by page with
+`column_page`. Either costs a fixed number of queries however many tasks a
+column holds.
+"""
+from django.db.models import Count, F, Window
+from django.db.models.functions import RowNumber
+from .models import Task
+from . import pagination
+
+ORDERING = ("rank", "id")
+
+
+def column_windows(column_ids, limit):
+    """`{column_id: (tasks, task_count, next_cursor)}` for the first `limit` tasks of each column.
+
+    Tasks come back without their related rows; run `prefetch_related_objects`
+    over all of them once before serializing.
+    """
+    column_ids = list(column_ids)
+    counts = dict(
+        Task.objects.filter(column_id__in=column_ids, archived=False)
+        .values("column_id").annotate(n=Count("id")).values_list("column_id", "n")
+    )
+    rows = (
+        Task.objects.filter(column_id__in=column_ids, archived=False)
+        .annotate(row=Window(RowNumber(), partition_by=F("column_id"), order_by=[F("rank").asc(), F("id").asc()]))
+        .filter(row__lte=limit)
+        .order_by("column_id", *ORDERING)
+    )
+    windows = {column_id: [] for column_id in column_ids}
+    for task in rows:
+        windows[task.column_id].append(task)
+    result = {}
+    for column_id, tasks in windows.items():
+        count = counts.get(column_id, 0)
+        next_cursor = pagination.encode_cursor(tasks[-1], ORDERING) if count > len(tasks) else None
+        result[column_id] = (tasks, count, next_cursor)
+    return result
+
+
+def column_page(column, cursor=None, limit=pagination.DEFAULT_LIMIT):
+    """`(tasks, next_cursor)`: the column's tasks after `cursor` in board order.
+
+    Raises pagination.InvalidCursor for a malformed cursor.
+    """
+    return pagination.keyset_page(Task.objects.filter(column=column, archived=False), ORDERING, cursor, limit)
@@ -0,0 +1,121 @@
+"""Server-side change log.
+
+Every mutation to boards, chat, DMs and user-owned data appends `ChangeEvent`
+rows through `record`, inside the same transaction as the mutation itself.
+Delta sync, real-time fan-out (`api.realtime`) and cache invalidation read from
+the log instead of rebuilding full snapshots. `compact_change_events` trims it in the
+background.
+"""
+from datetime import timedelta
+from django.conf import settings
+from django.db.models import Max
+from django.utils import timezone
+from .models import ChangeEvent
+from . import project_cache, realtime, sync
+
+try:
+    from celery import shared_task
+    _have_celery = True
+except Exception:
+    shared_task = None
+    _have_celery = False
+
+
+def record(entity: str, entity_id, op: str, project=None, team_id=None, user_ids=(), actor=None, data: dict = None):
+    """Append change events for one mutation and mark its scope as changed.
+
+    Pass `project` (a Project instance) for board/chat changes, `team_id` for
+    team-level changes, and `user_ids` for changes only specific users may see;
+    the latter produce one row per user. Call this inside the mutation's
+    `transaction.atomic()` block so the event commits or rolls back with it.
+    """
+    project_id = project.id if project is not None else None
+    if project is not None and team_id is None:
+        team_id = project.team_id
+    actor_id = actor.id if actor is not None else None
+    data = data or {}
+
+    rows = []
+    if project_id or team_id:
+        rows.append(ChangeEvent(
+            entity=entity, entity_id=entity_id, op=op,
+            team_id=team_id, project_id=project_id, actor_id=actor_id, data=data,
+        ))
+    for uid in dict.fromkeys(user_ids):
+        rows.append(ChangeEvent(
+            entity=entity, entity_id=entity_id, op=op,
+            user_id=uid, actor_id=actor_id, data=data,
+        ))
+    ChangeEvent.objects.bulk_create(rows)
+    realtime.publish_on_commit(rows)
+
+    if project_id:
+        sync.touch_project(project_id)
+        project_cache.invalidate(project_id)
+    elif team_id:
+        sync.touch_team(team_id)
+    sync.touch_users(user_ids)
+    return rows
+
+
+def record_many(entries, actor=None, user_ids=()):
+    """Record several mutations at once (e.g. `/tasks/batch/`, reorders).
+
+    `entries` are `(entity, entity_id, op, project, data)` tuples. Entries
+    without a project are user-scoped and get one row per `user_ids`, as in
+    `record`; a sixth element gives an entry its own user ids instead. All
+    rows go in with one insert, and each affected project is touched and
+    invalidated once instead of once per mutation.
+    """
+    actor_id = actor.id if actor is not None else None
+    rows = []
+    for entity, entity_id, op, project, data, *entry_user_ids in entries:
+        if project is not None:
+            rows.append(ChangeEvent(
+                entity=entity, entity_id=entity_id, op=op,
+                team_id=project.team_id, project_id=project.id, actor_id=actor_id, data=data or {},
+            ))
+            continue
+        for uid in dict.fromkeys(entry_user_ids[0] if entry_user_ids else user_ids):
+            rows.append(ChangeEvent(
+                entity=entity, entity_id=entity_id, op=op,
+                user_id=uid, actor_id=actor_id, data=data or {},
+            ))
+    ChangeEvent.objects.bulk_create(rows)
+    realtime.publish_on_commit(rows)
+    for project_id in dict.fromkeys(row.project_id for row in rows if row.project_id):
+        sync.touch_project(project_id)
+        project_cache.invalidate(project_id)
+    sync.touch_users(row.user_id for row in rows if row.user_id)
+    return rows
+
+
+def compact(now=None):
+    """Trim the change log.
+
+    Events older than `CHANGE_EVENT_RETENTION_DAYS` are dropped entirely.
+    Events older than `CHANGE_EVENT_COMPACT_AFTER_HOURS` are collapsed to the
+    latest event per entity and scope, which is all a catching-up reader needs.
+    Returns the number of rows deleted.
+    """
+    now = now or timezone.now()
+    retention = timedelta(days=getattr(settings, 'CHANGE_EVENT_RETENTION_DAYS', 7))
+    compact_after = timedelta(hours=getattr(settings, 'CHANGE_EVENT_COMPACT_AFTER_HOURS', 1))
+
+    expired, _ = ChangeEvent.objects.filter(created_at__lt=now - retention).delete()
+
+    window = ChangeEvent.objects.filter(created_at__lt=now - compact_after)
+    latest_ids = (
+        window.values("entity", "entity_id", "team_id", "project_id", "user_id")
+        .annotate(latest=Max("id"))
+        .values("latest")
+    )
+    superseded, _ = window.exclude(id__in=latest_ids).delete()
+    return expired + superseded
+
+
+if _have_celery:
+    @shared_task
+    def compact_change_events():
+        """Periodic Celery task (see CELERY_BEAT_SCHEDULE) wrapping `compact`."""
+        return compact()
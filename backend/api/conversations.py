@@ -0,0 +1,83 @@
+"""Direct-message conversation index.
+
+Every DM thread has one `Conversation` row per participant holding the last
+message and that participant's unread count. The helpers below keep those rows
+current as messages are sent, deleted and read; call them inside the same
+`transaction.atomic()` block as the message write.
+"""
+from django.db.models import F, Q
+from django.utils import timezone
+from .models import Conversation, DirectMessage
+
+
+def messages_between(user_id, partner_id):
+    """All messages exchanged between two users, in either direction."""
+    return DirectMessage.objects.filter(
+        Q(sender_id=user_id, receiver_id=partner_id) | Q(sender_id=partner_id, receiver_id=user_id)
+    )
+
+
+def _sides(message):
+    """`(user_id, partner_id, unread_increment)` for each participant's row."""
+    if message.sender_id == message.receiver_id:
+        return [(message.sender_id, message.receiver_id, 0)]
+    return [
+        (message.sender_id, message.receiver_id, 0),
+        (message.receiver_id, message.sender_id, 1),
+    ]
+
+
+def record_message(message):
+    """Update both participants' rows for a newly created message."""
+    now = timezone.now()
+    sides = _sides(message)
+    # the first message creates the rows; two concurrent first messages both
+    # insert, so let the loser's insert do nothing instead of raising
+    # IntegrityError inside the caller's transaction
+    Conversation.objects.bulk_create(
+        [Conversation(user_id=user_id, partner_id=partner_id) for user_id, partner_id, _ in sides],
+        ignore_conflicts=True,
+    )
+    for user_id, partner_id, unread in sides:
+        rows = Conversation.objects.filter(user_id=user_id, partner_id=partner_id)
+        rows.update(unread_count=F("unread_count") + unread, updated_at=now)
+        # concurrent sends may commit out of order; never move last_message backwards
+        rows.filter(Q(last_message_at__isnull=True) | Q(last_message_at__lte=message.timestamp)).update(
+            last_message=message, last_message_at=message.timestamp, updated_at=now,
+        )
+
+
+def forget_message(message):
+    """Update both participants' rows after `message` was deleted."""
+    now = timezone.now()
+    latest = (
+        messages_between(message.sender_id, message.receiver_id)
+        .exclude(id=message.id).order_by("-timestamp", "-id").first()
+    )
+    for user_id, partner_id, unread in _sides(message):
+        conversation = Conversation.objects.filter(user_id=user_id, partner_id=partner_id).first()
+        if conversation is None:
+            continue
+        updates = {
+            "last_message": latest,
+            "last_message_at": latest.timestamp if latest else None,
+            "updated_at": now,
+        }
+        if unread and conversation.unread_count and (
+            conversation.last_read_at is None or message.timestamp > conversation.last_read_at
+        ):
+            updates["unread_count"] = F("unread_count") - 1
+        Conversation.objects.filter(id=conversation.id).update(**updates)
+
+
+def message_updated(message):
+    """Mark conversations showing `message` as their last message as changed."""
+    Conversation.objects.filter(last_message=message).update(updated_at=timezone.now())
+
+
+def mark_read(user, partner_id):
+    """Reset the user's unread count for a conversation; returns the number of rows updated."""
+    now = timezone.now()
+    return Conversation.objects.filter(user=user, partner_id=partner_id).update(
+        unread_count=0, last_read_at=now, updated_at=now,
+    )
@@ -0,0 +1,77 @@
+"""Periodic email digests.
+
+With `NOTIFICATION_EMAIL_DIGEST` on, notifications are not emailed one by
+one (see `api.notifications._deliver_many_sync`). `send_email_digests` runs
+every `NOTIFICATION_EMAIL_DIGEST_HOURS` instead and sends each user one email
+listing the notifications they received since the previous digest and have
+not read yet. Progress is kept in a `HighWaterMark` that only advances once
+a period's emails are all sent, so a restarted worker picks up after the
+last period it finished.
+"""
+from datetime import timedelta
+from django.conf import settings
+from django.utils import timezone
+from django.utils.html import format_html, format_html_join
+from .models import HighWaterMark, Notification
+from . import notifications
+
+try:
+    from celery import shared_task
+    _have_celery = True
+except Exception:
+    shared_task = None
+    _have_celery = False
+
+MARK = "email_digest"
+# items listed in one digest email; the summary line still counts all of them
+MAX_ITEMS = 20
+
+
+def _email(rows):
+    """Email one user the digest of `rows`."""
+    summary = notifications.digest(rows)
+    title, body = notifications._format_title_body(summary)
+    items = format_html_join(
+        "", "<li>{}</li>", ((notifications._format_title_body(n)[1],) for n in rows[:MAX_ITEMS])
+    )
+    notifications._deliver_email_sms(summary, title, format_html("<p>{}</p><ul>{}</ul>", body, items), ['email'])
+
+
+def send_email_digests(now=None) -> int:
+    """Email every user their unread notifications since the last digest; returns emails sent.
+
+    The mark only moves to `now` once every email of the period has been
+    handed to the provider, so a run that dies half way is repeated in full
+    (some users may get that digest twice) rather than lost.
+    """
+    if not getattr(settings, 'NOTIFICATION_EMAIL_DIGEST', False):
+        return 0
+    now = now or timezone.now()
+    hours = getattr(settings, 'NOTIFICATION_EMAIL_DIGEST_HOURS', 24)
+    mark, _ = HighWaterMark.objects.get_or_create(name=MARK, defaults={"value": now - timedelta(hours=hours)})
+    since = mark.value
+
+    sent = 0
+    rows = []
+    unread = (
+        Notification.objects.filter(created_at__gt=since, created_at__lte=now, read=False)
+        .select_related('user', 'actor').order_by('user_id', 'created_at')
+    )
+    for n in unread.iterator(chunk_size=500):
+        if rows and rows[0].user_id != n.user_id:
+            _email(rows)
+            sent, rows = sent + 1, []
+        rows.append(n)
+    if rows:
+        _email(rows)
+        sent += 1
+
+    HighWaterMark.objects.filter(name=MARK, value=since).update(value=now, updated_at=timezone.now())
+    return sent
+
+
+if _have_celery:
+    @shared_task
+    def send_email_digests_task():
+        """Periodic Celery task (see CELERY_BEAT_SCHEDULE) wrapping `send_email_digests`."""
+        return send_email_digests()
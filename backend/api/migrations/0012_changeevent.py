@@ -0,0 +1,47 @@
+# Generated by Django 5.2.8 on 2026-10-17 03:25
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('api', '0011_sync_updated_at'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='ChangeEvent',
+            fields=[
+                ('id', models.BigAutoField(primary_key=True, serialize=False)),
+                ('entity', models.CharField(max_length=30)),
+                ('entity_id', models.UUIDField()),
+                ('op', models.CharField(choices=[('create', 'create'), ('update', 'update'), ('move', 'move'), ('delete', 'delete')], max_length=10)),
+                ('team_id', models.UUIDField(blank=True, null=True)),
+                ('project_id', models.UUIDField(blank=True, null=True)),
+                ('user_id', models.UUIDField(blank=True, null=True)),
+                ('actor_id', models.UUIDField(blank=True, null=True)),
+                ('data', models.JSONField(blank=True, default=dict)),
+                ('created_at', models.DateTimeField(auto_now_add=True)),
+            ],
+            options={
+                'ordering': ['id'],
+            },
+        ),
+        migrations.AddIndex(
+            model_name='changeevent',
+            index=models.Index(fields=['team_id', 'id'], name='api_changee_team_id_597866_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='changeevent',
+            index=models.Index(fields=['project_id', 'id'], name='api_changee_project_ff347a_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='changeevent',
+            index=models.Index(fields=['user_id', 'id'], name='api_changee_user_id_3ec3c3_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='changeevent',
+            index=models.Index(fields=['created_at'], name='api_changee_created_38ad59_idx'),
+        ),
+    ]
@@ -0,0 +1,17 @@
+# Generated by Django 5.2.8 on 2026-10-17 03:35
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('api', '0012_changeevent'),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='chatmessage',
+            index=models.Index(fields=['project', 'timestamp', 'id'], name='api_chat_project_ts_idx'),
+        ),
+    ]
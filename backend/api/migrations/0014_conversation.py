@@ -0,0 +1,71 @@
+# Generated by Django 5.2.8 on 2026-10-17 03:36
+
+import django.db.models.deletion
+import uuid
+from django.conf import settings
+from django.db import migrations, models
+
+
+def backfill_conversations(apps, schema_editor):
+    """Index existing DM history; messages sent before the index existed count as read."""
+    DirectMessage = apps.get_model('api', 'DirectMessage')
+    Conversation = apps.get_model('api', 'Conversation')
+    latest = {}
+    for message in DirectMessage.objects.order_by('timestamp', 'id').iterator():
+        latest[(message.sender_id, message.receiver_id)] = message
+        latest[(message.receiver_id, message.sender_id)] = message
+    Conversation.objects.bulk_create([
+        Conversation(
+            user_id=user_id, partner_id=partner_id, last_message=message,
+            last_message_at=message.timestamp, last_read_at=message.timestamp,
+        )
+        for (user_id, partner_id), message in latest.items()
+    ], batch_size=500)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('api', '0013_chatmessage_project_timestamp_index'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='Conversation',
+            fields=[
+                ('id', models.UUIDField(default=uuid.uuid4, editable=False, primary_key=True, serialize=False)),
+                ('last_message_at', models.DateTimeField(blank=True, null=True)),
+                ('unread_count', models.PositiveIntegerField(default=0)),
+                ('last_read_at', models.DateTimeField(blank=True, null=True)),
+                ('updated_at', models.DateTimeField(auto_now=True)),
+            ],
+        ),
+        migrations.AddIndex(
+            model_name='directmessage',
+            index=models.Index(fields=['sender', 'receiver', 'timestamp', 'id'], name='api_dm_pair_ts_idx'),
+        ),
+        migrations.AddField(
+            model_name='conversation',
+            name='last_message',
+            field=models.ForeignKey(blank=True, null=True, on_delete=django.db.models.deletion.SET_NULL, related_name='+', to='api.directmessage'),
+        ),
+        migrations.AddField(
+            model_name='conversation',
+            name='partner',
+            field=models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='+', to=settings.AUTH_USER_MODEL),
+        ),
+        migrations.AddField(
+            model_name='conversation',
+            name='user',
+            field=models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='conversations', to=settings.AUTH_USER_MODEL),
+        ),
+        migrations.AddIndex(
+            model_name='conversation',
+            index=models.Index(fields=['user', '-last_message_at', '-id'], name='api_conversation_inbox_idx'),
+        ),
+        migrations.AlterUniqueTogether(
+            name='conversation',
+            unique_together={('user', 'partner')},
+        ),
+        migrations.RunPython(backfill_conversations, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,64 @@
+# Generated by Django 5.2.8 on 2026-10-17 03:38
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+DIGITS = "0123456789abcdefghijklmnopqrstuvwxyz"
+
+
+def _even_ranks(count):
+    """`count` ascending base-36 ranks spread evenly over (0, 1), as api.ranking expects."""
+    width = 1
+    while len(DIGITS) ** width <= count:
+        width += 1
+    space = len(DIGITS) ** width
+    ranks = []
+    for i in range(1, count + 1):
+        value, digits = i * space // (count + 1), []
+        for _ in range(width):
+            value, digit = divmod(value, len(DIGITS))
+            digits.append(DIGITS[digit])
+        ranks.append("".join(reversed(digits)).rstrip("0"))
+    return ranks
+
+
+def copy_task_ids_to_ranks(apps, schema_editor):
+    Column = apps.get_model('api', 'Column')
+    Task = apps.get_model('api', 'Task')
+    for column in Column.objects.all().iterator():
+        task_ids = list(dict.fromkeys(str(tid) for tid in (column.task_ids or [])))
+        tasks = {str(t.id): t for t in Task.objects.filter(id__in=task_ids, project_id=column.project_id)}
+        ordered = [tasks[tid] for tid in task_ids if tid in tasks]
+        for task, rank in zip(ordered, _even_ranks(len(ordered))):
+            task.column_id = column.id
+            task.rank = rank
+        Task.objects.bulk_update(ordered, ['column', 'rank'], batch_size=500)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('api', '0014_conversation'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='task',
+            name='column',
+            field=models.ForeignKey(blank=True, null=True, on_delete=django.db.models.deletion.SET_NULL, related_name='tasks', to='api.column'),
+        ),
+        migrations.AddField(
+            model_name='task',
+            name='rank',
+            field=models.CharField(blank=True, default='', max_length=64),
+        ),
+        migrations.AddIndex(
+            model_name='task',
+            index=models.Index(fields=['column', 'rank'], name='api_task_column_rank_idx'),
+        ),
+        migrations.RunPython(copy_task_ids_to_ranks, migrations.RunPython.noop),
+        migrations.RemoveField(
+            model_name='column',
+            name='task_ids',
+        ),
+    ]
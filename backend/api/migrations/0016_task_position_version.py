@@ -0,0 +1,18 @@
+# Generated by Django 5.2.8 on 2026-10-17 03:41
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('api', '0015_task_column_rank'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='task',
+            name='position_version',
+            field=models.PositiveIntegerField(default=0),
+        ),
+    ]
@@ -0,0 +1,56 @@
+# Generated by Django 5.2.8 on 2026-10-17 03:46
+
+from django.db import migrations, models
+
+
+def backfill_completed_at(apps, schema_editor):
+    # the last edit is the best guess for when already-completed tasks were completed
+    Task = apps.get_model('api', 'Task')
+    Task.objects.filter(completed=True, completed_at__isnull=True).update(completed_at=models.F('updated_at'))
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('api', '0016_task_position_version'),
+    ]
+
+    operations = [
+        migrations.RemoveIndex(
+            model_name='task',
+            name='api_task_column_rank_idx',
+        ),
+        migrations.AddField(
+            model_name='task',
+            name='archived',
+            field=models.BooleanField(default=False),
+        ),
+        migrations.AddField(
+            model_name='task',
+            name='archived_at',
+            field=models.DateTimeField(blank=True, null=True),
+        ),
+        migrations.AddField(
+            model_name='task',
+            name='completed_at',
+            field=models.DateTimeField(blank=True, null=True),
+        ),
+        migrations.AlterField(
+            model_name='changeevent',
+            name='op',
+            field=models.CharField(choices=[('create', 'create'), ('update', 'update'), ('move', 'move'), ('delete', 'delete'), ('archive', 'archive'), ('restore', 'restore')], max_length=10),
+        ),
+        migrations.RunPython(backfill_completed_at, migrations.RunPython.noop),
+        migrations.AddIndex(
+            model_name='task',
+            index=models.Index(condition=models.Q(('archived', False)), fields=['column', 'rank'], name='api_task_active_rank_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='task',
+            index=models.Index(condition=models.Q(('archived', False), ('completed', True)), fields=['completed_at'], name='api_task_archivable_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='task',
+            index=models.Index(condition=models.Q(('archived', True)), fields=['project', '-archived_at', '-id'], name='api_task_archived_idx'),
+        ),
+    ]
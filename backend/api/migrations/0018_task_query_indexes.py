@@ -0,0 +1,49 @@
+# Generated by Django 5.2.8 on 2026-10-17 03:48
+
+import django.db.models.deletion
+from django.conf import settings
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('api', '0017_task_archive'),
+    ]
+
+    operations = [
+        # TaskAssignee takes over the existing auto-created join table as is
+        migrations.SeparateDatabaseAndState(
+            state_operations=[
+                migrations.CreateModel(
+                    name='TaskAssignee',
+                    fields=[
+                        ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                        ('task', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, to='api.task')),
+                        ('user', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, to=settings.AUTH_USER_MODEL)),
+                    ],
+                    options={
+                        'db_table': 'api_task_assignees',
+                        'unique_together': {('task', 'user')},
+                    },
+                ),
+                migrations.AlterField(
+                    model_name='task',
+                    name='assignees',
+                    field=models.ManyToManyField(blank=True, related_name='assigned_tasks', through='api.TaskAssignee', to=settings.AUTH_USER_MODEL),
+                ),
+            ],
+        ),
+        migrations.AddIndex(
+            model_name='task',
+            index=models.Index(condition=models.Q(('archived', False)), fields=['project', 'completed'], name='api_task_project_done_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='task',
+            index=models.Index(condition=models.Q(('archived', False)), fields=['project', 'due_date'], name='api_task_project_due_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='taskassignee',
+            index=models.Index(fields=['user', 'task'], name='api_task_assignee_user_idx'),
+        ),
+    ]
@@ -0,0 +1,73 @@
+# Generated by Django 5.2.8 on 2026-10-17 03:49
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+def copy_tags(apps, schema_editor):
+    Tag = apps.get_model('api', 'Tag')
+    Task = apps.get_model('api', 'Task')
+    TaskTag = apps.get_model('api', 'TaskTag')
+    tag_ids, counts, links = {}, {}, []
+    for task in Task.objects.only('id', 'project_id', 'tags').iterator():
+        names = (str(t).strip()[:100] for t in (task.tags or []) if t is not None)
+        names = list(dict.fromkeys(n for n in names if n))
+        if names != (task.tags or []):
+            Task.objects.filter(id=task.id).update(tags=names)
+        for name in names:
+            key = (task.project_id, name)
+            if key not in tag_ids:
+                tag_ids[key] = Tag.objects.create(project_id=task.project_id, name=name).id
+            counts[tag_ids[key]] = counts.get(tag_ids[key], 0) + 1
+            links.append(TaskTag(task_id=task.id, tag_id=tag_ids[key]))
+    TaskTag.objects.bulk_create(links, batch_size=500)
+    for tag_id, count in counts.items():
+        Tag.objects.filter(id=tag_id).update(task_count=count)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('api', '0018_task_query_indexes'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='Tag',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('name', models.CharField(max_length=100)),
+                ('task_count', models.PositiveIntegerField(default=0)),
+                ('project', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='tags', to='api.project')),
+            ],
+        ),
+        migrations.CreateModel(
+            name='TaskTag',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('tag', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='task_links', to='api.tag')),
+                ('task', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='tag_links', to='api.task')),
+            ],
+        ),
+        migrations.AddIndex(
+            model_name='tag',
+            index=models.Index(fields=['name'], name='api_tag_name_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='tag',
+            index=models.Index(fields=['project', '-task_count', 'name'], name='api_tag_usage_idx'),
+        ),
+        migrations.AlterUniqueTogether(
+            name='tag',
+            unique_together={('project', 'name')},
+        ),
+        migrations.AddIndex(
+            model_name='tasktag',
+            index=models.Index(fields=['tag', 'task'], name='api_tasktag_tag_idx'),
+        ),
+        migrations.AlterUniqueTogether(
+            name='tasktag',
+            unique_together={('task', 'tag')},
+        ),
+        migrations.RunPython(copy_tags, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,59 @@
+# Generated by Django 5.2.8 on 2026-10-17 04:33
+
+import django.db.models.deletion
+import django.utils.timezone
+from django.db import migrations, models
+
+
+def split_channels(apps, schema_editor):
+    # pending entries become one row per channel, due at once
+    NotificationOutbox = apps.get_model('api', 'NotificationOutbox')
+    for entry in list(NotificationOutbox.objects.all()):
+        channels = entry.channels or []
+        if not channels:
+            entry.delete()
+            continue
+        for channel in channels[1:]:
+            NotificationOutbox.objects.create(
+                notification_id=entry.notification_id, channel=channel, release_at=entry.created_at,
+            )
+        NotificationOutbox.objects.filter(id=entry.id).update(channel=channels[0], release_at=entry.created_at)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('api', '0023_scope_versions'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='notificationoutbox',
+            name='channel',
+            field=models.CharField(choices=[('push', 'push'), ('email', 'email'), ('sms', 'sms')], default='push', max_length=20),
+        ),
+        migrations.AddField(
+            model_name='notificationoutbox',
+            name='release_at',
+            field=models.DateTimeField(default=django.utils.timezone.now),
+        ),
+        migrations.AddField(
+            model_name='notificationoutbox',
+            name='sent',
+            field=models.BooleanField(default=False),
+        ),
+        migrations.AlterField(
+            model_name='notificationoutbox',
+            name='notification',
+            field=models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='+', to='api.notification'),
+        ),
+        migrations.RunPython(split_channels, migrations.RunPython.noop),
+        migrations.RemoveField(
+            model_name='notificationoutbox',
+            name='channels',
+        ),
+        migrations.AddIndex(
+            model_name='notificationoutbox',
+            index=models.Index(condition=models.Q(('sent', False)), fields=['release_at'], name='api_outbox_due_idx'),
+        ),
+    ]
@@ -44,6 +44,10 @@ class User(AbstractBaseUser, PermissionsMixin):
 
     is_active = models.BooleanField(default=True)
     is_staff = models.BooleanField(default=False)
+    updated_at = models.DateTimeField(auto_now=True)
+    # bumped in the same transaction as every change only this user may see
+    # (DMs, notifications, folders); part of the snapshot ETag (see api.sync)
+    version = models.PositiveBigIntegerField(default=0)
 
     objects = UserManager()
 
@@ -72,14 +76,17 @@ class Project(models.Model):
     name = models.CharField(max_length=255)
     description = models.TextField(blank=True)
     team = models.ForeignKey("Team", on_delete=models.CASCADE, related_name="projects")
+    # bumped by every write inside the project (tasks, columns, chat) so delta syncs can find it
+    updated_at = models.DateTimeField(auto_now=True)
+    # incremented by the same writes, inside their transaction; the project's ETag (see api.sync)
+    version = models.PositiveBigIntegerField(default=0)
 
 
 class Column(models.Model):
     id = models.UUIDField(primary_key=True, default=uuid.uuid4, editable=False)
     project = models.ForeignKey(Project, on_delete=models.CASCADE, related_name="columns")
     title = models.CharField(max_length=255)
-    # store ordering here as array of task UUID hex strings to match frontend:
-    task_ids = models.JSONField(default=list)  # ["uuid1", "uuid2", ...]
+    # task order is Task.rank within the column (see api.ranking)
 
     order = models.PositiveIntegerField(default=0)
 
@@ -90,22 +97,88 @@ class Task(models.Model):
     title = models.CharField(max_length=255)
     description = models.TextField(blank=True)
 
-    assignees = models.ManyToManyField(User, blank=True, related_name="assigned_tasks")
+    assignees = models.ManyToManyField(User, blank=True, related_name="assigned_tasks", through="TaskAssignee")
 
     due_date = models.DateTimeField(null=True, blank=True)
     PRIORITY_CHOICES = [("low", "low"), ("medium", "medium"), ("high", "high")]
     priority = models.CharField(max_length=10, choices=PRIORITY_CHOICES, default="medium")
 
-    tags = models.JSONField(default=list, blank=True)       # array<string>
+    # array<string> as the API shows it; indexed copy in TaskTag/Tag (see api.tags)
+    tags = models.JSONField(default=list, blank=True)
     attachments = models.ManyToManyField(Attachment, blank=True)
     comments = models.ManyToManyField(Comment, blank=True)
 
     weight = models.IntegerField(default=1)
     completed = models.BooleanField(default=False)
+    completed_at = models.DateTimeField(null=True, blank=True)
+    # archived tasks (see api.archive) leave boards and project payloads but stay searchable
+    archived = models.BooleanField(default=False)
+    archived_at = models.DateTimeField(null=True, blank=True)
+    # the due date a due-soon reminder went out for (see api.reminders)
+    reminded_due_date = models.DateTimeField(null=True, blank=True)
 
     created_at = models.DateTimeField(auto_now_add=True)
     updated_at = models.DateTimeField(auto_now=True)
 
+    # board placement: the column a task sits in and its position there (see api.ranking)
+    column = models.ForeignKey(Column, on_delete=models.SET_NULL, null=True, blank=True, related_name="tasks")
+    rank = models.CharField(max_length=64, blank=True, default="")
+    # bumped on every move; clients send it back to detect concurrent moves
+    position_version = models.PositiveIntegerField(default=0)
+
+    class Meta:
+        indexes = [
+            # board order; only active tasks are ever listed by rank
+            models.Index(fields=["column", "rank"], name="api_task_active_rank_idx", condition=models.Q(archived=False)),
+            # the archive job's scan, and the archive search
+            models.Index(fields=["completed_at"], name="api_task_archivable_idx", condition=models.Q(completed=True, archived=False)),
+            models.Index(fields=["project", "-archived_at", "-id"], name="api_task_archived_idx", condition=models.Q(archived=True)),
+            # /tasks/ filters (see api.task_query)
+            models.Index(fields=["project", "completed"], name="api_task_project_done_idx", condition=models.Q(archived=False)),
+            models.Index(fields=["project", "due_date"], name="api_task_project_due_idx", condition=models.Q(archived=False)),
+            # due-soon reminder window scans
+            models.Index(fields=["due_date"], name="api_task_open_due_idx", condition=models.Q(completed=False, archived=False)),
+        ]
+
+
+class TaskAssignee(models.Model):
+    """`Task.assignees` join table, declared to index it from the user side."""
+    task = models.ForeignKey(Task, on_delete=models.CASCADE)
+    user = models.ForeignKey(User, on_delete=models.CASCADE)
+
+    class Meta:
+        db_table = "api_task_assignees"
+        unique_together = ("task", "user")
+        indexes = [
+            # "tasks assigned to X": the /tasks/?assignee= filter
+            models.Index(fields=["user", "task"], name="api_task_assignee_user_idx"),
+        ]
+
+
+class Tag(models.Model):
+    """A tag used in a project, with the number of tasks carrying it (see api.tags)."""
+    project = models.ForeignKey(Project, on_delete=models.CASCADE, related_name="tags")
+    name = models.CharField(max_length=100)
+    task_count = models.PositiveIntegerField(default=0)
+
+    class Meta:
+        unique_together = ("project", "name")
+        indexes = [
+            models.Index(fields=["name"], name="api_tag_name_idx"),
+            models.Index(fields=["project", "-task_count", "name"], name="api_tag_usage_idx"),
+        ]
+
+
+class TaskTag(models.Model):
+    task = models.ForeignKey(Task, on_delete=models.CASCADE, related_name="tag_links")
+    tag = models.ForeignKey(Tag, on_delete=models.CASCADE, related_name="task_links")
+
+    class Meta:
+        unique_together = ("task", "tag")
+        indexes = [
+            models.Index(fields=["tag", "task"], name="api_tasktag_tag_idx"),
+        ]
+
 
 class Subtask(models.Model):
     id = models.UUIDField(primary_key=True, default=uuid.uuid4, editable=False)
@@ -126,6 +199,12 @@ class ChatMessage(models.Model):
     attachments = models.JSONField(default=list, blank=True)
     reply_to = models.ForeignKey('self', on_delete=models.SET_NULL, null=True, blank=True, related_name='replies')
 
+    class Meta:
+        indexes = [
+            # chat history pages (`/projects/<id>/chatmessages/?before=`)
+            models.Index(fields=["project", "timestamp", "id"], name="api_chat_project_ts_idx"),
+        ]
+
 
 class TeamMember(models.Model):
     id = models.UUIDField(primary_key=True, default=uuid.uuid4, editable=False)
@@ -148,6 +227,9 @@ class Team(models.Model):
 
     # convenience: project ids can be derived from Project but we keep JSON to match frontend if needed
     project_ids = models.JSONField(default=list, blank=True)
+    updated_at = models.DateTimeField(auto_now=True)
+    # incremented with every team-level change, inside its transaction (see api.sync)
+    version = models.PositiveBigIntegerField(default=0)
 
     def __str__(self):
         return self.name
@@ -161,6 +243,36 @@ class DirectMessage(models.Model):
     timestamp = models.DateTimeField(auto_now_add=True)
     attachments = models.JSONField(default=list, blank=True)  # [{"url": "...", "name": "...", "size": ...}]
     reply_to = models.ForeignKey('self', on_delete=models.SET_NULL, null=True, blank=True, related_name='replies')
+    updated_at = models.DateTimeField(auto_now=True)
+
+    class Meta:
+        indexes = [
+            # conversation pages (`/conversations/<partnerId>/messages/?before=`)
+            models.Index(fields=["sender", "receiver", "timestamp", "id"], name="api_dm_pair_ts_idx"),
+        ]
+
+
+class Conversation(models.Model):
+    """A user's side of a direct-message thread (one row per participant).
+
+    Holds the last message and the user's unread count so the inbox can be
+    listed without scanning message history; kept current by
+    `api.conversations`.
+    """
+    id = models.UUIDField(primary_key=True, default=uuid.uuid4, editable=False)
+    user = models.ForeignKey(User, on_delete=models.CASCADE, related_name="conversations")
+    partner = models.ForeignKey(User, on_delete=models.CASCADE, related_name="+")
+    last_message = models.ForeignKey(DirectMessage, on_delete=models.SET_NULL, null=True, blank=True, related_name="+")
+    last_message_at = models.DateTimeField(null=True, blank=True)
+    unread_count = models.PositiveIntegerField(default=0)
+    last_read_at = models.DateTimeField(null=True, blank=True)
+    updated_at = models.DateTimeField(auto_now=True)
+
+    class Meta:
+        unique_together = ("user", "partner")
+        indexes = [
+            models.Index(fields=["user", "-last_message_at", "-id"], name="api_conversation_inbox_idx"),
+        ]
 
 
 class PushToken(models.Model):
@@ -188,9 +300,37 @@ class Notification(models.Model):
     channel = models.CharField(max_length=20, choices=CHANNEL_CHOICES, default='push')
     read = models.BooleanField(default=False)
     created_at = models.DateTimeField(auto_now_add=True)
+    updated_at = models.DateTimeField(auto_now=True)
 
     class Meta:
         ordering = ["-created_at"]
+        indexes = [
+            # the periodic email digest's time-range scan (see api.digests)
+            models.Index(fields=["created_at"], name="api_notification_created_idx"),
+        ]
+
+
+class NotificationOutbox(models.Model):
+    """A notification waiting to be handed to one channel's delivery workers.
+
+    Written in the same transaction as the notification (see
+    `api.notifications.enqueue_many`), one row per channel, and marked `sent`
+    by the relay once its delivery task is queued, so only committed
+    notifications are delivered and a broker outage delays delivery instead
+    of losing it. Sent rows are kept until their coalescing window has passed:
+    they tell `enqueue_many` when the user last got something on the channel.
+    """
+    notification = models.ForeignKey(Notification, on_delete=models.CASCADE, related_name='+')
+    channel = models.CharField(max_length=20, choices=Notification.CHANNEL_CHOICES, default='push')
+    # when the relay may hand the entry over (later than created_at for a coalesced follow-up)
+    release_at = models.DateTimeField(default=timezone.now)
+    sent = models.BooleanField(default=False)
+    created_at = models.DateTimeField(auto_now_add=True)
+
+    class Meta:
+        indexes = [
+            models.Index(fields=["release_at"], name="api_outbox_due_idx", condition=models.Q(sent=False)),
+        ]
 
 
 class Folder(models.Model):
@@ -200,6 +340,7 @@ class Folder(models.Model):
     name = models.CharField(max_length=255)
     project_ids = models.JSONField(default=list, blank=True)  # ["project_uuid_hex", ...]
     order = models.IntegerField(default=0)  # Display order in sidebar
+    updated_at = models.DateTimeField(auto_now=True)
 
     class Meta:
         ordering = ["order", "id"]  # Order by order field, then by id for consistent sorting
@@ -207,3 +348,49 @@ class Folder(models.Model):
     def __str__(self):
         return f"{self.name} ({self.user.name})"
 
+
+class HighWaterMark(models.Model):
+    """How far a periodic job has got, so a restarted worker resumes instead of repeating work."""
+    name = models.CharField(max_length=50, unique=True)
+    value = models.DateTimeField()
+    updated_at = models.DateTimeField(auto_now=True)
+
+
+class ChangeEvent(models.Model):
+    """Append-only log of mutations to boards, chat, DMs and user-owned data.
+
+    `id` is the monotonically increasing sequence number. Each row is written in
+    the same transaction as the mutation it describes (see `api.changes.record`).
+    Team/project-scoped events carry `team_id`/`project_id`; events only specific
+    users may see (DMs, notifications, folders, deletes of whole teams) get one
+    row per user with `user_id` set. Plain UUIDs are used instead of foreign keys
+    so events outlive the rows they describe.
+    """
+    OP_CHOICES = [
+        ("create", "create"),
+        ("update", "update"),
+        ("move", "move"),
+        ("delete", "delete"),
+        ("archive", "archive"),
+        ("restore", "restore"),
+    ]
+
+    id = models.BigAutoField(primary_key=True)
+    entity = models.CharField(max_length=30)  # e.g. 'task', 'column', 'chatMessage'
+    entity_id = models.UUIDField()
+    op = models.CharField(max_length=10, choices=OP_CHOICES)
+    team_id = models.UUIDField(null=True, blank=True)
+    project_id = models.UUIDField(null=True, blank=True)
+    user_id = models.UUIDField(null=True, blank=True)
+    actor_id = models.UUIDField(null=True, blank=True)
+    data = models.JSONField(default=dict, blank=True)  # small op-specific details: {toColumnId, position, ...}
+    created_at = models.DateTimeField(auto_now_add=True)
+
+    class Meta:
+        ordering = ["id"]
+        indexes = [
+            models.Index(fields=["team_id", "id"]),
+            models.Index(fields=["project_id", "id"]),
+            models.Index(fields=["user_id", "id"]),
+            models.Index(fields=["created_at"]),
+        ]
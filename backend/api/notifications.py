@@ -5,10 +5,14 @@ to deliver them via configured providers (Firebase for push, SendGrid for email,
 Twilio for SMS). All provider usage is optional and guarded: missing
 libraries or environment variables result in safe no-ops.
 """
+from datetime import timedelta
 from typing import List, Optional
 from django.conf import settings
+from django.db import transaction
+from django.db.models import Max
 from django.utils import timezone
-from .models import Notification, PushToken, User
+from .models import Notification, NotificationOutbox, PushToken, User
+from . import changes
 import json
 import traceback
 
@@ -52,31 +56,205 @@ def enqueue_notification(user: User, actor: Optional[User], verb: str, data: dic
 
     This function is best-effort and will not raise if delivery fails.
     """
-    if data is None:
-        data = {}
+    try:
+        enqueue_many([Notification(user=user, actor=actor, verb=verb, data=data or {})], actor, channels)
+    except Exception:
+        pass
+
+
+def enqueue_many(notifications: List[Notification], actor: Optional[User] = None, channels: List[str] = None) -> List[Notification]:
+    """Save unsaved Notification rows for one event and queue their delivery.
+
+    The rows, their change events and their outbox entries
+    (`NotificationOutbox`, one per channel) go in with one insert each, in
+    the caller's transaction. Nothing touches the broker until that
+    transaction commits; then the relay (`drain_outbox`) is nudged and hands
+    the entries to the per-channel delivery tasks in batches. A rolled-back
+    transaction takes its notifications with it, and a broker outage leaves
+    them in the outbox for the periodic relay. Unlike `enqueue_notification`
+    this raises on database errors, so callers inside a transaction keep it
+    consistent.
+
+    The first notification a user gets on a channel goes out at once; any
+    that follow on that channel within `NOTIFICATION_COALESCE_SECONDS` are
+    held until the window closes and sent together as one digest (see
+    `_release_times` and `coalesce`).
+    """
     if channels is None:
         channels = ['push']
-
-    try:
-        n = Notification.objects.create(
-            user=user,
+    for n in notifications:
+        n.channel = channels[0] if channels else 'push'
+    if getattr(settings, 'NOTIFICATION_EMAIL_DIGEST', False):
+        # email goes out with the periodic digest (api.digests)
+        channels = [channel for channel in channels if channel != 'email']
+    with transaction.atomic():
+        Notification.objects.bulk_create(notifications, batch_size=500)
+        entries = [
+            NotificationOutbox(notification=n, channel=channel, release_at=release_at)
+            for n, channel, release_at in _release_times(notifications, channels, timezone.now())
+        ]
+        NotificationOutbox.objects.bulk_create(entries, batch_size=500)
+        changes.record_many(
+            [('notification', n.id, 'create', None, None, [n.user_id]) for n in notifications],
             actor=actor,
-            verb=verb,
-            data=data,
-            channel=channels[0] if channels else 'push',
         )
-    except Exception:
-        return
+        release_times = [entry.release_at for entry in entries]
+        transaction.on_commit(lambda: _nudge_relay(release_times))
+    return notifications
+
+
+def _release_times(notifications: List[Notification], channels: List[str], now):
+    """`(notification, channel, release_at)` for each outbox entry to write.
 
+    Coalescing is keyed by user and channel. An entry is due `now` unless the
+    user already got something on that channel within the window: then it
+    waits for the end of the window the earlier entry opened, or joins the
+    entries already held for it.
+    """
+    window = timedelta(seconds=getattr(settings, 'NOTIFICATION_COALESCE_SECONDS', 60))
+    latest = {}
+    if window and notifications and channels:
+        latest = {
+            (user_id, channel): release_at
+            for user_id, channel, release_at in NotificationOutbox.objects
+            .filter(notification__user_id__in={n.user_id for n in notifications}, channel__in=channels, release_at__gte=now - window)
+            .order_by().values_list('notification__user_id', 'channel').annotate(release_at=Max('release_at'))
+        }
+    for n in notifications:
+        for channel in channels:
+            last = latest.get((n.user_id, channel))
+            if last is None:
+                release_at = now
+            elif last <= now:
+                release_at = last + window
+            else:
+                release_at = last
+            if window:
+                latest[(n.user_id, channel)] = release_at
+            yield n, channel, release_at
+
+
+def fan_out(users, actor: Optional[User], verb: str, data: dict = None, channels: List[str] = None) -> List[Notification]:
+    """Notify every user in `users` of the same event (see `enqueue_many`)."""
+    recipients = {user.id: user for user in users}
+    rows = [
+        Notification(user=user, actor=actor, verb=verb, data=dict(data or {}))
+        for user in recipients.values()
+    ]
+    return enqueue_many(rows, actor, channels) if rows else rows
+
+
+def _queue_delivery(notification_ids: List[str], channel: str):
+    """Queue a channel's delivery task for a batch of notification ids.
+
+    Each channel's task is routed to its own queue (see CELERY_TASK_ROUTES),
+    so a slow email or SMS provider never holds up push delivery.
+    """
+    channel_tasks = {'push': deliver_push_task, 'email': deliver_email_task, 'sms': deliver_sms_task}
+    if channel in channel_tasks:
+        channel_tasks[channel].delay(notification_ids)
+
+
+def _nudge_relay(release_times):
+    """Start draining the outbox for entries due now, and again when the earliest held one is."""
+    now = timezone.now()
+    held = [release_at for release_at in release_times if release_at > now]
     try:
         if _have_celery and shared_task:
-            deliver_notification_task.delay(str(n.id), channels)
-        else:
-            _deliver_notification_sync(n, channels)
+            if len(held) < len(release_times):
+                relay_notification_outbox.delay()
+            if held:
+                relay_notification_outbox.apply_async(eta=min(held))
+        elif len(held) < len(release_times):
+            drain_outbox()
     except Exception:
         pass
 
 
+def drain_outbox(batch_size: int = None, now=None) -> int:
+    """Hand due outbox entries to the delivery workers; returns how many were queued.
+
+    Each batch holds the due entries of at most
+    `NOTIFICATION_DELIVERY_BATCH_SIZE` users on one channel. It is locked
+    (skipping rows another relay holds), its channel's task is queued (see
+    `_queue_delivery`) and the entries are marked sent in one transaction, so
+    a broker refusing one channel's task leaves only that batch for the next
+    run and never re-sends another channel's. A user's held follow-ups come
+    due together and go out as one digest (see `coalesce`). Without Celery
+    the batch is delivered in-process instead. Sent entries are deleted once
+    their coalescing window has passed.
+    """
+    size = max(1, batch_size or getattr(settings, 'NOTIFICATION_DELIVERY_BATCH_SIZE', 100))
+    now = now or timezone.now()
+    window = timedelta(seconds=getattr(settings, 'NOTIFICATION_COALESCE_SECONDS', 60))
+    NotificationOutbox.objects.filter(sent=True, release_at__lt=now - window).delete()
+    queued = 0
+    while True:
+        with transaction.atomic():
+            due = NotificationOutbox.objects.filter(sent=False, release_at__lte=now)
+            channel = due.order_by('release_at', 'id').values_list('channel', flat=True).first()
+            if channel is None:
+                return queued
+            ready = list(
+                due.filter(channel=channel).order_by('notification__user_id')
+                .values_list('notification__user_id', flat=True).distinct()[:size]
+            )
+            batch = list(
+                due.select_for_update(skip_locked=True)
+                .filter(channel=channel, notification__user_id__in=ready).order_by('id')
+            )
+            if not batch:
+                return queued
+            ids = [entry.notification_id for entry in batch]
+            if _have_celery and shared_task:
+                _queue_delivery([str(i) for i in ids], channel)
+            else:
+                _deliver_many_sync(list(Notification.objects.filter(id__in=ids).select_related('user', 'actor')), [channel])
+            NotificationOutbox.objects.filter(id__in=[entry.id for entry in batch]).update(sent=True)
+            queued += len(batch)
+
+
+# how digests name each kind of notification they summarise: (one, several)
+DIGEST_PHRASES = {
+    'task_assigned': ('task assignment', 'task assignments'),
+    'created_project': ('new project', 'new projects'),
+    'join_request': ('join request', 'join requests'),
+    'join_approved': ('approved join request', 'approved join requests'),
+    'join_denied': ('denied join request', 'denied join requests'),
+    'task_due': ('task due soon', 'tasks due soon'),
+}
+
+
+def digest(notifications: List[Notification]) -> Notification:
+    """One unsaved `digest` notification summarising several for the same user.
+
+    Only used for outbound delivery; the originals stay in the in-app list.
+    """
+    first = notifications[0]
+    counts = {}
+    for n in notifications:
+        verb = (n.verb or '').lower().replace(' ', '_').strip()
+        counts[verb] = counts.get(verb, 0) + 1
+    actors = {n.actor_id for n in notifications}
+    return Notification(
+        user=first.user,
+        actor=first.actor if len(actors) == 1 else None,
+        verb='digest',
+        data={'count': len(notifications), 'verbs': counts},
+    )
+
+
+def coalesce(notifications: List[Notification]) -> List[Notification]:
+    """The notifications to send: each user's single one as is, or a digest of several.
+
+    The relay hands over one channel per batch, so this merges per user and channel.
+    """
+    by_user = {}
+    for n in notifications:
+        by_user.setdefault(n.user_id, []).append(n)
+    return [rows[0] if len(rows) == 1 else digest(rows) for rows in by_user.values()]
+
+
 def _format_title_body(n: Notification):
     """Return a human-friendly (title, body) tuple for a Notification.
 
@@ -110,6 +288,15 @@ def _format_title_body(n: Notification):
 
         # Body: "name" assigned you to a task ("task name") in "project name"
         body_actor = actor_name or 'Someone'
+        # one notification for several tasks assigned at once (tasks/batch)
+        task_count = data.get('taskCount') or 1
+        if task_count > 1:
+            title = f"You've been assigned to {task_count} tasks by {title_actor}"
+            body = f"\"{body_actor}\" assigned you to {task_count} tasks"
+            if project_name:
+                body += f" in \"{project_name}\""
+            return title, body
+
         # ensure task_title and project_name are nicely quoted if present
         if task_title:
             task_part = f"\"{task_title}\""
@@ -122,6 +309,27 @@ def _format_title_body(n: Notification):
             body = f"\"{body_actor}\" assigned you to a task {task_part}"
         return title, body
     
+    if verb_key == 'task_due':
+        # Title: Task due soon / Body: "task name" in "project name" is due <when>
+        title = "Task due soon"
+        task_part = f"\"{task_title}\"" if task_title else "A task"
+        body = f"{task_part} in \"{project_name}\"" if project_name else task_part
+        body += f" is due {data.get('due')}" if data.get('due') else " is due soon"
+        return title, body
+
+    if verb_key == 'digest':
+        # Title: You have N new notifications / Body: 3 task assignments, 1 new project
+        count = data.get('count') or 0
+        title = f"You have {count} new notification{'' if count == 1 else 's'}"
+        if actor_name:
+            title += f" from {actor_name}"
+        parts = []
+        for verb, verb_count in (data.get('verbs') or {}).items():
+            one, several = DIGEST_PHRASES.get(verb, (verb.replace('_', ' '), verb.replace('_', ' ')))
+            parts.append(f"{verb_count} {one if verb_count == 1 else several}")
+        body = ', '.join(parts) or title
+        return title, body
+
     if verb_key == 'join_request':
         # Title: "name" requested to join your team
         title_actor = actor_name or 'Someone'
@@ -167,67 +375,148 @@ def _format_title_body(n: Notification):
     return title, body
 
 
-def _deliver_notification_sync(notification: Notification, channels: List[str]):
-    """Synchronous delivery fallback used when Celery is not available.
+def _init_firebase():
+    """Initialize the Firebase app lazily if a service account is configured."""
+    if _have_firebase and firebase_admin and not firebase_admin._apps:
+        sa = getattr(settings, 'FIREBASE_SERVICE_ACCOUNT_JSON_PATH', None)
+        try:
+            if sa:
+                if isinstance(sa, str) and sa.strip().startswith('{'):
+                    cred = fb_credentials.Certificate(json.loads(sa))
+                else:
+                    cred = fb_credentials.Certificate(sa)
+                firebase_admin.initialize_app(cred)
+        except Exception:
+            pass
+
 
-    This will attempt to send via any available provider libraries. It is
-    intentionally conservative and logs failures instead of raising.
+def _push_tokens(user_ids) -> dict:
+    """`{user_id: [token, ...]}` for `user_ids`, read in one query."""
+    tokens = {}
+    for user_id, token in PushToken.objects.filter(user_id__in=set(user_ids)).values_list('user_id', 'token'):
+        tokens.setdefault(user_id, []).append(token)
+    return tokens
+
+
+def _is_unregistered(exc) -> bool:
+    """Whether a per-token FCM error means the token will never work again.
+
+    Only these are pruned; quota, availability and internal errors are
+    transient and the token is kept.
     """
-    try:
-        title, body = _format_title_body(notification)
+    dead = tuple(
+        cls for cls in (getattr(fb_messaging, 'UnregisteredError', None), getattr(fb_messaging, 'SenderIdMismatchError', None))
+        if isinstance(cls, type)
+    )
+    return bool(dead) and isinstance(exc, dead)
 
-        # Push via Firebase
-        # Initialize Firebase app lazily if configured
-        if _have_firebase and firebase_admin and not firebase_admin._apps:
-            sa = getattr(settings, 'FIREBASE_SERVICE_ACCOUNT_JSON_PATH', None)
-            try:
-                if sa:
-                    if isinstance(sa, str) and sa.strip().startswith('{'):
-                        cred = fb_credentials.Certificate(json.loads(sa))
-                    else:
-                        cred = fb_credentials.Certificate(sa)
-                    firebase_admin.initialize_app(cred)
-            except Exception:
-                pass
-
-        if _have_firebase and fb_messaging:
-            tokens = list(PushToken.objects.filter(user=notification.user).values_list('token', flat=True))
-            for token in tokens:
-                try:
-                    msg = fb_messaging.Message(
-                        token=token,
-                        notification=fb_messaging.Notification(title=title, body=body),
-                        data={k: str(v) for k, v in (notification.data or {}).items()}
-                    )
-                    fb_messaging.send(msg)
-                except Exception as exc:
-                    try:
-                        PushToken.objects.filter(token=token).delete()
-                        print(f"[notifications][_deliver_notification_sync] deleted invalid PushToken for token={token}")
-                    except Exception:
-                        pass
-
-        # Email via SendGrid
-        if 'email' in (channels or []) and _have_sendgrid and getattr(settings, 'SENDGRID_API_KEY', None) and notification.user.email:
-            try:
-                client = SendGridAPIClient(settings.SENDGRID_API_KEY)
-                from_email = getattr(settings, 'DEFAULT_FROM_EMAIL', 'no-reply@example.com')
-                message = Mail(from_email=from_email, to_emails=notification.user.email, subject=title, html_content=body)
-                client.send(message)
-            except Exception as exc:
-                tb = traceback.format_exc()
-                print(f"[notifications][_deliver_notification_sync] sendgrid send failed to {notification.user.email}: {exc}\n{tb}")
-
-        # SMS via Twilio
-        if 'sms' in (channels or []) and _have_twilio and getattr(settings, 'TWILIO_ACCOUNT_SID', None) and getattr(settings, 'TWILIO_AUTH_TOKEN', None) and getattr(settings, 'TWILIO_FROM_NUMBER', None) and notification.user.phone:
-            try:
-                tw_client = TwilioClient(settings.TWILIO_ACCOUNT_SID, settings.TWILIO_AUTH_TOKEN)
-                tw_client.messages.create(body=body, from_=settings.TWILIO_FROM_NUMBER, to=notification.user.phone)
-            except Exception as exc:
-                tb = traceback.format_exc()
-                print(f"[notifications][_deliver_notification_sync] twilio send failed to {notification.user.phone}: {exc}\n{tb}")
-    except Exception:
-        pass
+
+def _batch_sender():
+    """The SDK's per-message batch call: `send_each` (firebase-admin >= 6.2), else `send_all`.
+
+    Both take a list of Messages and return a BatchResponse with one response
+    per message.
+    """
+    sender = getattr(fb_messaging, 'send_each', None) or getattr(fb_messaging, 'send_all', None)
+    if sender is None:
+        raise RuntimeError("firebase_admin.messaging has neither send_each nor send_all")
+    return sender
+
+
+def _send_push(messages) -> int:
+    """Send `(token, Message)` pairs in batches, FCM_BATCH_SIZE per request (see `_batch_sender`).
+
+    Tokens FCM reports as unregistered are deleted with one query; other
+    failures are logged and left alone. Returns the number delivered.
+    """
+    size = max(1, min(getattr(settings, 'FCM_BATCH_SIZE', 500), 500))
+    send = _batch_sender()
+    sent = 0
+    dead = []
+    for i in range(0, len(messages), size):
+        chunk = messages[i:i + size]
+        try:
+            batch = send([message for _, message in chunk])
+        except Exception as exc:
+            print(f"[notifications][_send_push] batch send failed for {len(chunk)} messages: {exc}")
+            continue
+        for (token, _), response in zip(chunk, batch.responses):
+            if response.success:
+                sent += 1
+            elif _is_unregistered(response.exception):
+                dead.append(token)
+            else:
+                print(f"[notifications][_send_push] push failed for token={token}: {response.exception}")
+    if dead:
+        try:
+            PushToken.objects.filter(token__in=dead).delete()
+            print(f"[notifications][_send_push] deleted {len(dead)} unregistered PushTokens")
+        except Exception:
+            pass
+    return sent
+
+
+def _deliver_many_sync(notifications, channels: List[str]):
+    """Deliver a batch of notifications.
+
+    Several notifications for one user are merged into a digest first (see
+    `coalesce`). Push messages for the whole batch are collected, with every
+    recipient's tokens read in one query, and sent in `send_each` batches
+    (see `_send_push`); email and SMS go out per notification. With
+    `NOTIFICATION_EMAIL_DIGEST` on, email is left to the periodic digest
+    (api.digests) instead.
+    """
+    if getattr(settings, 'NOTIFICATION_EMAIL_DIGEST', False):
+        channels = [channel for channel in (channels or []) if channel != 'email']
+    rendered = []
+    for n in coalesce(notifications):
+        try:
+            rendered.append((n, _format_title_body(n)))
+        except Exception:
+            pass
+
+    if 'push' in (channels or []) and _have_firebase and fb_messaging:
+        try:
+            _init_firebase()
+            tokens = _push_tokens(n.user_id for n, _ in rendered)
+            messages = [
+                (token, fb_messaging.Message(
+                    token=token,
+                    notification=fb_messaging.Notification(title=title, body=body),
+                    data={k: str(v) for k, v in (n.data or {}).items()}
+                ))
+                for n, (title, body) in rendered for token in tokens.get(n.user_id, ())
+            ]
+            if messages:
+                _send_push(messages)
+        except Exception as exc:
+            print(f"[notifications][_deliver_many_sync] push delivery failed: {exc}")
+
+    for n, (title, body) in rendered:
+        _deliver_email_sms(n, title, body, channels)
+
+
+def _deliver_email_sms(notification: Notification, title: str, body: str, channels: List[str]):
+    """Send one notification's email and SMS through the configured providers."""
+    # Email via SendGrid
+    if 'email' in (channels or []) and _have_sendgrid and getattr(settings, 'SENDGRID_API_KEY', None) and notification.user.email:
+        try:
+            client = SendGridAPIClient(settings.SENDGRID_API_KEY)
+            from_email = getattr(settings, 'DEFAULT_FROM_EMAIL', 'no-reply@example.com')
+            message = Mail(from_email=from_email, to_emails=notification.user.email, subject=title, html_content=body)
+            client.send(message)
+        except Exception as exc:
+            tb = traceback.format_exc()
+            print(f"[notifications][_deliver_email_sms] sendgrid send failed to {notification.user.email}: {exc}\n{tb}")
+
+    # SMS via Twilio
+    if 'sms' in (channels or []) and _have_twilio and getattr(settings, 'TWILIO_ACCOUNT_SID', None) and getattr(settings, 'TWILIO_AUTH_TOKEN', None) and getattr(settings, 'TWILIO_FROM_NUMBER', None) and notification.user.phone:
+        try:
+            tw_client = TwilioClient(settings.TWILIO_ACCOUNT_SID, settings.TWILIO_AUTH_TOKEN)
+            tw_client.messages.create(body=body, from_=settings.TWILIO_FROM_NUMBER, to=notification.user.phone)
+        except Exception as exc:
+            tb = traceback.format_exc()
+            print(f"[notifications][_deliver_email_sms] twilio send failed to {notification.user.phone}: {exc}\n{tb}")
 
 
 if _have_celery:
@@ -238,62 +527,39 @@ if _have_celery:
         Providers are used only if their libraries and settings are available.
         """
         try:
-            n = Notification.objects.get(id=notification_id)
+            n = Notification.objects.select_related('user', 'actor').get(id=notification_id)
         except Notification.DoesNotExist:
             return
+        _deliver_many_sync([n], channels)
 
-        title, body = _format_title_body(n)
+    def _load(notification_ids: List[str]) -> List[Notification]:
+        return list(Notification.objects.filter(id__in=notification_ids).select_related('user', 'actor'))
 
-        # Initialize Firebase app lazily if configured
-        if _have_firebase and firebase_admin and not firebase_admin._apps:
-            sa = getattr(settings, 'FIREBASE_SERVICE_ACCOUNT_JSON_PATH', None)
-            try:
-                if sa:
-                    if isinstance(sa, str) and sa.strip().startswith('{'):
-                        cred = fb_credentials.Certificate(json.loads(sa))
-                    else:
-                        cred = fb_credentials.Certificate(sa)
-                    firebase_admin.initialize_app(cred)
-            except Exception:
-                pass
+    @shared_task
+    def deliver_notifications_task(notification_ids: List[str], channels: List[str]):
+        """Celery task delivering a batch of notifications on every channel.
 
-        # Push
-        if 'push' in (channels or []) and _have_firebase and fb_messaging:
-            try:
-                tokens = list(PushToken.objects.filter(user=n.user).values_list('token', flat=True))
-                for token in tokens:
-                    try:
-                        msg = fb_messaging.Message(
-                            token=token,
-                            notification=fb_messaging.Notification(title=title, body=body),
-                            data={k: str(v) for k, v in (n.data or {}).items()}
-                        )
-                        fb_messaging.send(msg)
-                    except Exception as exc:
-                        try:
-                            PushToken.objects.filter(token=token).delete()
-                            print(f"[deliver_notification_task] deleted invalid PushToken for token={token}")
-                        except Exception:
-                            pass
-            except Exception:
-                pass
+        Kept for messages queued before delivery was split per channel; the
+        relay now queues the per-channel tasks below.
+        """
+        _deliver_many_sync(_load(notification_ids), channels)
 
-        # Email
-        if 'email' in (channels or []) and _have_sendgrid and getattr(settings, 'SENDGRID_API_KEY', None) and n.user.email:
-            try:
-                client = SendGridAPIClient(settings.SENDGRID_API_KEY)
-                from_email = getattr(settings, 'DEFAULT_FROM_EMAIL', 'no-reply@example.com')
-                message = Mail(from_email=from_email, to_emails=n.user.email, subject=title, html_content=body)
-                client.send(message)
-            except Exception:
-                print(f"[deliver_notification_task] sendgrid send failed to {n.user.email}")
+    @shared_task
+    def deliver_push_task(notification_ids: List[str]):
+        """Push delivery for a batch, in multicast batches (the `push` queue)."""
+        _deliver_many_sync(_load(notification_ids), ['push'])
 
-        # SMS
-        if 'sms' in (channels or []) and _have_twilio and getattr(settings, 'TWILIO_ACCOUNT_SID', None) and getattr(settings, 'TWILIO_AUTH_TOKEN', None) and getattr(settings, 'TWILIO_FROM_NUMBER', None) and n.user.phone:
-            try:
-                tw_client = TwilioClient(settings.TWILIO_ACCOUNT_SID, settings.TWILIO_AUTH_TOKEN)
-                tw_client.messages.create(body=body, from_=settings.TWILIO_FROM_NUMBER, to=n.user.phone)
-            except Exception:
-                print(f"[deliver_notification_task] twilio send failed to {n.user.phone}")
+    @shared_task
+    def deliver_email_task(notification_ids: List[str]):
+        """Email delivery for a batch (the `email` queue)."""
+        _deliver_many_sync(_load(notification_ids), ['email'])
+
+    @shared_task
+    def deliver_sms_task(notification_ids: List[str]):
+        """SMS delivery for a batch (the `sms` queue)."""
+        _deliver_many_sync(_load(notification_ids), ['sms'])
 
-        return
+    @shared_task
+    def relay_notification_outbox():
+        """Drain the notification outbox; nudged after commits and run periodically (see CELERY_BEAT_SCHEDULE)."""
+        return drain_outbox()
@@ -0,0 +1,48 @@
+"""Renumbering of explicitly ordered rows (board columns, sidebar folders).
+
+Both keep a small integer `order` per row within a scope (a project's
+columns, a user's folders). `reorder` validates a requested order against the
+rows actually in scope and writes it back in one statement, so the cost of a
+drag-and-drop does not grow with the number of rows.
+"""
+from django.utils import timezone
+
+
+def reorder(queryset, ids=(), field="order", touch=None):
+    """Renumber the rows of `queryset` 0, 1, 2, ... following `ids`.
+
+    Call inside `transaction.atomic()`: the scope's rows are locked first so
+    concurrent reorders apply one after the other. Ids outside the scope are
+    ignored (e.g. rows deleted meanwhile), and rows `ids` leaves out keep their
+    relative order after the listed ones, so an empty `ids` just closes gaps.
+    Only rows whose position changed are written, with a single `bulk_update`
+    (one `UPDATE ... CASE`); `touch` names a timestamp field to set on them.
+
+    Returns `(order, changed)`: every id in scope as strings in their new
+    order, and the rows that were rewritten. Raises ValueError when `ids` is
+    not a list of distinct ids.
+    """
+    if not isinstance(ids, (list, tuple)):
+        raise ValueError("order must be an array of ids")
+    requested = [str(i) for i in ids]
+    if len(set(requested)) != len(requested):
+        raise ValueError("order contains duplicate ids")
+
+    rows = list(queryset.select_for_update().order_by(field, "pk").only("pk", field))
+    by_id = {str(row.pk): row for row in rows}
+    listed = [by_id[i] for i in requested if i in by_id]
+    listed_ids = {row.pk for row in listed}
+    ordered = listed + [row for row in rows if row.pk not in listed_ids]
+
+    changed = []
+    now = timezone.now()
+    for index, row in enumerate(ordered):
+        if getattr(row, field) != index:
+            setattr(row, field, index)
+            if touch:
+                setattr(row, touch, now)
+            changed.append(row)
+    if changed:
+        fields = [field, touch] if touch else [field]
+        queryset.model.objects.bulk_update(changed, fields)
+    return [str(row.pk) for row in ordered], changed
@@ -0,0 +1,82 @@
+"""Keyset (cursor) pagination.
+
+Pages are cut with a `WHERE (a, b) < (last_a, last_b)` style filter on the
+ordering columns instead of OFFSET, so fetching page N costs the same as page
+1 and rows inserted meanwhile do not shift pages. The ordering must end in a
+unique column (normally `id`) and should be backed by an index.
+
+Cursors are opaque to clients: the urlsafe base64 of the last row's ordering
+values.
+"""
+import base64
+import json
+from datetime import date, datetime
+from uuid import UUID
+from django.db.models import Q
+
+DEFAULT_LIMIT = 50
+MAX_LIMIT = 200
+
+
+class InvalidCursor(ValueError):
+    pass
+
+
+def parse_limit(raw, default=DEFAULT_LIMIT, maximum=MAX_LIMIT) -> int:
+    """Parse a `?limit=` value, clamped to 1..maximum; raises ValueError if not a number."""
+    if raw in (None, ""):
+        return default
+    return max(1, min(int(raw), maximum))
+
+
+def _plain(value):
+    if isinstance(value, (datetime, date)):
+        return value.isoformat()
+    if isinstance(value, UUID):
+        return str(value)
+    return value
+
+
+def encode_cursor(obj, ordering) -> str:
+    values = [_plain(getattr(obj, key.lstrip("-"))) for key in ordering]
+    return base64.urlsafe_b64encode(json.dumps(values).encode("utf-8")).decode("ascii")
+
+
+def decode_cursor(cursor: str, ordering) -> list:
+    try:
+        values = json.loads(base64.urlsafe_b64decode(cursor.encode("ascii")))
+    except (ValueError, TypeError, UnicodeError):
+        raise InvalidCursor(cursor)
+    if not isinstance(values, list) or len(values) != len(ordering):
+        raise InvalidCursor(cursor)
+    return values
+
+
+def _after(ordering, values) -> Q:
+    """Rows strictly after `values` in `ordering` (a lexicographic comparison)."""
+    condition = Q()
+    for i in reversed(range(len(ordering))):
+        key = ordering[i].lstrip("-")
+        lookup = "lt" if ordering[i].startswith("-") else "gt"
+        step = Q(**{f"{key}__{lookup}": values[i]})
+        if i < len(ordering) - 1:
+            step |= Q(**{key: values[i]}) & condition
+        condition = step
+    return condition
+
+
+def keyset_page(queryset, ordering, cursor=None, limit=DEFAULT_LIMIT):
+    """Return `(rows, next_cursor)` for one page of `queryset` in `ordering`.
+
+    `ordering` is a tuple of field names as for `order_by` (e.g.
+    `("-timestamp", "-id")`); `next_cursor` is None on the last page. Raises
+    InvalidCursor for a cursor that was not produced for this ordering.
+    """
+    queryset = queryset.order_by(*ordering)
+    if cursor:
+        queryset = queryset.filter(_after(ordering, decode_cursor(cursor, ordering)))
+    rows = list(queryset[:limit + 1])
+    if len(rows) <= limit:
+        return rows, None
+    rows = rows[:limit]
+    return rows, encode_cursor(rows[-1], ordering)
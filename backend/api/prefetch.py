@@ -0,0 +1,61 @@
+"""Prefetch plans for the nested serializers.
+
+`ProjectSerializer` and friends walk tasks, columns, comments and subtasks per
+object. Loading querysets (or instances, via
+`prefetch_related_objects`) with these lookups first lets a whole user
+snapshot serialize in a constant number of queries, however much data it
+holds. Serializers sort prefetched rows in Python instead of calling
+`order_by`, which would bypass the prefetch cache.
+"""
+from django.db.models import Prefetch
+from .models import Attachment, Column, Comment, Task, TeamMember
+
+TASK_PREFETCH = [
+    "assignees",
+    "attachments",
+    Prefetch("comments", queryset=Comment.objects.select_related("author")),
+    "subtasks",
+]
+
+# ColumnSerializer.taskIds only needs each task's id and rank
+COLUMN_PREFETCH = [
+    Prefetch("tasks", queryset=Task.objects.filter(archived=False).only("id", "column_id", "rank")),
+]
+
+PROJECT_PREFETCH = [
+    Prefetch("tasks", queryset=Task.objects.filter(archived=False).prefetch_related(*TASK_PREFETCH)),
+    Prefetch("columns", queryset=Column.objects.order_by("order").prefetch_related(*COLUMN_PREFETCH)),
+]
+
+# ProjectSerializer field -> PROJECT_PREFETCH lookup it reads
+_PROJECT_FIELD_LOOKUPS = {
+    "tasks": "tasks",
+    "columns": "columns",
+    "columnOrder": "columns",
+}
+
+
+def project_prefetch(fields=None) -> list:
+    """PROJECT_PREFETCH restricted to what the serialized `fields` need (all by default)."""
+    if fields is None:
+        return PROJECT_PREFETCH
+    lookups = {_PROJECT_FIELD_LOOKUPS[f] for f in fields if f in _PROJECT_FIELD_LOOKUPS}
+    return [p for p in PROJECT_PREFETCH if p.prefetch_through in lookups]
+
+
+TEAM_PREFETCH = [
+    Prefetch("team_members", queryset=TeamMember.objects.select_related("user")),
+]
+
+
+def attachments_by_id(*message_lists) -> dict:
+    """Load the attachments referenced by chat/direct messages in one query.
+
+    Messages store attachment ids in a JSON list, which cannot be prefetched;
+    the returned `{id: Attachment}` map goes into the serializer context under
+    `attachments_by_id`.
+    """
+    ids = {str(aid) for messages in message_lists for m in messages for aid in (m.attachments or [])}
+    if not ids:
+        return {}
+    return {str(att.id): att for att in Attachment.objects.filter(id__in=ids)}
@@ -0,0 +1,58 @@
+"""Cache of serialized project payloads.
+
+A project is read by every member on every poll but changes far less often,
+so `ProjectSerializer` output is cached per project together with the
+project's version fingerprint (`sync.project_versions`). An entry is only
+used when its version still matches, and `changes.record` drops the entry
+when a write inside the project commits. Sparse payloads (`/api/data/?fields[projects]=`)
+are cached under their own `variant` key and rely on the version check alone. The cache is best-effort: if the
+backend is unavailable, payloads are simply serialized again.
+"""
+from django.conf import settings
+from django.core.cache import cache
+from django.db import transaction
+
+KEY_PREFIX = "project-payload"
+
+
+def _key(project_id, variant="") -> str:
+    if variant:
+        return f"{KEY_PREFIX}:{variant}:{project_id}"
+    return f"{KEY_PREFIX}:{project_id}"
+
+
+def get_many(versions: dict, variant="") -> dict:
+    """Return `{project_id: payload}` for cached entries matching `{project_id: version}`."""
+    if not versions:
+        return {}
+    try:
+        entries = cache.get_many([_key(pid, variant) for pid in versions])
+    except Exception:
+        return {}
+    hits = {}
+    for pid, version in versions.items():
+        entry = entries.get(_key(pid, variant))
+        if entry and entry[0] == version:
+            hits[pid] = entry[1]
+    return hits
+
+
+def set_many(payloads: dict, variant=""):
+    """Store `{project_id: (version, payload)}`."""
+    if not payloads:
+        return
+    timeout = getattr(settings, 'PROJECT_CACHE_TIMEOUT', 600)
+    try:
+        cache.set_many({_key(pid, variant): entry for pid, entry in payloads.items()}, timeout=timeout)
+    except Exception:
+        pass
+
+
+def invalidate(project_id):
+    """Drop a project's entry once the current transaction commits."""
+    def _delete():
+        try:
+            cache.delete(_key(project_id))
+        except Exception:
+            pass
+    transaction.on_commit(_delete)
@@ -0,0 +1,145 @@
+"""Lexicographic ranks for ordering tasks inside a column.
+
+A task's position is `Task.rank`, a base-36 string compared as text: a
+column lists its tasks by `(rank, id)` from the `(column, rank)` index, and
+moving a task only rewrites that task's rank, chosen strictly between its new
+neighbours. Ranks are read as fractions (`"i"` is 18/36), never end in `"0"`,
+and there is always room for another rank between two distinct ones.
+Archived tasks (see api.archive) are off the board and ignored here.
+
+Repeated inserts at the same spot make ranks longer; once one grows past
+`TASK_RANK_REBALANCE_LENGTH` the column is re-spread evenly in the background
+(`rebalance_column_task`).
+"""
+from django.conf import settings
+from django.db import transaction
+from .models import Task
+
+try:
+    from celery import shared_task
+    _have_celery = True
+except Exception:
+    shared_task = None
+    _have_celery = False
+
+DIGITS = "0123456789abcdefghijklmnopqrstuvwxyz"
+BASE = len(DIGITS)
+
+
+def _midpoint(a: str, b):
+    """A rank strictly between `a` and `b` ("" is the lowest, None the highest)."""
+    if b is not None:
+        # skip the common prefix, treating a missing digit of `a` as "0"
+        n = 0
+        while n < len(b) and (a[n] if n < len(a) else DIGITS[0]) == b[n]:
+            n += 1
+        if n:
+            return b[:n] + _midpoint(a[n:], b[n:])
+    low = DIGITS.index(a[0]) if a else 0
+    high = DIGITS.index(b[0]) if b is not None else BASE
+    if high - low > 1:
+        return DIGITS[(low + high) // 2]
+    # adjacent digits: a shorter prefix of `b`, or extend `a`
+    if b is not None and len(b) > 1:
+        return b[:1]
+    return DIGITS[low] + _midpoint(a[1:], None)
+
+
+def rank_between(before=None, after=None) -> str:
+    """Return a rank sorting after `before` and before `after` (either may be None).
+
+    Raises ValueError unless `before < after`.
+    """
+    before = before or ""
+    if after is not None and not before < after:
+        raise ValueError(f"cannot rank between {before!r} and {after!r}")
+    return _midpoint(before, after)
+
+
+def ranks_between(before, after, count: int) -> list:
+    """Return `count` ascending ranks between `before` and `after`, spread evenly.
+
+    Splitting the gap recursively keeps ranks about log36(count) characters
+    long, which is what placing many tasks at once (or rebalancing) needs.
+    """
+    if count <= 0:
+        return []
+    middle = rank_between(before, after)
+    left = ranks_between(before, middle, (count - 1) // 2)
+    right = ranks_between(middle, after, count - 1 - len(left))
+    return left + [middle] + right
+
+
+def last_rank(column):
+    """The highest rank in a column, or None if it is empty."""
+    return (
+        Task.objects.filter(column=column, archived=False).order_by("-rank", "-id")
+        .values_list("rank", flat=True).first()
+    )
+
+
+def neighbours(column, position, exclude_id=None):
+    """Ranks `(before, after)` around index `position` of a column (None at either end)."""
+    tasks = Task.objects.filter(column=column, archived=False)
+    if exclude_id is not None:
+        tasks = tasks.exclude(id=exclude_id)
+    ranks = tasks.order_by("rank", "id").values_list("rank", flat=True)
+    last = tasks.order_by("-rank", "-id").values_list("rank", flat=True)
+    if position is None or position < 0:
+        return last.first(), None
+    if position == 0:
+        return None, ranks.first()
+    window = list(ranks[position - 1:position + 1])
+    if not window:
+        return last.first(), None
+    return window[0], window[1] if len(window) > 1 else None
+
+
+def rank_at(column, position, exclude_id=None) -> str:
+    """A rank placing a task at index `position` of `column` (appends when None or past the end).
+
+    Columns holding equal ranks (e.g. rows that were never ranked) are
+    rebalanced first so a gap exists.
+    """
+    before, after = neighbours(column, position, exclude_id)
+    try:
+        rank = rank_between(before, after)
+    except ValueError:
+        rank = None
+    if rank is None or len(rank) > Task._meta.get_field("rank").max_length:
+        # no gap left (or the background rebalance never ran): rebalance now
+        rebalance(column.id)
+        before, after = neighbours(column, position, exclude_id)
+        rank = rank_between(before, after)
+    elif len(rank) > getattr(settings, 'TASK_RANK_REBALANCE_LENGTH', 24):
+        schedule_rebalance(column.id)
+    return rank
+
+
+def rebalance(column_id) -> int:
+    """Rewrite a column's ranks evenly spread, keeping their order; returns tasks updated."""
+    with transaction.atomic():
+        tasks = list(Task.objects.select_for_update().filter(column_id=column_id, archived=False).order_by("rank", "id"))
+        for task, rank in zip(tasks, ranks_between(None, None, len(tasks))):
+            task.rank = rank
+        Task.objects.bulk_update(tasks, ["rank"], batch_size=500)
+    return len(tasks)
+
+
+def schedule_rebalance(column_id):
+    """Rebalance a column in the background once the current transaction commits."""
+    def _enqueue():
+        try:
+            if _have_celery and shared_task:
+                rebalance_column_task.delay(str(column_id))
+            else:
+                rebalance(column_id)
+        except Exception:
+            pass
+    transaction.on_commit(_enqueue)
+
+
+if _have_celery:
+    @shared_task
+    def rebalance_column_task(column_id):
+        return rebalance(column_id)
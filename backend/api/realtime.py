@@ -0,0 +1,255 @@
+"""Real-time push of change events over Server-Sent Events.
+
+`changes.record` hands every ChangeEvent to `publish_on_commit`, which fans it
+out on Redis pub/sub channels once the transaction commits:
+
+    collabtrack:project:<id>   board and chat events
+    collabtrack:team:<id>      team-level events (members, projects created/deleted)
+    collabtrack:user:<id>      DMs, notifications, folders, membership changes
+
+`GET /api/events/?token=<access jwt>` streams those events to the browser as
+`event: change` messages whose id is the event sequence number. On reconnect
+the browser sends `Last-Event-ID` and missed events are replayed from the
+change log. Sequence numbers are handed out before commit, so they can
+become visible out of order; replay therefore reaches back to every event
+written within `sync.CURSOR_OVERLAP` of the last one seen, and clients drop
+events whose `seq` they already have. When more than `BACKLOG_LIMIT` events
+were missed, or the last event seen has been compacted away or is past
+`CHANGE_EVENT_RETENTION_DAYS` (so the log may no longer hold everything after
+it), the stream sends `event: resync` instead and the client catches up
+through `/api/data/?since=`. The view is async, so it must be served through the ASGI
+application (`backend.asgi`).
+"""
+import json
+from asgiref.sync import sync_to_async
+from django.conf import settings
+from django.db import transaction
+from django.db.models import Min, Q
+from django.http import JsonResponse, StreamingHttpResponse
+from rest_framework.exceptions import AuthenticationFailed
+from rest_framework_simplejwt.authentication import JWTAuthentication
+from rest_framework_simplejwt.exceptions import InvalidToken, TokenError
+from .models import ChangeEvent, Project, TeamMember
+from . import sync
+
+try:
+    import redis
+    import redis.asyncio as aioredis
+    _have_redis = True
+except Exception:
+    redis = None
+    aioredis = None
+    _have_redis = False
+
+CHANNEL_PREFIX = "collabtrack"
+KEEPALIVE_SECONDS = 15
+BACKLOG_LIMIT = 500
+
+_client = None
+
+
+def channel_for(kind: str, object_id) -> str:
+    return f"{CHANNEL_PREFIX}:{kind}:{object_id}"
+
+
+def serialize_event(event: ChangeEvent) -> dict:
+    return {
+        "seq": event.id,
+        "entity": event.entity,
+        "entityId": str(event.entity_id),
+        "op": event.op,
+        "teamId": str(event.team_id) if event.team_id else None,
+        "projectId": str(event.project_id) if event.project_id else None,
+        "actorId": str(event.actor_id) if event.actor_id else None,
+        "data": event.data,
+        "createdAt": event.created_at.isoformat() if event.created_at else None,
+    }
+
+
+def channels_for_event(event: ChangeEvent) -> list:
+    if event.user_id:
+        return [channel_for("user", event.user_id)]
+    channels = []
+    if event.project_id:
+        channels.append(channel_for("project", event.project_id))
+    # team members have to learn about projects they are not subscribed to yet
+    if event.team_id and (not event.project_id or event.entity == "project"):
+        channels.append(channel_for("team", event.team_id))
+    return channels
+
+
+def _get_client():
+    global _client
+    if _client is None:
+        _client = redis.Redis.from_url(settings.REALTIME_REDIS_URL)
+    return _client
+
+
+def publish(events):
+    """Publish change events to their Redis channels.
+
+    Best-effort: a missing Redis only costs clients their live updates, they
+    still catch up through delta sync, so this never raises.
+    """
+    if not _have_redis or not events:
+        return
+    try:
+        pipe = _get_client().pipeline(transaction=False)
+        for event in events:
+            payload = json.dumps(serialize_event(event))
+            for channel in channels_for_event(event):
+                pipe.publish(channel, payload)
+        pipe.execute()
+    except Exception:
+        pass
+
+
+def publish_on_commit(events):
+    """Publish once the surrounding transaction commits (immediately if there is none)."""
+    events = list(events)
+    transaction.on_commit(lambda: publish(events))
+
+
+def _authenticate(request):
+    """Resolve the user from `?token=` (EventSource cannot send headers) or the Authorization header."""
+    auth = JWTAuthentication()
+    raw = request.GET.get("token")
+    if not raw:
+        header = auth.get_header(request)
+        raw = auth.get_raw_token(header) if header else None
+    if not raw:
+        return None
+    try:
+        return auth.get_user(auth.get_validated_token(raw))
+    except (AuthenticationFailed, InvalidToken, TokenError):
+        return None
+
+
+def _scopes(user_id):
+    team_ids = list(TeamMember.objects.filter(user_id=user_id).values_list("team_id", flat=True))
+    project_ids = list(Project.objects.filter(team__in=team_ids).values_list("id", flat=True))
+    return team_ids, project_ids
+
+
+def _channels(user_id, team_ids, project_ids) -> set:
+    channels = {channel_for("user", user_id)}
+    channels.update(channel_for("team", tid) for tid in team_ids)
+    channels.update(channel_for("project", pid) for pid in project_ids)
+    return channels
+
+
+RESYNC = "event: resync\ndata: {}\n\n"
+
+
+def _backlog(user_id, team_ids, project_ids, after_seq):
+    """Events in the user's scopes the client may have missed after `after_seq`.
+
+    Starts at the first event written within CURSOR_OVERLAP of `after_seq`'s,
+    so events that committed after it despite a lower sequence number are
+    included. Returns None when the log cannot replay everything since
+    `after_seq` (the event is gone or past retention) or there are more than
+    BACKLOG_LIMIT.
+    """
+    anchor = ChangeEvent.objects.filter(id=after_seq).values_list("created_at", flat=True).first()
+    if anchor is None or sync.is_expired(anchor):
+        return None
+    start = after_seq
+    floor = ChangeEvent.objects.filter(created_at__gte=anchor - sync.CURSOR_OVERLAP).aggregate(seq=Min("id"))["seq"]
+    if floor is not None:
+        start = min(start, floor - 1)
+    events = list(ChangeEvent.objects.filter(
+        Q(user_id=user_id) | Q(team_id__in=team_ids, project_id__isnull=True)
+        | Q(project_id__in=project_ids) | Q(team_id__in=team_ids, entity="project"),
+        id__gt=start,
+    ).order_by("id")[:BACKLOG_LIMIT + 1])
+    if len(events) > BACKLOG_LIMIT:
+        return None
+    return [serialize_event(e) for e in events]
+
+
+def _replay(user_id, team_ids, project_ids, after_seq):
+    """SSE messages replaying the backlog after `after_seq`, and the seqs they carry.
+
+    A backlog that cannot or should not be replayed becomes a single `resync`
+    message.
+    """
+    backlog = _backlog(user_id, team_ids, project_ids, after_seq)
+    if backlog is None:
+        return [RESYNC], set()
+    return [_format(event) for event in backlog], {event["seq"] for event in backlog}
+
+
+def _changes_membership(event: dict, user_id) -> bool:
+    """Whether an event can change which teams/projects the user should hear about."""
+    if event["entity"] == "project" and event["op"] in ("create", "delete"):
+        return True
+    if event["entity"] == "team":
+        return event["op"] == "delete" or (event.get("data") or {}).get("addedUserId") == str(user_id)
+    return False
+
+
+def _format(event: dict) -> str:
+    return f"id: {event['seq']}\nevent: change\ndata: {json.dumps(event)}\n\n"
+
+
+async def _event_stream(user_id, last_seq):
+    client = aioredis.Redis.from_url(settings.REALTIME_REDIS_URL)
+    pubsub = client.pubsub()
+    try:
+        team_ids, project_ids = await sync_to_async(_scopes)(user_id)
+        subscribed = _channels(user_id, team_ids, project_ids)
+        await pubsub.subscribe(*subscribed)
+        yield "retry: 3000\n\n"
+
+        # subscribe first, then replay, so nothing falls between the two;
+        # live copies of replayed events are skipped below
+        replayed = set()
+        if last_seq is not None:
+            messages, replayed = await sync_to_async(_replay)(user_id, team_ids, project_ids, last_seq)
+            for chunk in messages:
+                yield chunk
+
+        while True:
+            message = await pubsub.get_message(ignore_subscribe_messages=True, timeout=KEEPALIVE_SECONDS)
+            if message is None:
+                yield ": keepalive\n\n"
+                continue
+            try:
+                event = json.loads(message["data"])
+            except (TypeError, ValueError):
+                continue
+            if event["seq"] in replayed:
+                continue
+            yield _format(event)
+
+            if _changes_membership(event, user_id):
+                team_ids, project_ids = await sync_to_async(_scopes)(user_id)
+                wanted = _channels(user_id, team_ids, project_ids)
+                if wanted - subscribed:
+                    await pubsub.subscribe(*(wanted - subscribed))
+                if subscribed - wanted:
+                    await pubsub.unsubscribe(*(subscribed - wanted))
+                subscribed = wanted
+    finally:
+        await pubsub.aclose()
+        await client.aclose()
+
+
+async def event_stream(request):
+    """GET /api/events/ - Server-Sent Events stream of the user's change events."""
+    if not _have_redis:
+        return JsonResponse({"error": "real-time events are not available"}, status=503)
+    user = await sync_to_async(_authenticate)(request)
+    if user is None or not user.is_active:
+        return JsonResponse({"detail": "Authentication credentials were not provided."}, status=401)
+
+    last_seq = request.headers.get("Last-Event-ID") or request.GET.get("lastEventId")
+    try:
+        last_seq = int(last_seq) if last_seq else None
+    except ValueError:
+        last_seq = None
+
+    response = StreamingHttpResponse(_event_stream(user.id, last_seq), content_type="text/event-stream")
+    response["Cache-Control"] = "no-cache"
+    response["X-Accel-Buffering"] = "no"  # keep reverse proxies from buffering the stream
+    return response
@@ -0,0 +1,98 @@
+"""Due-soon reminders.
+
+`send_due_reminders` (a periodic Celery task) notifies each assignee of an
+open task once its due date comes within `TASK_REMINDER_LEAD_MINUTES`. It
+only reads index ranges on `due_date`, never the whole task table:
+
+* the window ahead: due dates from the persisted high-water mark up to
+  now + lead time. The mark then moves to the end of the window, so the next
+  run starts where this one stopped;
+* late arrivals: tasks edited since the last run whose (new) due date is
+  already behind the mark but still ahead of now.
+
+Each task records the due date it was reminded for (`reminded_due_date`) in
+the same transaction as its notifications. A worker restarting mid-run
+therefore never sends a reminder twice, and moving a due date re-arms it.
+"""
+from datetime import timedelta
+from django.conf import settings
+from django.db import transaction
+from django.db.models import F
+from django.utils import timezone
+from .models import HighWaterMark, Notification, Task, TaskAssignee
+from . import notifications
+
+try:
+    from celery import shared_task
+    _have_celery = True
+except Exception:
+    shared_task = None
+    _have_celery = False
+
+MARK = "due_reminders"
+CHANNELS = ["push", "email"]
+
+
+def _remind(tasks, now) -> int:
+    """Notify the assignees of `tasks` and mark them reminded; returns notifications created."""
+    recipients = {}
+    for task_id, user_id in TaskAssignee.objects.filter(task__in=tasks).values_list("task_id", "user_id"):
+        recipients.setdefault(task_id, []).append(user_id)
+    rows = [
+        Notification(
+            user_id=user_id, verb="task_due",
+            data={
+                "taskId": str(task.id), "taskTitle": task.title,
+                "projectId": str(task.project_id), "projectName": task.project.name,
+                "due": task.due_date.isoformat(),
+            },
+        )
+        for task in tasks for user_id in recipients.get(task.id, ())
+    ]
+    notifications.enqueue_many(rows, channels=CHANNELS)
+    for task in tasks:
+        task.reminded_due_date = task.due_date
+    Task.objects.bulk_update(tasks, ["reminded_due_date"], batch_size=500)
+    return len(rows)
+
+
+def _due(queryset, batch_size):
+    """One locked batch of open, not yet reminded tasks from `queryset`, soonest first."""
+    return list(
+        queryset.filter(completed=False, archived=False)
+        .exclude(reminded_due_date=F("due_date"))
+        .select_for_update().select_related("project")
+        .order_by("due_date", "id")[:batch_size]
+    )
+
+
+def send_due_reminders(now=None, batch_size=500) -> int:
+    """Send reminders for tasks that entered the window since the last run; returns notifications sent."""
+    now = now or timezone.now()
+    window_end = now + timedelta(minutes=getattr(settings, 'TASK_REMINDER_LEAD_MINUTES', 24 * 60))
+    mark, _ = HighWaterMark.objects.get_or_create(name=MARK, defaults={"value": now})
+    # a little overlap so edits committed while the last run was finishing are not missed
+    last_run = mark.updated_at - timedelta(minutes=1)
+    sent = 0
+    while True:
+        with transaction.atomic():
+            # the locked mark also keeps two overlapping runs from sending the same batch
+            mark = HighWaterMark.objects.select_for_update().get(name=MARK)
+            start = max(mark.value, now)
+            ahead = _due(Task.objects.filter(due_date__gte=start, due_date__lte=window_end), batch_size)
+            late = _due(
+                Task.objects.filter(due_date__gt=now, due_date__lt=start, updated_at__gte=last_run),
+                batch_size,
+            )
+            if not ahead and not late:
+                mark.value = max(mark.value, window_end)
+                mark.save(update_fields=["value", "updated_at"])
+                return sent
+            sent += _remind(ahead + late, now)
+
+
+if _have_celery:
+    @shared_task
+    def send_due_reminders_task():
+        """Periodic Celery task (see CELERY_BEAT_SCHEDULE) wrapping `send_due_reminders`."""
+        return send_due_reminders()
@@ -2,15 +2,32 @@ from rest_framework import serializers
 from django.contrib.auth import get_user_model
 from django.core.files.storage import default_storage
 from django.contrib.auth.password_validation import validate_password
+from django.utils import timezone
 from .models import (
     Attachment, Comment, Task, Subtask, Column, ChatMessage,
-    TeamMember, Team, Project, DirectMessage, Folder
+    TeamMember, Team, Project, DirectMessage, Conversation, Folder
 )
 from .models import PushToken, Notification
 from .utils import compress_base64_image, rename_file
+from . import tags
 
 User = get_user_model()
 
+
+class SparseFieldsMixin:
+    """Accept `fields=[...]` to serialize only those fields (plus `id`).
+
+    Used by `/api/data/?fields[<section>]=...`; dropped method fields are never
+    computed, so leaving out e.g. a project's `tasks` also skips their cost.
+    """
+    def __init__(self, *args, **kwargs):
+        fields = kwargs.pop("fields", None)
+        super().__init__(*args, **kwargs)
+        if fields is not None:
+            for name in set(self.fields) - set(fields) - {"id"}:
+                self.fields.pop(name)
+
+
 class NestedUserSerializer(serializers.ModelSerializer):
     """Lean user serializer for nested user data (assignees, authors, etc.)"""
     id = serializers.UUIDField(read_only=True)
@@ -21,7 +38,7 @@ class NestedUserSerializer(serializers.ModelSerializer):
         fields = ["id", "name", "avatarUrl"]
 
 
-class UserSerializer(serializers.ModelSerializer):
+class UserSerializer(SparseFieldsMixin, serializers.ModelSerializer):
     id = serializers.UUIDField(read_only=True)
     avatarUrl = serializers.ImageField(source='avatar', use_url=False, read_only=True)
     avatar = serializers.ImageField(use_url=False, required=False, allow_null=True, write_only=True)
@@ -124,6 +141,11 @@ class TaskSerializer(serializers.ModelSerializer):
     completed = serializers.BooleanField(required=False, default=False)
 
     projectId = serializers.PrimaryKeyRelatedField(queryset=Project.objects.all(), source="project", write_only=True)
+    columnId = serializers.UUIDField(source="column_id", read_only=True)
+    positionVersion = serializers.IntegerField(source="position_version", read_only=True)
+    completedAt = serializers.DateTimeField(source="completed_at", read_only=True)
+    archived = serializers.BooleanField(read_only=True)
+    archivedAt = serializers.DateTimeField(source="archived_at", read_only=True)
 
     createdAt = serializers.DateTimeField(source="created_at", read_only=True)
     updatedAt = serializers.DateTimeField(source="updated_at", read_only=True)
@@ -134,11 +156,25 @@ class TaskSerializer(serializers.ModelSerializer):
         fields = [
             "id", "title", "description", "assignees", "assigneeIds",
             "dueDate", "priority", "tags", "attachments", "attachmentIds",
-            "comments", "commentIds", "subtasks", "projectId", "weight", "completed",
-            "createdAt", "updatedAt"
+            "comments", "commentIds", "subtasks", "projectId", "columnId", "positionVersion", "weight", "completed",
+            "completedAt", "archived", "archivedAt", "createdAt", "updatedAt"
         ]
         read_only_fields = ["id", "createdAt", "updatedAt"]
 
+    def validate_tags(self, value):
+        if not isinstance(value, list):
+            raise serializers.ValidationError("tags must be an array of strings")
+        return tags.normalize(value)
+
+    def validate(self, attrs):
+        # completed_at drives archiving (api.archive); stamp it when completion changes
+        if "completed" in attrs:
+            if not attrs["completed"]:
+                attrs["completed_at"] = None
+            elif self.instance is None or not self.instance.completed:
+                attrs["completed_at"] = timezone.now()
+        return attrs
+
     def create(self, validated_data):
         assignees = validated_data.pop("assignees", [])
         attachments = validated_data.pop("attachments", [])
@@ -168,7 +204,8 @@ class TaskSerializer(serializers.ModelSerializer):
         return instance
     
     def get_comments(self, obj):
-        return [CommentSerializer(c).data for c in obj.comments.all().order_by('timestamp')]
+        # sort in Python so prefetched comments (see prefetch.TASK_PREFETCH) are reused
+        return [CommentSerializer(c).data for c in sorted(obj.comments.all(), key=lambda c: c.timestamp)]
 
 
 class ColumnSerializer(serializers.ModelSerializer):
@@ -179,7 +216,9 @@ class ColumnSerializer(serializers.ModelSerializer):
         fields = ["id", "title", "taskIds", "project"]
 
     def get_taskIds(self, obj):
-        return obj.task_ids
+        # column order is Task.rank; sort in Python so prefetched tasks
+        # (prefetch.COLUMN_PREFETCH) are reused
+        return [str(t.id) for t in sorted(obj.tasks.all(), key=lambda t: (t.rank, str(t.id)))]
         
 
 
@@ -203,11 +242,20 @@ class ChatMessageSerializer(serializers.ModelSerializer):
             }
 
     def get_attachments(self, obj):
-        if not obj.attachments:
-            return []
+        return _message_attachments(self, obj)
+
 
+def _message_attachments(serializer, obj):
+    """Serialize a message's attachment ids, using the context's preloaded map when present."""
+    if not obj.attachments:
+        return []
+
+    lookup = serializer.context.get("attachments_by_id")
+    if lookup is None:
         attachments = Attachment.objects.filter(id__in=obj.attachments)
-        return AttachmentSerializer(attachments, many=True).data
+    else:
+        attachments = [lookup[str(aid)] for aid in obj.attachments if str(aid) in lookup]
+    return AttachmentSerializer(attachments, many=True).data
 
 
 class TeamMemberSerializer(serializers.ModelSerializer):
@@ -218,7 +266,7 @@ class TeamMemberSerializer(serializers.ModelSerializer):
         fields = ["id", "user", "user_id", "role"]
 
 
-class TeamSerializer(serializers.ModelSerializer):
+class TeamSerializer(SparseFieldsMixin, serializers.ModelSerializer):
     members = TeamMemberSerializer(many=True, read_only=True, source="team_members")
     joinRequests = serializers.ListField(source="join_requests", required=False)  # camelCase
     projectIds = serializers.ListField(source="project_ids", read_only=True)       # camelCase
@@ -233,19 +281,20 @@ class TeamSerializer(serializers.ModelSerializer):
         TeamMember.objects.create(user=user, team=team, role="admin")
         return team
 
-class ProjectSerializer(serializers.ModelSerializer):
+class ProjectSerializer(SparseFieldsMixin, serializers.ModelSerializer):
     tasks = serializers.SerializerMethodField()
     columns = serializers.SerializerMethodField()
     columnOrder = serializers.SerializerMethodField() # Computed field
-    chatMessages = serializers.SerializerMethodField() # Computed field
 
     team = serializers.PrimaryKeyRelatedField(queryset=Team.objects.all(), write_only=True)
-    teamId = serializers.UUIDField(source="team.id", read_only=True)
+    teamId = serializers.UUIDField(source="team_id", read_only=True)
 
     class Meta:
         model = Project
-        fields = ["id", "name", "description", "team", "teamId", "tasks", "columns", "columnOrder", "chatMessages"]
+        fields = ["id", "name", "description", "team", "teamId", "tasks", "columns", "columnOrder"]
 
+    # Load instances with prefetch.PROJECT_PREFETCH first; the getters below only
+    # use .all() and sort in Python so they are served from the prefetch cache.
     def get_tasks(self, obj):
         # return a dict keyed by task ID
         return { str(task.id): TaskSerializer(task).data for task in obj.tasks.all() }
@@ -257,13 +306,10 @@ class ProjectSerializer(serializers.ModelSerializer):
         }
 
     def get_columnOrder(self, obj):
-        return [str(col.id) for col in obj.columns.order_by("order")]
-    
-    def get_chatMessages(self, obj):
-        return [ChatMessageSerializer(msg).data for msg in obj.chat_messages.all().order_by('timestamp')]
+        return [str(col.id) for col in sorted(obj.columns.all(), key=lambda c: c.order)]
 
 
-class DirectMessageSerializer(serializers.ModelSerializer):
+class DirectMessageSerializer(SparseFieldsMixin, serializers.ModelSerializer):
     senderId = serializers.PrimaryKeyRelatedField(queryset=User.objects.all(), source="sender", required=False)
     receiverId = serializers.PrimaryKeyRelatedField(queryset=User.objects.all(), source="receiver")
     replyTo = serializers.SerializerMethodField()
@@ -283,16 +329,29 @@ class DirectMessageSerializer(serializers.ModelSerializer):
                 "id": str(obj.reply_to.id),
                 "content": obj.reply_to.content,
                 "timestamp": obj.reply_to.timestamp,
-                "senderId": str(obj.reply_to.sender.id),
+                "senderId": str(obj.reply_to.sender_id),
             }
         return None
     
     def get_attachments(self, obj):
-        if not obj.attachments:
-            return []
+        return _message_attachments(self, obj)
 
-        attachments = Attachment.objects.filter(id__in=obj.attachments)
-        return AttachmentSerializer(attachments, many=True).data
+
+class ConversationSerializer(SparseFieldsMixin, serializers.ModelSerializer):
+    """Inbox entry: the conversation partner, last message and unread count."""
+    partnerId = serializers.UUIDField(source="partner_id", read_only=True)
+    lastMessage = serializers.SerializerMethodField()
+    lastMessageAt = serializers.DateTimeField(source="last_message_at", read_only=True)
+    unreadCount = serializers.IntegerField(source="unread_count", read_only=True)
+
+    class Meta:
+        model = Conversation
+        fields = ["id", "partnerId", "lastMessage", "lastMessageAt", "unreadCount"]
+
+    def get_lastMessage(self, obj):
+        if obj.last_message is None:
+            return None
+        return DirectMessageSerializer(obj.last_message, context=self.context).data
 
 
 class PushTokenSerializer(serializers.ModelSerializer):
@@ -301,7 +360,7 @@ class PushTokenSerializer(serializers.ModelSerializer):
         fields = ["id", "user", "token", "platform", "created_at"]
 
 
-class NotificationSerializer(serializers.ModelSerializer):
+class NotificationSerializer(SparseFieldsMixin, serializers.ModelSerializer):
     actor = NestedUserSerializer(read_only=True)
     class Meta:
         model = Notification
@@ -309,7 +368,7 @@ class NotificationSerializer(serializers.ModelSerializer):
         read_only_fields = ["id", "created_at"]
 
 
-class FolderSerializer(serializers.ModelSerializer):
+class FolderSerializer(SparseFieldsMixin, serializers.ModelSerializer):
     """Serializer for user folders that organize projects."""
     projectIds = serializers.JSONField(source="project_ids", required=False)
 
@@ -0,0 +1,74 @@
+"""Incremental JSON output for large responses.
+
+`iter_json_object` writes a JSON object from `(key, value)` pairs as it goes;
+values wrapped in `ObjectStream` are themselves written pair by pair, so a
+response body never has to exist in memory as a whole. `streaming_response`
+wraps the chunks in a `StreamingHttpResponse`. Under ASGI the generator is
+driven one step at a time in the sync thread (a plain sync iterator would be
+buffered in full by Django before sending), under WSGI it is passed through.
+"""
+import json
+from asgiref.sync import sync_to_async
+from django.core.handlers.asgi import ASGIRequest
+from django.http import StreamingHttpResponse
+from rest_framework.utils.encoders import JSONEncoder
+
+# Flush to the client once this many characters have accumulated
+BUFFER_SIZE = 16 * 1024
+
+
+class ObjectStream:
+    """Marks an iterable of `(key, value)` pairs to be written as a nested JSON object."""
+
+    def __init__(self, pairs):
+        self.pairs = pairs
+
+
+def dumps(value) -> str:
+    # same encoding as DRF's JSONRenderer (UUIDs, datetimes, decimals, compact)
+    return json.dumps(value, cls=JSONEncoder, ensure_ascii=False, separators=(",", ":"))
+
+
+def iter_json_object(pairs):
+    """Yield the JSON text of an object built from `(key, value)` pairs, piece by piece."""
+    yield "{"
+    first = True
+    for key, value in pairs:
+        yield ("" if first else ",") + dumps(str(key)) + ":"
+        first = False
+        if isinstance(value, ObjectStream):
+            yield from iter_json_object(value.pairs)
+        else:
+            yield dumps(value)
+    yield "}"
+
+
+def _buffered(pieces, size=BUFFER_SIZE):
+    buffer, length = [], 0
+    for piece in pieces:
+        buffer.append(piece)
+        length += len(piece)
+        if length >= size:
+            yield "".join(buffer).encode("utf-8")
+            buffer, length = [], 0
+    if buffer:
+        yield "".join(buffer).encode("utf-8")
+
+
+async def _iterate_in_sync_thread(chunks):
+    it = iter(chunks)
+    step = sync_to_async(next, thread_sensitive=True)
+    done = object()
+    while True:
+        chunk = await step(it, done)
+        if chunk is done:
+            break
+        yield chunk
+
+
+def streaming_response(request, pairs) -> StreamingHttpResponse:
+    """Stream the JSON object built from `pairs` as the response body."""
+    chunks = _buffered(iter_json_object(pairs))
+    if isinstance(getattr(request, "_request", request), ASGIRequest):
+        chunks = _iterate_in_sync_thread(chunks)
+    return StreamingHttpResponse(chunks, content_type="application/json")
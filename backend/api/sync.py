@@ -0,0 +1,155 @@
+"""Delta-sync helpers for the `/api/data/` snapshot endpoint.
+
+Clients pass back the opaque `cursor` returned by the previous snapshot as
+`?since=<cursor>` and receive only the entities that changed after it, plus
+the ids of anything deleted in the meantime. Project payloads are the unit of
+change: any write inside a project (tasks, columns, subtasks, comments, chat)
+bumps `Project.updated_at` through `touch_project`, and the whole project is
+resent. Deletions are read from the change log (`ChangeEvent`).
+
+Cheap version fingerprints (`snapshot_version`, `project_versions`) serve as
+ETags, so unchanged data can be answered with a 304 without serializing
+anything. They are built from per-scope counters (`Project.version`,
+`Team.version`, `User.version`) incremented with `UPDATE ... SET version =
+version + 1` in the same transaction as each write. A reader therefore sees
+a new version exactly when it can see the data behind it, unlike
+change-log ids, which are handed out before commit and can become visible
+out of order.
+"""
+import hashlib
+from datetime import datetime, timedelta, timezone as dt_timezone
+from django.conf import settings
+from django.db.models import Count, F, Max, Q, Sum
+from django.utils import timezone
+from .models import ChangeEvent, Comment, Project, TaskAssignee, Team, User
+
+# Cursors are rewound by this much so rows committed by a transaction that
+# started before the cursor was issued are not missed. Resending a few
+# entities twice is harmless because clients merge by id.
+CURSOR_OVERLAP = timedelta(seconds=2)
+
+# Change-log entity name -> snapshot section it is deleted from
+SECTION_FOR_ENTITY = {
+    "team": "teams",
+    "project": "projects",
+    "directMessage": "directMessages",
+    "notification": "notifications",
+    "folder": "folders",
+}
+
+
+class InvalidCursor(ValueError):
+    pass
+
+
+def encode_cursor(moment: datetime) -> str:
+    """Encode a timestamp as an opaque cursor (epoch microseconds)."""
+    return str(int(moment.timestamp() * 1_000_000))
+
+
+def decode_cursor(cursor: str) -> datetime:
+    """Decode a cursor produced by `encode_cursor`, rewound by CURSOR_OVERLAP."""
+    try:
+        micros = int(cursor)
+    except (TypeError, ValueError):
+        raise InvalidCursor(cursor)
+    if micros < 0:
+        raise InvalidCursor(cursor)
+    moment = datetime.fromtimestamp(micros / 1_000_000, tz=dt_timezone.utc)
+    return moment - CURSOR_OVERLAP
+
+
+def is_expired(since: datetime) -> bool:
+    """True when the change log may already be compacted past `since`.
+
+    Deletes older than the retention window are gone, so such clients must
+    take a full snapshot instead of a delta.
+    """
+    retention = timedelta(days=getattr(settings, 'CHANGE_EVENT_RETENTION_DAYS', 7))
+    return since < timezone.now() - retention
+
+
+def touch_project(project_id):
+    """Mark a project as changed without loading it."""
+    if project_id:
+        Project.objects.filter(id=project_id).update(updated_at=timezone.now(), version=F("version") + 1)
+
+
+def touch_team(team_id):
+    """Mark a team as changed (membership, join requests) without loading it."""
+    if team_id:
+        Team.objects.filter(id=team_id).update(updated_at=timezone.now(), version=F("version") + 1)
+
+
+def touch_users(user_ids, profile=False):
+    """Bump the version of users who got a change only they see (DMs, notifications, folders).
+
+    With `profile=True` (the users' own name or avatar changed) the projects
+    embedding them as task assignees or comment authors are marked as changed
+    too, so their cached payloads and ETags move on.
+    """
+    user_ids = list(dict.fromkeys(user_ids))
+    if not user_ids:
+        return
+    User.objects.filter(id__in=user_ids).update(version=F("version") + 1)
+    if profile:
+        Project.objects.filter(
+            Q(id__in=TaskAssignee.objects.filter(user_id__in=user_ids).values("task__project_id"))
+            | Q(id__in=Comment.objects.filter(author_id__in=user_ids).values("task__project_id"))
+        ).update(updated_at=timezone.now(), version=F("version") + 1)
+
+
+def deleted_since(user, team_ids, since: datetime) -> dict:
+    """Return `{section: [object_id, ...]}` for deletes visible to `user` after `since`."""
+    deleted = {section: [] for section in SECTION_FOR_ENTITY.values()}
+    rows = ChangeEvent.objects.filter(
+        Q(user_id=user.id) | Q(team_id__in=list(team_ids)),
+        op="delete",
+        entity__in=list(SECTION_FOR_ENTITY),
+        created_at__gt=since,
+    ).values_list("entity", "entity_id")
+    for entity, entity_id in rows:
+        section = deleted[SECTION_FOR_ENTITY[entity]]
+        oid = str(entity_id)
+        if oid not in section:
+            section.append(oid)
+    return deleted
+
+
+def _fingerprint(*parts) -> str:
+    return hashlib.sha1(repr(parts).encode("utf-8")).hexdigest()
+
+
+def snapshot_version(user, team_ids, *extra, sections=None) -> str:
+    """Version of everything in a user's `/api/data/` snapshot.
+
+    Built from the user's own version counter, the counters of their teams
+    and of those teams' projects (summed: counters only grow, so any bump
+    changes the sum), and the newest profile change among the users it lists;
+    `extra` carries request options that change the payload shape (e.g. the
+    `since` cursor). Project counters are only read when `sections` (the
+    snapshot sections requested, default all) includes projects.
+    """
+    team_ids = sorted(str(tid) for tid in team_ids)
+    user_version = User.objects.filter(id=user.id).values_list("version", flat=True).first()
+    teams = Team.objects.filter(id__in=team_ids).aggregate(version=Sum("version"))
+    projects = {"version": None, "count": None}
+    if sections is None or "projects" in sections:
+        projects = Project.objects.filter(team_id__in=team_ids).aggregate(version=Sum("version"), count=Count("id"))
+    last_profile = User.objects.filter(
+        Q(id=user.id) | Q(teammember__team__in=team_ids)
+    ).aggregate(at=Max("updated_at"))["at"]
+    return _fingerprint(
+        str(user.id), team_ids, user_version, teams["version"], projects["version"], projects["count"],
+        last_profile, *extra,
+    )
+
+
+def project_versions(projects) -> dict:
+    """Return `{project_id: version}` for project payloads, without a query."""
+    return {p.id: _fingerprint(str(p.id), p.version) for p in projects}
+
+
+def project_version(project) -> str:
+    """Version of a single project payload (`ProjectViewSet.retrieve`)."""
+    return project_versions([project])[project.id]
@@ -0,0 +1,86 @@
+"""Indexed tag storage.
+
+`Task.tags` stays the array the API reads and writes. Alongside it every
+project has one `Tag` row per tag name, counting the tasks that carry it, and
+`TaskTag` links tasks to those rows, so tag filters, autocomplete and usage
+counts are index lookups instead of scans over every task's JSON.
+
+Call `sync` after writing tasks' `tags` and `forget` before deleting tasks,
+inside the same transaction; both adjust counts incrementally.
+"""
+from collections import defaultdict
+from django.db.models import F
+from .models import Tag, TaskTag
+
+MAX_LENGTH = Tag._meta.get_field("name").max_length
+
+
+def normalize(tags) -> list:
+    """Tag names as stored: trimmed, non-empty, at most MAX_LENGTH long, without repeats."""
+    names = (str(tag).strip()[:MAX_LENGTH] for tag in tags or () if tag is not None)
+    return list(dict.fromkeys(name for name in names if name))
+
+
+def _adjust(deltas):
+    """Apply `{tag_id: delta}` count changes, dropping tags no task uses anymore."""
+    by_delta = defaultdict(list)
+    for tag_id, delta in deltas.items():
+        if delta:
+            by_delta[delta].append(tag_id)
+    for delta, tag_ids in by_delta.items():
+        Tag.objects.filter(id__in=tag_ids).update(task_count=F("task_count") + delta)
+    if any(delta < 0 for delta in by_delta):
+        Tag.objects.filter(id__in=list(deltas), task_count=0).delete()
+
+
+def sync(tasks):
+    """Make the tasks' `TaskTag` links and project tag counts match their `tags` arrays."""
+    tasks = [task for task in tasks if task.pk]
+    if not tasks:
+        return
+    linked = defaultdict(dict)  # task_id -> {name: link}
+    for link in TaskTag.objects.filter(task__in=tasks).select_related("tag"):
+        linked[link.task_id][link.tag.name] = link
+
+    wanted = {task.pk: set(normalize(task.tags)) for task in tasks}
+    needed = defaultdict(set)  # project_id -> names to link
+    for task in tasks:
+        needed[task.project_id] |= wanted[task.pk] - set(linked[task.pk])
+
+    tag_ids = {}
+    if any(needed.values()):
+        Tag.objects.bulk_create(
+            [Tag(project_id=pid, name=name) for pid, names in needed.items() for name in names],
+            ignore_conflicts=True,
+        )
+        for pid, names in needed.items():
+            if names:
+                for tag in Tag.objects.filter(project_id=pid, name__in=names).only("id", "project_id", "name"):
+                    tag_ids[(tag.project_id, tag.name)] = tag.id
+
+    deltas = defaultdict(int)
+    added, removed = [], []
+    for task in tasks:
+        for name in wanted[task.pk] - set(linked[task.pk]):
+            tag_id = tag_ids[(task.project_id, name)]
+            added.append(TaskTag(task_id=task.pk, tag_id=tag_id))
+            deltas[tag_id] += 1
+        for name, link in linked[task.pk].items():
+            if name not in wanted[task.pk]:
+                removed.append(link.id)
+                deltas[link.tag_id] -= 1
+    TaskTag.objects.bulk_create(added, batch_size=500)
+    if removed:
+        TaskTag.objects.filter(id__in=removed).delete()
+    _adjust(deltas)
+
+
+def forget(task_ids):
+    """Unlink tasks about to be deleted and lower their tags' counts."""
+    links = TaskTag.objects.filter(task_id__in=list(task_ids))
+    deltas = defaultdict(int)
+    for tag_id in links.values_list("tag_id", flat=True):
+        deltas[tag_id] -= 1
+    if deltas:
+        links.delete()
+        _adjust(deltas)
@@ -0,0 +1,320 @@
+"""Apply many task mutations in one request (`POST /tasks/batch/`).
+
+Operations are `{"op": "create" | "update" | "move" | "delete", ...}` dicts
+applied in order, all or nothing. Instead of per-task saves they are folded
+into a handful of bulk statements: one `bulk_create` for new tasks, one
+`bulk_update` for changed ones, one delete, one insert per many-to-many
+field and one change-log insert (`changes.record_many`).
+
+Placement (creates with a `columnId`, and moves) is worked out in memory:
+every target column is read and locked up front, before any operation, the
+operations are replayed against those task lists, and only the placed tasks get new ranks, spread between their
+fixed neighbours (`ranking.ranks_between`).
+"""
+from collections import defaultdict
+from django.conf import settings
+from django.utils import timezone
+from .models import Attachment, Column, Comment, Task
+from .prefetch import TASK_PREFETCH
+from .serializers import TaskSerializer
+from . import changes, ranking, tags
+
+OPERATIONS = ("create", "update", "move", "delete")
+M2M_FIELDS = ("assignees", "attachments", "comments")
+
+
+class BatchError(Exception):
+    """An operation could not be applied; nothing in the batch was."""
+
+    def __init__(self, index, message, conflict=None):
+        super().__init__(message)
+        self.index = index
+        self.message = message
+        self.conflict = conflict  # current placement of a task moved concurrently
+
+    def as_response_data(self):
+        data = {"error": self.message, "index": self.index}
+        if self.conflict:
+            data["conflict"] = self.conflict
+        return data
+
+
+class _Column:
+    """A target column's tasks as `[task_id, rank, placed]` entries, in board order."""
+
+    def __init__(self, column, entries=()):
+        self.column = column
+        self.entries = [[task_id, rank, False] for task_id, rank in entries]
+
+    def remove(self, task_id):
+        self.entries = [e for e in self.entries if e[0] != task_id]
+
+    def insert(self, task_id, position):
+        if position is None or position < 0 or position > len(self.entries):
+            position = len(self.entries)
+        self.entries.insert(position, [task_id, None, True])
+
+    def assign_ranks(self) -> dict:
+        """Rank the placed entries between their neighbours; returns `{task_id: rank}` of changed rows.
+
+        If some run of placed tasks has no gap left (equal or exhausted
+        neighbour ranks), the whole column is spread evenly instead.
+        """
+        max_length = Task._meta.get_field("rank").max_length
+        changed = {}
+        i = 0
+        while i < len(self.entries):
+            if not self.entries[i][2]:
+                i += 1
+                continue
+            j = i
+            while j < len(self.entries) and self.entries[j][2]:
+                j += 1
+            before = self.entries[i - 1][1] if i > 0 else None
+            after = self.entries[j][1] if j < len(self.entries) else None
+            try:
+                ranks = ranking.ranks_between(before, after, j - i)
+            except ValueError:
+                ranks = None
+            if ranks is None or any(len(rank) > max_length for rank in ranks):
+                return self._respread()
+            for entry, rank in zip(self.entries[i:j], ranks):
+                entry[1] = rank
+                changed[entry[0]] = rank
+            i = j
+        return changed
+
+    def _respread(self) -> dict:
+        ranks = ranking.ranks_between(None, None, len(self.entries))
+        for entry, rank in zip(self.entries, ranks):
+            entry[1] = rank
+        return {entry[0]: entry[1] for entry in self.entries}
+
+    def position_of(self, task_id):
+        return next(i for i, entry in enumerate(self.entries) if entry[0] == task_id)
+
+
+def _int_or_none(value, name, index):
+    if value is None:
+        return None
+    try:
+        return int(value)
+    except (TypeError, ValueError):
+        raise BatchError(index, f"{name} must be an integer")
+
+
+def apply(user, operations):
+    """Apply `operations`; call inside `transaction.atomic()`.
+
+    Returns `(result, assignments, deleted_urls)`: the response body, the new
+    `{assignee: [task, ...]}` assignments to notify about once committed, and
+    storage URLs of deleted attachments to remove once committed. Raises
+    BatchError, leaving the caller to roll back.
+    """
+    limit = getattr(settings, 'TASK_BATCH_MAX_OPERATIONS', 500)
+    if not isinstance(operations, list) or not operations:
+        raise BatchError(None, "operations must be a non-empty list")
+    if len(operations) > limit:
+        raise BatchError(None, f"at most {limit} operations per batch")
+    for index, op in enumerate(operations):
+        if not isinstance(op, dict) or op.get("op") not in OPERATIONS:
+            raise BatchError(index, f"op must be one of {', '.join(OPERATIONS)}")
+        if op["op"] != "create" and not op.get("id"):
+            raise BatchError(index, "id required")
+        if op["op"] == "move" and not op.get("toColumnId"):
+            raise BatchError(index, "toColumnId required")
+
+    # Lock every target column, then every existing task, in a fixed order
+    column_ids = {str(op.get("toColumnId") or op.get("columnId")) for op in operations
+                  if op["op"] in ("create", "move") and (op.get("toColumnId") or op.get("columnId"))}
+    columns = {str(c.id): c for c in Column.objects.select_for_update().filter(id__in=column_ids).order_by("id")}
+    task_ids = {str(op["id"]) for op in operations if op["op"] != "create"}
+    tasks = {
+        str(t.id): t for t in
+        Task.objects.select_for_update().filter(id__in=task_ids).select_related("project").order_by("id")
+    }
+    # `prefetch_related` would be evaluated before the lock; load assignees separately
+    assignees_before = defaultdict(set)
+    for task_id, user_id in Task.assignees.through.objects.filter(task_id__in=tasks).values_list("task_id", "user_id"):
+        assignees_before[str(task_id)].add(user_id)
+
+    now = timezone.now()
+    created, updated, deleted = [], {}, {}
+    update_fields = set()
+    m2m = {}  # (task_id, field) -> new related objects
+    placements = {}  # task_id -> _Column it was placed in
+    events = []
+    retagged = {}  # existing tasks whose tags changed
+
+    # Every target board is read before any operation runs, so a task moved
+    # out of a column earlier in the batch is never read back into it
+    entries = defaultdict(list)
+    for column_id, task_id, rank in (
+        Task.objects.filter(column_id__in=list(columns), archived=False)
+        .order_by("column_id", "rank", "id").values_list("column_id", "id", "rank")
+    ):
+        entries[str(column_id)].append((task_id, rank))
+    boards = {column_id: _Column(column, entries[column_id]) for column_id, column in columns.items()}
+
+    def place(task, column, position):
+        for other in boards.values():
+            other.remove(task.id)
+        target = boards[str(column.id)]
+        target.insert(task.id, position)
+        placements[str(task.id)] = target
+
+    for index, op in enumerate(operations):
+        kind = op["op"]
+        if kind == "create":
+            serializer = TaskSerializer(data=op)
+            if not serializer.is_valid():
+                raise BatchError(index, serializer.errors)
+            data = dict(serializer.validated_data)
+            related = {name: data.pop(name) for name in M2M_FIELDS if name in data}
+            task = Task(**data)
+            column = None
+            if op.get("columnId"):
+                column = columns.get(str(op["columnId"]))
+                if column is None or column.project_id != task.project_id:
+                    raise BatchError(index, "column not found in this project")
+                task.column = column
+                place(task, column, None)
+            created.append(task)
+            for name, objs in related.items():
+                m2m[(task.id, name)] = objs
+            events.append(("task", task.id, "create", task.project, {"columnId": str(column.id) if column else None}))
+            continue
+
+        task = tasks.get(str(op["id"]))
+        if task is None:
+            raise BatchError(index, "task not found")
+        if str(task.id) in deleted:
+            raise BatchError(index, "task was deleted earlier in this batch")
+
+        if kind == "update":
+            serializer = TaskSerializer(task, data=op, partial=True)
+            if not serializer.is_valid():
+                raise BatchError(index, serializer.errors)
+            data = dict(serializer.validated_data)
+            data.pop("project", None)  # tasks do not change project
+            if "tags" in data:
+                retagged[str(task.id)] = task
+            for name in M2M_FIELDS:
+                if name in data:
+                    m2m[(task.id, name)] = data.pop(name)
+            for name, value in data.items():
+                setattr(task, name, value)
+                update_fields.add(name)
+            updated[str(task.id)] = task
+            events.append(("task", task.id, "update", task.project, None))
+
+        elif kind == "move":
+            column = columns.get(str(op["toColumnId"]))
+            if column is None:
+                raise BatchError(index, "column not found")
+            if column.project_id != task.project_id:
+                raise BatchError(index, "column and task project mismatch")
+            if task.archived:
+                raise BatchError(index, "task is archived; restore it first")
+            position = _int_or_none(op.get("position"), "position", index)
+            expected = _int_or_none(op.get("expectedVersion"), "expectedVersion", index)
+            if expected is not None and expected != task.position_version:
+                raise BatchError(index, "task was moved by someone else", conflict={
+                    "taskId": str(task.id),
+                    "columnId": str(task.column_id) if task.column_id else None,
+                    "positionVersion": task.position_version,
+                })
+            from_column_id = task.column_id
+            task.column = column
+            task.position_version += 1
+            place(task, column, position)
+            update_fields.update(("column", "rank", "position_version"))
+            updated[str(task.id)] = task
+            events.append(("task", task.id, "move", task.project, {
+                "fromColumnId": str(from_column_id) if from_column_id else None,
+                "toColumnId": str(column.id),
+            }))
+
+        else:  # delete
+            for other in boards.values():
+                other.remove(task.id)
+            placements.pop(str(task.id), None)
+            updated.pop(str(task.id), None)
+            deleted[str(task.id)] = task
+            events.append(("task", task.id, "delete", task.project, None))
+
+    # Ranks for everything placed; other rows only change when a column was re-spread
+    new_ranks = {}
+    for target in boards.values():
+        new_ranks.update(target.assign_ranks())
+    by_id = {str(t.id): t for t in created}
+    by_id.update(updated)
+    respread = []
+    for task_id, rank in new_ranks.items():
+        task = by_id.get(str(task_id))
+        if task is not None:
+            task.rank = rank
+        elif str(task_id) not in deleted:
+            respread.append(Task(id=task_id, rank=rank))
+
+    # Writes
+    Task.objects.bulk_create(created, batch_size=500)
+    for task in updated.values():
+        task.updated_at = now
+    if updated:
+        Task.objects.bulk_update(list(updated.values()), sorted(update_fields | {"updated_at"}), batch_size=500)
+    if respread:
+        Task.objects.bulk_update(respread, ["rank"], batch_size=500)
+
+    assignments = defaultdict(list)
+    for name in M2M_FIELDS:
+        through = getattr(Task, name).through
+        field = Task._meta.get_field(name)
+        source, target = field.m2m_field_name(), field.m2m_reverse_field_name()
+        changed = {task_id: objs for (task_id, field_name), objs in m2m.items() if field_name == name}
+        changed = {task_id: objs for task_id, objs in changed.items() if str(task_id) not in deleted}
+        if not changed:
+            continue
+        through.objects.filter(**{f"{source}_id__in": list(changed)}).delete()
+        through.objects.bulk_create([
+            through(**{f"{source}_id": task_id, f"{target}_id": obj.pk})
+            for task_id, objs in changed.items() for obj in dict.fromkeys(objs)
+        ], batch_size=500)
+        if name == "assignees":
+            for task_id, objs in changed.items():
+                task = by_id[str(task_id)]
+                for assignee in dict.fromkeys(objs):
+                    if assignee.pk not in assignees_before.get(str(task_id), ()):
+                        assignments[assignee].append(task)
+
+    deleted_urls = []
+    if deleted:
+        # attachments and comments belong to their task, as in TaskViewSet.destroy
+        attachments = Attachment.objects.filter(task__in=list(deleted))
+        deleted_urls = list(attachments.values_list("url", flat=True))
+        attachments.delete()
+        Comment.objects.filter(task__in=list(deleted)).delete()
+        tags.forget(list(deleted))
+        Task.objects.filter(id__in=list(deleted)).delete()
+
+    tags.sync(created + [task for task_id, task in retagged.items() if task_id not in deleted])
+    changes.record_many(events, actor=user)
+
+    serialized_ids = [t.id for t in created] + [t.id for t in updated.values()]
+    fresh = {t.id: t for t in Task.objects.filter(id__in=serialized_ids).prefetch_related(*TASK_PREFETCH)}
+    result = {
+        "created": [TaskSerializer(fresh[t.id]).data for t in created],
+        "updated": [TaskSerializer(fresh[t.id]).data for t in updated.values()],
+        "moved": [
+            {
+                "taskId": task_id,
+                "columnId": str(target.column.id),
+                "position": target.position_of(by_id[task_id].id),
+                "positionVersion": by_id[task_id].position_version,
+            }
+            for task_id, target in placements.items()
+            if task_id in updated
+        ],
+        "deleted": list(deleted),
+    }
+    return result, assignments, deleted_urls
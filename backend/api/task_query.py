@@ -0,0 +1,131 @@
+"""Query-string filters for `GET /tasks/`.
+
+Each filter maps to one indexed predicate so a filtered list of a large
+project is read from the database page by page instead of shipped whole:
+`(project, completed)` and `(project, due_date)` on the task table,
+`(user, task)` on the assignee join table and `(tag, task)` on the tag links
+(see api.tags).
+"""
+import uuid
+from collections import defaultdict
+from datetime import datetime, time, timedelta
+from django.conf import settings
+from django.db.models import Exists, OuterRef
+from django.utils import timezone
+from django.utils.dateparse import parse_date, parse_datetime
+from .models import Project, Task, TaskAssignee, TaskTag
+from .serializers import NestedUserSerializer
+
+TRUE_VALUES = ("1", "true", "yes")
+FALSE_VALUES = ("0", "false", "no")
+PRIORITIES = {value for value, _ in Task.PRIORITY_CHOICES}
+
+
+def _uuid(value, name):
+    try:
+        return uuid.UUID(str(value))
+    except ValueError:
+        raise ValueError(f"invalid {name}")
+
+
+def _moment(value, name, end_of_day=False):
+    """A datetime from an ISO date or datetime; bare dates cover the whole day."""
+    moment = parse_datetime(value)
+    if moment is None:
+        day = parse_date(value)
+        if day is None:
+            raise ValueError(f"invalid {name}")
+        moment = datetime.combine(day, time.max if end_of_day else time.min)
+    if timezone.is_naive(moment):
+        moment = timezone.make_aware(moment)
+    return moment
+
+
+def filter_tasks(queryset, params, user):
+    """Apply `/tasks/` query parameters to `queryset`; raises ValueError naming a bad one.
+
+    `assignee` takes a user id or `me`; `priority` and `tag` take
+    comma-separated values (any of them matches); `due_before`/`due_after` take
+    ISO dates or datetimes (inclusive); `completed` takes true/false.
+    """
+    if params.get("project"):
+        queryset = queryset.filter(project_id=_uuid(params["project"], "project"))
+
+    if params.get("assignee"):
+        raw = params["assignee"]
+        assignee_id = user.id if raw == "me" else _uuid(raw, "assignee")
+        queryset = queryset.filter(Exists(
+            TaskAssignee.objects.filter(user_id=assignee_id, task_id=OuterRef("pk"))
+        ))
+
+    if params.get("priority"):
+        priorities = [p.strip() for p in params["priority"].split(",") if p.strip()]
+        if not set(priorities) <= PRIORITIES:
+            raise ValueError("invalid priority")
+        queryset = queryset.filter(priority__in=priorities)
+
+    if params.get("tag"):
+        names = [t.strip() for t in params["tag"].split(",") if t.strip()]
+        queryset = queryset.filter(
+            pk__in=TaskTag.objects.filter(tag__name__in=names).values("task_id")
+        )
+
+    if params.get("due_after"):
+        queryset = queryset.filter(due_date__gte=_moment(params["due_after"], "due_after"))
+    if params.get("due_before"):
+        queryset = queryset.filter(due_date__lte=_moment(params["due_before"], "due_before", end_of_day=True))
+
+    if params.get("completed"):
+        value = params["completed"].lower()
+        if value not in TRUE_VALUES + FALSE_VALUES:
+            raise ValueError("invalid completed")
+        queryset = queryset.filter(completed=value in TRUE_VALUES)
+
+    return queryset
+
+
+def calendar(user, params) -> list:
+    """Tasks due between `start` and `end` (ISO dates or datetimes, inclusive) across the user's projects.
+
+    `teams` (comma-separated ids) narrows the projects. Returns a lean
+    projection ordered by due date: enough to draw a calendar cell, not a
+    full task. The project ids are resolved first so the range is read from
+    the `(project, due_date)` index one project at a time.
+    """
+    if not params.get("start") or not params.get("end"):
+        raise ValueError("start and end required")
+    start = _moment(params["start"], "start")
+    end = _moment(params["end"], "end", end_of_day=True)
+    if end < start:
+        raise ValueError("end must not be before start")
+    if end - start > timedelta(days=getattr(settings, 'CALENDAR_MAX_DAYS', 62)):
+        raise ValueError("range too long")
+
+    projects = Project.objects.filter(team__team_members__user=user)
+    if params.get("teams"):
+        projects = projects.filter(team_id__in=[_uuid(t, "teams") for t in params["teams"].split(",") if t.strip()])
+    project_ids = list(projects.values_list("id", flat=True))
+
+    rows = list(
+        Task.objects.filter(project_id__in=project_ids, archived=False, due_date__gte=start, due_date__lte=end)
+        .order_by("due_date", "id")
+        .values("id", "title", "due_date", "priority", "completed", "project_id", "project__name", "project__team_id")
+    )
+    assignees = defaultdict(list)
+    links = TaskAssignee.objects.filter(task_id__in=[row["id"] for row in rows]).select_related("user")
+    for link in links:
+        assignees[link.task_id].append(NestedUserSerializer(link.user).data)
+    return [
+        {
+            "id": str(row["id"]),
+            "title": row["title"],
+            "dueDate": row["due_date"],
+            "priority": row["priority"],
+            "completed": row["completed"],
+            "projectId": str(row["project_id"]),
+            "projectName": row["project__name"],
+            "teamId": str(row["project__team_id"]),
+            "assignees": assignees[row["id"]],
+        }
+        for row in rows
+    ]
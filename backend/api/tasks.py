@@ -0,0 +1,14 @@
+"""Celery task registry for the api app.
+
+`app.autodiscover_tasks()` imports `<app>.tasks`; the tasks themselves live
+next to the code they belong to.
+"""
+from .notifications import (  # noqa: F401
+    deliver_notification_task, deliver_notifications_task, deliver_push_task, deliver_email_task, deliver_sms_task,
+    relay_notification_outbox,
+)
+from .changes import compact_change_events  # noqa: F401
+from .ranking import rebalance_column_task  # noqa: F401
+from .archive import archive_completed_tasks  # noqa: F401
+from .reminders import send_due_reminders_task  # noqa: F401
+from .digests import send_email_digests_task  # noqa: F401
@@ -1,3 +1,965 @@
-from django.test import TestCase
+import json
+import re
+import uuid
+from datetime import timedelta
+from pathlib import Path
+from types import SimpleNamespace
+from unittest import mock
 
-# Create your tests here.
\ No newline at end of file
+from django.core.cache import cache
+from django.db import connection, transaction
+from django.test import TestCase, override_settings
+from django.test.utils import CaptureQueriesContext
+from django.utils import timezone
+from rest_framework.test import APIClient
+
+from . import archive, changes, conversations, digests, notifications, ranking, realtime, reminders, sync, tags
+from .ranking import ranks_between
+from .models import (
+    User, Team, TeamMember, Project, Column, Task, Subtask, Attachment, Comment, ChatMessage, DirectMessage, Conversation,
+    Folder, Notification, NotificationOutbox, PushToken, ChangeEvent, HighWaterMark,
+)
+
+
+class SnapshotQueryCountTests(TestCase):
+    """`/api/data/` must load a snapshot in a fixed number of queries."""
+
+    def setUp(self):
+        cache.clear()
+        self.user = User.objects.create_user(email="owner@example.com", password="pass", name="Owner")
+        self.other = User.objects.create_user(email="other@example.com", password="pass", name="Other")
+        self.team = Team.objects.create(name="Team")
+        TeamMember.objects.create(team=self.team, user=self.user, role="admin")
+        TeamMember.objects.create(team=self.team, user=self.other)
+        self.client = APIClient()
+        self.client.force_authenticate(self.user)
+
+    def _add_project(self, n_tasks, n_messages):
+        project = Project.objects.create(name="Project", team=self.team)
+        column = Column.objects.create(project=project, title="To Do", order=0)
+        Column.objects.create(project=project, title="Done", order=1)
+        for i, rank in enumerate(ranks_between(None, None, n_tasks)):
+            task = Task.objects.create(project=project, title=f"Task {i}", column=column, rank=rank)
+            task.assignees.add(self.user, self.other)
+            task.attachments.add(Attachment.objects.create(name="a.txt", url="attachments/a.txt"))
+            task.comments.add(Comment.objects.create(author=self.other, content="comment"))
+            Subtask.objects.create(task=task, title="sub")
+
+        previous = None
+        for i in range(n_messages):
+            att = Attachment.objects.create(name="m.txt", url="attachments/m.txt")
+            previous = ChatMessage.objects.create(
+                project=project, author=self.other, content=f"msg {i}",
+                attachments=[str(att.id)], reply_to=previous,
+            )
+            att = Attachment.objects.create(name="d.txt", url="attachments/d.txt")
+            DirectMessage.objects.create(
+                sender=self.other, receiver=self.user, content=f"dm {i}", attachments=[str(att.id)],
+            )
+
+    def _count_snapshot_queries(self, **params):
+        with CaptureQueriesContext(connection) as ctx:
+            response = self.client.get("/api/data/", params)
+        self.assertEqual(response.status_code, 200)
+        return len(ctx.captured_queries), response.json()
+
+    def test_query_count_independent_of_data_size(self):
+        self._add_project(n_tasks=2, n_messages=2)
+        small, _ = self._count_snapshot_queries()
+        small_dms, _ = self._count_snapshot_queries(include="directMessages")
+
+        self._add_project(n_tasks=25, n_messages=25)
+        self._add_project(n_tasks=10, n_messages=40)
+        large, data = self._count_snapshot_queries()
+        large_dms, dms = self._count_snapshot_queries(include="directMessages")
+
+        self.assertEqual(small, large)
+        self.assertEqual(small_dms, large_dms)
+        self.assertEqual(len(data["projects"]), 3)
+        # DM history is opt-in, it is paged per conversation instead
+        self.assertNotIn("directMessages", data)
+        self.assertEqual(len(dms["directMessages"]), 67)
+
+    def test_prefetched_payload_shape(self):
+        self._add_project(n_tasks=1, n_messages=2)
+        _, data = self._count_snapshot_queries()
+        project = next(iter(data["projects"].values()))
+
+        self.assertEqual(len(project["columnOrder"]), 2)
+        self.assertEqual(project["teamId"], str(self.team.id))
+        self.assertNotIn("chatMessages", project)
+        task = next(iter(project["tasks"].values()))
+        self.assertEqual(len(task["assignees"]), 2)
+        self.assertEqual(task["comments"][0]["author"]["name"], "Other")
+        _, data = self._count_snapshot_queries(include="directMessages")
+        dm = next(iter(data["directMessages"].values()))
+        self.assertEqual(dm["attachments"][0]["name"], "d.txt")
+
+    @override_settings(SNAPSHOT_STREAM_CHUNK_SIZE=3)
+    def test_streamed_snapshot_matches_buffered(self):
+        self._add_project(n_tasks=2, n_messages=4)
+        self._add_project(n_tasks=1, n_messages=3)
+        _, buffered = self._count_snapshot_queries()
+
+        response = self.client.get("/api/data/?stream=1")
+        self.assertTrue(response.streaming)
+        streamed = json.loads(b"".join(response.streaming_content))
+        buffered.pop("cursor"), streamed.pop("cursor")
+        self.assertEqual(streamed, buffered)
+
+    def test_include_and_sparse_fields(self):
+        self._add_project(n_tasks=1, n_messages=2)
+        with CaptureQueriesContext(connection) as ctx:
+            data = self.client.get("/api/data/?include=directMessages").json()
+        self.assertEqual(set(data), {"directMessages", "cursor"})
+        self.assertFalse(any('"api_project"' in q["sql"] for q in ctx.captured_queries))
+
+        with CaptureQueriesContext(connection) as ctx:
+            data = self.client.get("/api/data/?include=projects&fields[projects]=name,teamId").json()
+        project = next(iter(data["projects"].values()))
+        self.assertEqual(set(project), {"id", "name", "teamId"})
+        self.assertFalse(any('"api_task"' in q["sql"] for q in ctx.captured_queries))
+
+        response = self.client.get("/api/data/?fields[projects]=nope")
+        self.assertEqual(response.status_code, 400)
+
+
+class DeltaSyncTests(TestCase):
+    def setUp(self):
+        self.user = User.objects.create_user(email="owner@example.com", password="pass", name="Owner")
+        self.team = Team.objects.create(name="Team")
+        TeamMember.objects.create(team=self.team, user=self.user, role="admin")
+        self.kept = Project.objects.create(name="Kept", team=self.team)
+        self.changed = Project.objects.create(name="Changed", team=self.team)
+        self.gone = Project.objects.create(name="Gone", team=self.team)
+        self.folder = Folder.objects.create(user=self.user, name="Folder")
+        # everything above was synced by the client an hour ago
+        hour_ago = timezone.now() - timedelta(hours=1)
+        for model in (User, Team, Project, Folder):
+            model.objects.update(updated_at=hour_ago)
+        self.cursor = sync.encode_cursor(hour_ago + timedelta(minutes=5))
+        self.client = APIClient()
+        self.client.force_authenticate(self.user)
+
+    def test_delta_holds_upserts_and_deletes_since_the_cursor(self):
+        task = Task.objects.create(project=self.changed, title="New")
+        changes.record("task", task.id, "create", project=self.changed)
+        data = self.client.get("/api/data/", {"since": self.cursor}).json()
+        self.assertEqual(list(data["projects"]), [str(self.changed.id)])
+        self.assertEqual(list(data["projects"][str(self.changed.id)]["tasks"]), [str(task.id)])
+        self.assertEqual(data["folders"], {})
+        self.assertEqual(data["deleted"], {section: [] for section in data["deleted"]})
+
+        # deleting a project changes its team, so the team's remaining projects are resent
+        gone_id, folder_id = self.gone.id, self.folder.id
+        changes.record("project", gone_id, "delete", team_id=self.team.id)
+        self.gone.delete()
+        changes.record("folder", folder_id, "delete", user_ids=[self.user.id])
+        self.folder.delete()
+        data = self.client.get("/api/data/", {"since": self.cursor}).json()
+        self.assertEqual(set(data["projects"]), {str(self.kept.id), str(self.changed.id)})
+        self.assertEqual(data["deleted"]["projects"], [str(gone_id)])
+        self.assertEqual(data["deleted"]["folders"], [str(folder_id)])
+        self.assertEqual(data["folders"], {})
+        self.assertTrue(data["cursor"])
+
+    def test_expired_cursor_gets_a_full_snapshot(self):
+        stale = sync.encode_cursor(timezone.now() - timedelta(days=8))
+        with override_settings(CHANGE_EVENT_RETENTION_DAYS=7):
+            data = self.client.get("/api/data/", {"since": stale}).json()
+        self.assertNotIn("deleted", data)
+        self.assertEqual(len(data["projects"]), 3)
+        self.assertEqual(self.client.get("/api/data/", {"since": "nope"}).status_code, 400)
+
+
+class ChangeLogTests(TestCase):
+    def setUp(self):
+        self.user = User.objects.create_user(email="owner@example.com", password="pass", name="Owner")
+        self.other = User.objects.create_user(email="other@example.com", password="pass", name="Other")
+        self.team = Team.objects.create(name="Team")
+        self.other_team = Team.objects.create(name="Other team")
+        self.project = Project.objects.create(name="Project", team=self.team)
+
+    def _age(self, rows, **delta):
+        ChangeEvent.objects.filter(id__in=[row.id for row in rows]).update(created_at=timezone.now() - timedelta(**delta))
+
+    def test_rolled_back_mutation_leaves_no_events(self):
+        with self.assertRaises(RuntimeError), transaction.atomic():
+            changes.record("task", uuid.uuid4(), "create", project=self.project)
+            raise RuntimeError
+        self.assertFalse(ChangeEvent.objects.exists())
+
+    def test_deleted_since_only_sees_the_users_scopes(self):
+        since = timezone.now() - timedelta(minutes=1)
+        ids = [uuid.uuid4() for _ in range(5)]
+        changes.record("project", ids[0], "delete", team_id=self.team.id)
+        changes.record("project", ids[1], "delete", team_id=self.other_team.id)
+        changes.record("folder", ids[2], "delete", user_ids=[self.user.id])
+        changes.record("folder", ids[3], "delete", user_ids=[self.other.id])
+        changes.record("folder", ids[4], "update", user_ids=[self.user.id])
+        deleted = sync.deleted_since(self.user, [self.team.id], since)
+        self.assertEqual(deleted["projects"], [str(ids[0])])
+        self.assertEqual(deleted["folders"], [str(ids[2])])
+        self.assertEqual(sync.deleted_since(self.user, [self.team.id], timezone.now())["projects"], [])
+
+    @override_settings(CHANGE_EVENT_RETENTION_DAYS=7, CHANGE_EVENT_COMPACT_AFTER_HOURS=1)
+    def test_compact_drops_expired_and_collapses_superseded_events(self):
+        task_id = uuid.uuid4()
+        expired = changes.record("task", uuid.uuid4(), "update", project=self.project)
+        self._age(expired, days=8)
+        old = [changes.record("task", task_id, "update", project=self.project, data={"n": n})[0] for n in range(3)]
+        self._age(old, hours=2)
+        recent = [changes.record("task", task_id, "update", project=self.project)[0] for _ in range(2)]
+
+        self.assertEqual(changes.compact(), 3)
+        self.assertEqual(
+            set(ChangeEvent.objects.values_list("id", flat=True)),
+            {old[-1].id} | {row.id for row in recent},
+        )
+        self.assertEqual(changes.compact(), 0)
+
+    @override_settings(CHANGE_EVENT_RETENTION_DAYS=7)
+    def test_cursor_expires_with_the_retention_window(self):
+        self.assertFalse(sync.is_expired(timezone.now() - timedelta(days=6)))
+        self.assertTrue(sync.is_expired(timezone.now() - timedelta(days=8)))
+
+
+class ETagTests(TestCase):
+    def setUp(self):
+        cache.clear()
+        self.user = User.objects.create_user(email="owner@example.com", password="pass", name="Owner")
+        team = Team.objects.create(name="Team")
+        TeamMember.objects.create(team=team, user=self.user, role="admin")
+        self.project = Project.objects.create(name="Project", team=team)
+        self.column = Column.objects.create(project=self.project, title="To Do", order=0)
+        self.client = APIClient()
+        self.client.force_authenticate(self.user)
+
+    def _revalidate(self, url, etag):
+        with CaptureQueriesContext(connection) as ctx:
+            response = self.client.get(url, HTTP_IF_NONE_MATCH=etag)
+        return response, ctx.captured_queries
+
+    def test_unchanged_data_is_a_304_until_a_write(self):
+        for url in ("/api/data/", f"/api/projects/{self.project.id}/"):
+            etag = self.client.get(url)["ETag"]
+            response, queries = self._revalidate(url, etag)
+            self.assertEqual(response.status_code, 304)
+            self.assertFalse(any('"api_task"' in q["sql"] for q in queries))
+
+            task = Task.objects.create(project=self.project, title="New", column=self.column)
+            changes.record("task", task.id, "create", project=self.project)
+            response, _ = self._revalidate(url, etag)
+            self.assertEqual(response.status_code, 200)
+            self.assertNotEqual(response["ETag"], etag)
+
+    def test_user_scoped_changes_change_the_snapshot_etag(self):
+        etag = self.client.get("/api/data/")["ETag"]
+        folder = Folder.objects.create(user=self.user, name="Mine")
+        changes.record("folder", folder.id, "create", user_ids=[self.user.id])
+        self.assertEqual(self._revalidate("/api/data/", etag)[0].status_code, 200)
+
+    def test_version_does_not_depend_on_change_log_ids(self):
+        # the ETag follows the scope counters, not the newest change-log id (ids can commit out of order)
+        etag = self.client.get("/api/data/")["ETag"]
+        with transaction.atomic():
+            sync.touch_project(self.project.id)
+        ChangeEvent.objects.all().delete()
+        self.assertEqual(self._revalidate("/api/data/", etag)[0].status_code, 200)
+
+
+class RealtimeReplayTests(TestCase):
+    def setUp(self):
+        self.user = User.objects.create_user(email="owner@example.com", password="pass", name="Owner")
+        self.other = User.objects.create_user(email="other@example.com", password="pass", name="Other")
+        self.team = Team.objects.create(name="Team")
+        TeamMember.objects.create(team=self.team, user=self.user)
+        self.project = Project.objects.create(name="Project", team=self.team)
+        self.foreign = Project.objects.create(name="Elsewhere", team=Team.objects.create(name="Other team"))
+
+    def _event(self, **scope):
+        return changes.record("task", Task.objects.create(project=self.project, title="T").id, "update", **scope)[0].id
+
+    def _replayed(self, after_seq):
+        return [e["seq"] for e in realtime._backlog(self.user.id, [self.team.id], [self.project.id], after_seq)]
+
+    def test_replays_only_the_users_scopes(self):
+        seen = self._event(project=self.project)
+        mine = [
+            self._event(project=self.project),
+            self._event(team_id=self.team.id),
+            self._event(user_ids=[self.user.id]),
+        ]
+        self._event(project=self.foreign)
+        self._event(user_ids=[self.other.id])
+        self.assertEqual(self._replayed(seen), [seen] + mine)
+
+    def test_resume_from_last_event_id_includes_late_commits(self):
+        old, late, seen, new = (self._event(project=self.project) for _ in range(4))
+        ChangeEvent.objects.filter(id=old).update(created_at=timezone.now() - timedelta(minutes=5))
+        # `late` drew its sequence number before `seen` but committed after the client saw `seen`
+        self.assertEqual(self._replayed(seen), [late, seen, new])
+
+    def test_backlog_over_the_limit_asks_for_a_resync(self):
+        seen = self._event(project=self.project)
+        for _ in range(2):
+            self._event(project=self.project)
+        with mock.patch.object(realtime, "BACKLOG_LIMIT", 2):
+            self.assertEqual(realtime._replay(self.user.id, [self.team.id], [self.project.id], seen), ([realtime.RESYNC], set()))
+        messages, seqs = realtime._replay(self.user.id, [self.team.id], [self.project.id], seen)
+        self.assertEqual(len(messages), 3)
+        self.assertTrue(messages[0].startswith(f"id: {min(seqs)}\nevent: change\n"))
+
+    @override_settings(CHANGE_EVENT_RETENTION_DAYS=7)
+    def test_compacted_or_expired_anchor_asks_for_a_resync(self):
+        seen = self._event(project=self.project)
+        self._event(project=self.project)
+        ChangeEvent.objects.filter(id=seen).update(created_at=timezone.now() - timedelta(days=8))
+        self.assertIsNone(realtime._backlog(self.user.id, [self.team.id], [self.project.id], seen))
+        ChangeEvent.objects.filter(id=seen).delete()
+        self.assertIsNone(realtime._backlog(self.user.id, [self.team.id], [self.project.id], seen))
+
+
+class ProjectPayloadCacheTests(TestCase):
+    def setUp(self):
+        cache.clear()
+        self.user = User.objects.create_user(email="owner@example.com", password="pass", name="Owner")
+        team = Team.objects.create(name="Team")
+        TeamMember.objects.create(team=team, user=self.user, role="admin")
+        self.project = Project.objects.create(name="Project", team=team)
+        self.column = Column.objects.create(project=self.project, title="To Do", order=0)
+        self.client = APIClient()
+        self.client.force_authenticate(self.user)
+
+    def test_unchanged_projects_are_served_from_cache(self):
+        self.client.get("/api/data/")
+        with CaptureQueriesContext(connection) as ctx:
+            self.client.get("/api/data/")
+        self.assertFalse(any('"api_task"' in q["sql"] for q in ctx.captured_queries))
+
+    def test_writes_refresh_the_cached_payload(self):
+        self.client.get("/api/data/")
+        with self.captureOnCommitCallbacks(execute=True):
+            self.client.post(
+                "/api/tasks/",
+                {"title": "New", "projectId": str(self.project.id), "columnId": str(self.column.id)},
+                format="json",
+            )
+        project = self.client.get("/api/data/").json()["projects"][str(self.project.id)]
+        self.assertEqual([t["title"] for t in project["tasks"].values()], ["New"])
+
+
+    def test_profile_edits_of_embedded_users_refresh_the_cached_payload(self):
+        assignee = User.objects.create_user(email="assignee@example.com", password="pass", name="Before")
+        task = Task.objects.create(project=self.project, column=self.column, title="Task")
+        task.assignees.add(assignee)
+        self.client.get("/api/data/")
+        self.client.force_authenticate(assignee)
+        self.client.patch(f"/api/users/{assignee.id}/", {"name": "After"}, format="json")
+        self.client.force_authenticate(self.user)
+        project = self.client.get("/api/data/").json()["projects"][str(self.project.id)]
+        self.assertEqual(project["tasks"][str(task.id)]["assignees"][0]["name"], "After")
+
+
+class ChatHistoryTests(TestCase):
+    def setUp(self):
+        self.user = User.objects.create_user(email="owner@example.com", password="pass", name="Owner")
+        team = Team.objects.create(name="Team")
+        TeamMember.objects.create(team=team, user=self.user)
+        self.project = Project.objects.create(name="Project", team=team)
+        self.client = APIClient()
+        self.client.force_authenticate(self.user)
+
+    def test_pages_walk_back_through_history(self):
+        previous = None
+        for i in range(5):
+            previous = ChatMessage.objects.create(
+                project=self.project, author=self.user, content=f"msg {i}", reply_to=previous,
+            )
+        url = f"/api/projects/{self.project.id}/chatmessages/"
+
+        page = self.client.get(url, {"limit": 2}).json()
+        self.assertEqual([m["content"] for m in page["messages"]], ["msg 3", "msg 4"])
+        self.assertEqual(page["messages"][1]["replyTo"]["content"], "msg 3")
+        page = self.client.get(url, {"limit": 2, "before": page["nextCursor"]}).json()
+        self.assertEqual([m["content"] for m in page["messages"]], ["msg 1", "msg 2"])
+        page = self.client.get(url, {"limit": 2, "before": page["nextCursor"]}).json()
+        self.assertEqual([m["content"] for m in page["messages"]], ["msg 0"])
+        self.assertIsNone(page["nextCursor"])
+
+        self.assertEqual(self.client.get(url, {"before": "garbage"}).status_code, 400)
+
+
+class ConversationTests(TestCase):
+    def setUp(self):
+        self.user = User.objects.create_user(email="owner@example.com", password="pass", name="Owner")
+        self.other = User.objects.create_user(email="other@example.com", password="pass", name="Other")
+        self.client = APIClient()
+
+    def _send(self, sender, receiver, content):
+        self.client.force_authenticate(sender)
+        return self.client.post("/api/messages/", {"receiverId": str(receiver.id), "content": content}).json()
+
+    def test_inbox_tracks_last_message_and_unread_count(self):
+        for i in range(3):
+            last = self._send(self.other, self.user, f"dm {i}")
+        self._send(self.user, self.other, "reply")
+
+        self.client.force_authenticate(self.other)
+        [entry] = self.client.get("/api/conversations/").json()["conversations"]
+        self.assertEqual((entry["partnerId"], entry["unreadCount"]), (str(self.user.id), 1))
+
+        self.client.force_authenticate(self.user)
+        [entry] = self.client.get("/api/conversations/").json()["conversations"]
+        self.assertEqual(entry["lastMessage"]["content"], "reply")
+        self.assertEqual(entry["unreadCount"], 3)
+
+        url = f"/api/conversations/{self.other.id}/"
+        page = self.client.get(url + "messages/", {"limit": 3}).json()
+        self.assertEqual([m["content"] for m in page["messages"]], ["dm 1", "dm 2", "reply"])
+        page = self.client.get(url + "messages/", {"limit": 3, "before": page["nextCursor"]}).json()
+        self.assertEqual([m["content"] for m in page["messages"]], ["dm 0"])
+        self.assertIsNone(page["nextCursor"])
+
+        self.assertEqual(self.client.post(url + "read/").json()["unreadCount"], 0)
+
+        reply = Conversation.objects.get(user=self.other).last_message
+        self.client.delete(f"/api/messages/{reply.id}/")
+        [entry] = self.client.get("/api/conversations/").json()["conversations"]
+        self.assertEqual(entry["lastMessage"]["id"], last["id"])
+
+
+    def test_first_message_tolerates_a_concurrently_created_row(self):
+        # a concurrent first message from the other side already inserted this participant's row
+        Conversation.objects.create(user=self.user, partner=self.other, unread_count=1)
+        message = DirectMessage.objects.create(sender=self.other, receiver=self.user, content="hi")
+        with transaction.atomic():
+            conversations.record_message(message)
+        self.assertEqual(Conversation.objects.get(user=self.user).unread_count, 2)
+        self.assertEqual(Conversation.objects.get(user=self.other).last_message, message)
+
+
+class TaskOrderingTests(TestCase):
+    def setUp(self):
+        self.user = User.objects.create_user(email="owner@example.com", password="pass", name="Owner")
+        team = Team.objects.create(name="Team")
+        TeamMember.objects.create(team=team, user=self.user)
+        self.project = Project.objects.create(name="Project", team=team)
+        self.todo = Column.objects.create(project=self.project, title="To Do", order=0)
+        self.done = Column.objects.create(project=self.project, title="Done", order=1)
+        self.tasks = [
+            Task.objects.create(project=self.project, title=f"Task {i}", column=self.todo, rank=rank)
+            for i, rank in enumerate(ranks_between(None, None, 3))
+        ]
+        self.client = APIClient()
+        self.client.force_authenticate(self.user)
+
+    def _move(self, task, column, position, expected_version=None, status=200):
+        body = {"toColumnId": str(column.id), "position": position}
+        if expected_version is not None:
+            body["expectedVersion"] = expected_version
+        response = self.client.patch(f"/api/tasks/{task.id}/move/", body, format="json")
+        self.assertEqual(response.status_code, status)
+        return response.json()
+
+    def _task_ids(self, column):
+        return [str(t.id) for t in Task.objects.filter(column=column).order_by("rank", "id")]
+
+    def test_move_rewrites_only_the_moved_task(self):
+        first, second, third = (str(t.id) for t in self.tasks)
+        with CaptureQueriesContext(connection) as ctx:
+            diff = self._move(self.tasks[2], self.todo, 0)
+        self.assertEqual(self._task_ids(self.todo), [third, first, second])
+        self.assertEqual((diff["position"], diff["positionVersion"]), (0, 1))
+        updates = [q["sql"] for q in ctx.captured_queries if q["sql"].startswith('UPDATE "api_task"')]
+        self.assertEqual(len(updates), 1)
+
+        self._move(self.tasks[0], self.done, None)
+        diff = self._move(self.tasks[1], self.done, 0)
+        self.assertEqual((diff["fromColumnId"], diff["columnId"]), (str(self.todo.id), str(self.done.id)))
+        self.assertEqual(self._task_ids(self.todo), [third])
+        self.assertEqual(self._task_ids(self.done), [second, first])
+
+    def test_stale_expected_version_is_a_conflict(self):
+        task = self.tasks[0]
+        self._move(task, self.done, 0, expected_version=0)
+        conflict = self._move(task, self.todo, 0, expected_version=0, status=409)
+        self.assertEqual((conflict["columnId"], conflict["positionVersion"]), (str(self.done.id), 1))
+        self._move(task, self.todo, 0, expected_version=conflict["positionVersion"])
+        self.assertEqual(self._task_ids(self.todo)[0], str(task.id))
+
+    def test_move_racing_past_the_version_check_is_a_conflict(self):
+        task = self.tasks[0]
+        rank_at = ranking.rank_at
+
+        def concurrent_move(*args, **kwargs):
+            # another request moves the task after this one read its version
+            Task.objects.filter(id=task.id).update(column=self.done, position_version=1)
+            return rank_at(*args, **kwargs)
+
+        with mock.patch.object(ranking, "rank_at", side_effect=concurrent_move):
+            conflict = self._move(task, self.todo, 2, expected_version=0, status=409)
+        self.assertEqual((conflict["columnId"], conflict["positionVersion"]), (str(self.done.id), 1))
+        self.assertEqual(Task.objects.get(id=task.id).column_id, self.done.id)
+
+    def test_equal_ranks_are_rebalanced_on_insert(self):
+        Task.objects.filter(column=self.todo).update(rank="")
+        self._move(self.tasks[2], self.todo, 1)
+        ranks = list(Task.objects.filter(column=self.todo).order_by("rank").values_list("rank", flat=True))
+        self.assertEqual(len(set(ranks)), 3)
+
+    def test_batch_applies_operations_in_one_transaction(self):
+        first, second, third = self.tasks
+        operations = [
+            {"op": "update", "id": str(first.id), "title": "Renamed", "priority": "high"},
+            {"op": "move", "id": str(second.id), "toColumnId": str(self.done.id), "position": 0},
+            {"op": "move", "id": str(third.id), "toColumnId": str(self.done.id), "position": 0, "expectedVersion": 0},
+            {"op": "create", "projectId": str(self.project.id), "columnId": str(self.todo.id), "title": "New"},
+            {"op": "delete", "id": str(first.id)},
+        ]
+        response = self.client.post("/api/tasks/batch/", {"operations": operations}, format="json")
+        self.assertEqual(response.status_code, 200)
+        body = response.json()
+        new_id = body["created"][0]["id"]
+        self.assertEqual(body["deleted"], [str(first.id)])
+        self.assertEqual(self._task_ids(self.todo), [new_id])
+        self.assertEqual(self._task_ids(self.done), [str(third.id), str(second.id)])
+        self.assertEqual({m["taskId"]: m["position"] for m in body["moved"]}, {str(third.id): 0, str(second.id): 1})
+
+        # a stale version rolls back the whole batch
+        operations = [
+            {"op": "update", "id": new_id, "title": "Not saved"},
+            {"op": "move", "id": str(third.id), "toColumnId": str(self.todo.id), "expectedVersion": 0},
+        ]
+        response = self.client.post("/api/tasks/batch/", {"operations": operations}, format="json")
+        self.assertEqual(response.status_code, 409)
+        self.assertEqual(response.json()["index"], 1)
+        self.assertEqual(Task.objects.get(id=new_id).title, "New")
+
+    def test_batch_move_into_a_column_after_moving_out_of_it(self):
+        first, second, third = (str(t.id) for t in self.tasks)
+        doing = Column.objects.create(project=self.project, title="Doing", order=2)
+        other = Task.objects.create(project=self.project, title="Other", column=self.done, rank="m")
+        operations = [
+            {"op": "move", "id": first, "toColumnId": str(doing.id)},
+            {"op": "move", "id": str(other.id), "toColumnId": str(self.todo.id), "position": 2},
+        ]
+        body = self.client.post("/api/tasks/batch/", {"operations": operations}, format="json").json()
+        self.assertEqual(self._task_ids(self.todo), [second, third, str(other.id)])
+        self.assertEqual({m["taskId"]: m["position"] for m in body["moved"]}, {first: 0, str(other.id): 2})
+
+
+class ReorderTests(TestCase):
+    """Reordering columns and folders costs the same number of queries at any size."""
+
+    def setUp(self):
+        self.user = User.objects.create_user(email="owner@example.com", password="pass", name="Owner")
+        team = Team.objects.create(name="Team")
+        TeamMember.objects.create(team=team, user=self.user)
+        self.project = Project.objects.create(name="Project", team=team)
+        self.client = APIClient()
+        self.client.force_authenticate(self.user)
+
+    def _reorder_folders(self, n):
+        Folder.objects.filter(user=self.user).delete()
+        folders = [Folder.objects.create(user=self.user, name=f"Folder {i}", order=i) for i in range(n)]
+        new_order = [str(f.id) for f in reversed(folders)]
+        with CaptureQueriesContext(connection) as ctx:
+            response = self.client.post("/api/folders/reorder/", {"folderIds": new_order}, format="json")
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual([f["id"] for f in response.json()], new_order)
+        return len(ctx.captured_queries)
+
+    def test_folder_reorder_query_count_is_constant(self):
+        self.assertEqual(self._reorder_folders(3), self._reorder_folders(30))
+
+    def test_column_move_returns_canonical_order(self):
+        columns = [Column.objects.create(project=self.project, title=f"C{i}", order=i * 2) for i in range(4)]
+        a, b, c, d = (str(col.id) for col in columns)
+        response = self.client.put(
+            "/api/columns/move/", {"projectId": str(self.project.id), "newOrder": [c, a, "missing"]}, format="json",
+        )
+        self.assertEqual(response.json(), [c, a, b, d])
+        self.assertEqual(list(Column.objects.order_by("order").values_list("order", flat=True)), [0, 1, 2, 3])
+        response = self.client.put(
+            "/api/columns/move/", {"projectId": str(self.project.id), "newOrder": [a, a]}, format="json",
+        )
+        self.assertEqual(response.status_code, 400)
+
+
+class BoardWindowTests(TestCase):
+    """`/projects/<id>/board/` loads a fixed window per column, whatever the column sizes."""
+
+    def setUp(self):
+        self.user = User.objects.create_user(email="owner@example.com", password="pass", name="Owner")
+        team = Team.objects.create(name="Team")
+        TeamMember.objects.create(team=team, user=self.user)
+        self.project = Project.objects.create(name="Project", team=team)
+        self.todo = Column.objects.create(project=self.project, title="To Do", order=0)
+        self.done = Column.objects.create(project=self.project, title="Done", order=1)
+        self.client = APIClient()
+        self.client.force_authenticate(self.user)
+
+    def _fill(self, column, n):
+        Task.objects.bulk_create([
+            Task(project=self.project, title=f"{column.title} {i}", column=column, rank=rank)
+            for i, rank in enumerate(ranks_between(None, None, n))
+        ])
+
+    def _board(self, limit):
+        with CaptureQueriesContext(connection) as ctx:
+            response = self.client.get(f"/api/projects/{self.project.id}/board/?limit={limit}")
+        self.assertEqual(response.status_code, 200)
+        return response.json(), len(ctx.captured_queries)
+
+    def test_board_cost_does_not_grow_with_column_size(self):
+        self._fill(self.todo, 2)
+        self._fill(self.done, 3)
+        _, small = self._board(3)
+        self._fill(self.done, 200)
+        board, large = self._board(3)
+        self.assertEqual(small, large)
+
+        done = board["columns"][str(self.done.id)]
+        self.assertEqual((len(done["taskIds"]), done["taskCount"]), (3, 203))
+        self.assertEqual(len(board["tasks"]), 5)
+        todo = board["columns"][str(self.todo.id)]
+        self.assertEqual((todo["taskCount"], todo["nextCursor"]), (2, None))
+
+        # paging through the rest of the column yields every task once, in order
+        seen, cursor = list(done["taskIds"]), done["nextCursor"]
+        while cursor:
+            page = self.client.get(f"/api/columns/{self.done.id}/tasks/?limit=100&cursor={cursor}").json()
+            seen += [t["id"] for t in page["tasks"]]
+            cursor = page["nextCursor"]
+        expected = [str(t) for t in Task.objects.filter(column=self.done).order_by("rank", "id").values_list("id", flat=True)]
+        self.assertEqual(seen, expected)
+
+
+class ArchiveTests(TestCase):
+    def setUp(self):
+        self.user = User.objects.create_user(email="owner@example.com", password="pass", name="Owner")
+        team = Team.objects.create(name="Team")
+        TeamMember.objects.create(team=team, user=self.user)
+        self.project = Project.objects.create(name="Project", team=team)
+        self.column = Column.objects.create(project=self.project, title="Done", order=0)
+        self.client = APIClient()
+        self.client.force_authenticate(self.user)
+
+    def test_old_completed_tasks_leave_the_board_and_can_be_restored(self):
+        now = timezone.now()
+        old, recent, open_task = (
+            Task.objects.create(project=self.project, title=title, column=self.column, rank=rank, completed=completed, completed_at=at)
+            for title, rank, completed, at in [
+                ("Old", "4", True, now - timedelta(days=40)),
+                ("Recent", "8", True, now - timedelta(days=1)),
+                ("Open", "c", False, None),
+            ]
+        )
+        with override_settings(TASK_ARCHIVE_AFTER_DAYS=30):
+            self.assertEqual(archive.archive_completed(now=now), 1)
+
+        project = self.client.get(f"/api/projects/{self.project.id}/").json()
+        self.assertNotIn(str(old.id), project["tasks"])
+        self.assertEqual(project["columns"][str(self.column.id)]["taskIds"], [str(recent.id), str(open_task.id)])
+
+        found = self.client.get(f"/api/tasks/archived/?project={self.project.id}&q=old").json()
+        self.assertEqual([t["id"] for t in found["tasks"]], [str(old.id)])
+
+        restored = self.client.post(f"/api/tasks/{old.id}/restore/").json()
+        self.assertEqual((restored["archived"], restored["position"]), (False, 2))
+        self.assertEqual(self.client.get("/api/tasks/archived/").json()["tasks"], [])
+
+        # the next archive run leaves the restored task on the board
+        with override_settings(TASK_ARCHIVE_AFTER_DAYS=30):
+            self.assertEqual(archive.archive_completed(), 0)
+        self.assertFalse(Task.objects.get(id=old.id).archived)
+
+
+class TaskQueryTests(TestCase):
+    def setUp(self):
+        self.user = User.objects.create_user(email="owner@example.com", password="pass", name="Owner")
+        self.other = User.objects.create_user(email="other@example.com", password="pass", name="Other")
+        team = Team.objects.create(name="Team")
+        TeamMember.objects.create(team=team, user=self.user)
+        self.project = Project.objects.create(name="Project", team=team)
+        hidden = Project.objects.create(name="Other team", team=Team.objects.create(name="Other"))
+        now = timezone.now()
+        self.mine = Task.objects.create(project=self.project, title="Mine", priority="high", tags=["bug", "ui"],
+                                        due_date=now + timedelta(days=1))
+        self.mine.assignees.set([self.user])
+        self.theirs = Task.objects.create(project=self.project, title="Theirs", tags=["ui"], completed=True)
+        self.theirs.assignees.set([self.other])
+        Task.objects.create(project=hidden, title="Not visible", priority="high")
+        tags.sync([self.mine, self.theirs])
+        self.client = APIClient()
+        self.client.force_authenticate(self.user)
+
+    def _ids(self, query):
+        response = self.client.get(f"/api/tasks/?{query}")
+        self.assertEqual(response.status_code, 200, response.content)
+        return {t["id"] for t in response.json()["tasks"]}
+
+    def test_filters(self):
+        mine, theirs = str(self.mine.id), str(self.theirs.id)
+        self.assertEqual(self._ids(f"project={self.project.id}"), {mine, theirs})
+        self.assertEqual(self._ids("assignee=me"), {mine})
+        self.assertEqual(self._ids(f"assignee={self.other.id}"), {theirs})
+        self.assertEqual(self._ids("priority=high"), {mine})
+        self.assertEqual(self._ids("tag=ui"), {mine, theirs})
+        self.assertEqual(self._ids("tag=bug,missing"), {mine})
+        self.assertEqual(self._ids(f"due_after={timezone.now().date().isoformat()}"), {mine})
+        self.assertEqual(self._ids("completed=true"), {theirs})
+        self.assertEqual(self.client.get("/api/tasks/?priority=urgent").status_code, 400)
+
+    def test_tag_counts_follow_task_writes(self):
+        def usage():
+            return self.client.get(f"/api/projects/{self.project.id}/tags/").json()["tags"]
+
+        self.assertEqual(usage(), [{"name": "ui", "taskCount": 2}, {"name": "bug", "taskCount": 1}])
+        response = self.client.patch(f"/api/tasks/{self.theirs.id}/", {"tags": [" ops ", "ops", "ui"]}, format="json")
+        self.assertEqual(response.json()["tags"], ["ops", "ui"])
+        self.client.delete(f"/api/tasks/{self.mine.id}/")
+        self.assertEqual(usage(), [{"name": "ops", "taskCount": 1}, {"name": "ui", "taskCount": 1}])
+        self.assertEqual(self.client.get(f"/api/projects/{self.project.id}/tags/?q=o").json()["tags"],
+                         [{"name": "ops", "taskCount": 1}])
+        self.assertEqual(self._ids("tag=bug"), set())
+
+    def test_keyset_pages(self):
+        first = self.client.get("/api/tasks/?limit=1").json()
+        second = self.client.get(f"/api/tasks/?limit=1&cursor={first['nextCursor']}").json()
+        self.assertEqual(second["nextCursor"], None)
+        self.assertEqual({first["tasks"][0]["id"], second["tasks"][0]["id"]}, {str(self.mine.id), str(self.theirs.id)})
+
+    def test_calendar_returns_the_window_across_projects(self):
+        now = timezone.now()
+        self.theirs.due_date = now + timedelta(days=40)
+        self.theirs.save()
+        start, end = now.date().isoformat(), (now + timedelta(days=30)).date().isoformat()
+        response = self.client.get(f"/api/tasks/calendar/?start={start}&end={end}")
+        self.assertEqual(response.status_code, 200)
+        [task] = response.json()["tasks"]
+        self.assertEqual((task["id"], task["projectName"]), (str(self.mine.id), "Project"))
+        self.assertEqual([a["id"] for a in task["assignees"]], [str(self.user.id)])
+        self.assertEqual(self.client.get(f"/api/tasks/calendar/?start={end}&end={start}").status_code, 400)
+
+
+class DueReminderTests(TestCase):
+    def setUp(self):
+        self.user = User.objects.create_user(email="owner@example.com", password="pass", name="Owner")
+        team = Team.objects.create(name="Team")
+        self.project = Project.objects.create(name="Project", team=team)
+        self.now = timezone.now()
+
+    def _task(self, title, due_in):
+        task = Task.objects.create(project=self.project, title=title, due_date=self.now + due_in)
+        task.assignees.set([self.user])
+        return task
+
+    @override_settings(TASK_REMINDER_LEAD_MINUTES=60)
+    def test_each_due_date_is_reminded_once(self):
+        soon = self._task("Soon", timedelta(minutes=30))
+        self._task("Later", timedelta(hours=3))
+        self.assertEqual(reminders.send_due_reminders(now=self.now), 1)
+        self.assertEqual(reminders.send_due_reminders(now=self.now + timedelta(minutes=1)), 0)
+        self.assertEqual(Notification.objects.get().data["taskId"], str(soon.id))
+
+        # the window moves on, and a task moved into the part already scanned is still caught
+        late = self._task("Added late", timedelta(minutes=90))
+        Task.objects.filter(id=late.id).update(due_date=self.now + timedelta(minutes=45), updated_at=timezone.now())
+        self.assertEqual(reminders.send_due_reminders(now=self.now + timedelta(hours=2, minutes=30)), 1)
+        self.assertEqual(reminders.send_due_reminders(now=self.now + timedelta(minutes=10)), 1)
+        self.assertEqual(
+            sorted(Notification.objects.values_list("data__taskTitle", flat=True)), ["Added late", "Later", "Soon"],
+        )
+
+
+@override_settings(NOTIFICATION_COALESCE_SECONDS=0)
+class NotificationFanOutTests(TestCase):
+    def _users(self, start, stop):
+        return [
+            User.objects.create_user(email=f"member{i}@example.com", password="pass", name=f"Member {i}")
+            for i in range(start, stop)
+        ]
+
+    def _fan_out(self, users):
+        with CaptureQueriesContext(connection) as queries:
+            notifications.fan_out(users, None, "created_project", {"projectName": "P"}, ["push", "email"])
+        return len(queries)
+
+    @override_settings(NOTIFICATION_DELIVERY_BATCH_SIZE=4)
+    def test_one_insert_and_one_task_per_batch(self):
+        self.assertEqual(self._fan_out(self._users(0, 2)), self._fan_out(self._users(2, 10)))
+        self.assertEqual(Notification.objects.filter(verb="created_project").count(), 10)
+        with mock.patch.object(notifications.deliver_push_task, "delay") as push, \
+                mock.patch.object(notifications.deliver_email_task, "delay") as email:
+            self.assertEqual(notifications.drain_outbox(), 20)
+        # one task per channel and batch, each on its own queue
+        self.assertEqual([len(call.args[0]) for call in push.call_args_list], [4, 4, 2])
+        self.assertEqual(push.call_args_list, email.call_args_list)
+        self.assertFalse(NotificationOutbox.objects.filter(sent=False).exists())
+
+    def test_outbox_only_releases_committed_notifications(self):
+        users = self._users(0, 2)
+        with mock.patch.object(notifications.relay_notification_outbox, "delay") as nudge:
+            with self.captureOnCommitCallbacks(execute=True):
+                try:
+                    with transaction.atomic():
+                        notifications.fan_out(users, None, "created_project")
+                        raise RuntimeError("request failed")
+                except RuntimeError:
+                    pass
+            self.assertFalse(Notification.objects.exists())
+            self.assertEqual(nudge.call_count, 0)
+
+            with self.captureOnCommitCallbacks(execute=True):
+                notifications.fan_out(users, None, "created_project")
+            self.assertEqual(nudge.call_count, 1)
+
+        # the broker is down: the batch stays in the outbox for the next relay run
+        with mock.patch.object(notifications.deliver_push_task, "delay", side_effect=ConnectionError):
+            with self.assertRaises(ConnectionError):
+                notifications.drain_outbox()
+        self.assertEqual(NotificationOutbox.objects.filter(sent=False).count(), 2)
+
+    def test_failed_channel_does_not_resend_the_ones_already_queued(self):
+        notifications.fan_out(self._users(0, 2), None, "created_project", {"projectName": "P"}, ["push", "email"])
+        with mock.patch.object(notifications.deliver_push_task, "delay") as push, \
+                mock.patch.object(notifications.deliver_email_task, "delay", side_effect=ConnectionError):
+            with self.assertRaises(ConnectionError):
+                notifications.drain_outbox()
+        self.assertEqual(push.call_count, 1)
+        self.assertEqual(list(NotificationOutbox.objects.filter(sent=False).values_list("channel", flat=True)), ["email", "email"])
+
+        with mock.patch.object(notifications.deliver_push_task, "delay") as push, \
+                mock.patch.object(notifications.deliver_email_task, "delay") as email:
+            self.assertEqual(notifications.drain_outbox(), 2)
+        self.assertEqual(push.call_count, 0)
+        self.assertEqual(len(email.call_args.args[0]), 2)
+        self.assertFalse(NotificationOutbox.objects.filter(sent=False).exists())
+
+    @override_settings(NOTIFICATION_COALESCE_SECONDS=60)
+    def test_first_goes_out_at_once_and_follow_ups_as_one_digest(self):
+        alice, bob = self._users(0, 2)
+        for i in range(3):
+            notifications.enqueue_notification(alice, bob, "task_assigned", {"taskTitle": f"T{i}"})
+        notifications.enqueue_notification(alice, bob, "created_project", {"projectName": "P"})
+        notifications.enqueue_notification(bob, alice, "join_request", {"teamName": "Team"})
+
+        with mock.patch.object(notifications.deliver_push_task, "delay") as delay:
+            self.assertEqual(notifications.drain_outbox(), 2)
+            first = delay.call_args.args[0]
+            self.assertEqual(notifications.drain_outbox(now=timezone.now() + timedelta(seconds=61)), 3)
+        held = delay.call_args.args[0]
+
+        sends = notifications.coalesce(list(Notification.objects.filter(id__in=first).order_by("created_at")))
+        self.assertEqual(
+            sorted(notifications._format_title_body(n) for n in sends),
+            [
+                ("Member 0 requested to join your team", 'Member 0 has requested to join "Team"'),
+                ("You've been assigned to a task by Member 1", '"Member 1" assigned you to a task "T0"'),
+            ],
+        )
+        sends = notifications.coalesce(list(Notification.objects.filter(id__in=held).order_by("created_at")))
+        self.assertEqual(
+            [notifications._format_title_body(n) for n in sends],
+            [("You have 3 new notifications from Member 1", "2 task assignments, 1 new project")],
+        )
+
+    @override_settings(NOTIFICATION_COALESCE_SECONDS=60)
+    def test_windows_are_kept_per_channel(self):
+        alice, bob = self._users(0, 2)
+        notifications.enqueue_notification(alice, bob, "task_assigned", {"taskTitle": "T0"}, ["email"])
+        notifications.enqueue_notification(alice, bob, "task_assigned", {"taskTitle": "T1"}, ["email"])
+        # a mail burst does not hold back pushes
+        notifications.enqueue_notification(alice, bob, "task_assigned", {"taskTitle": "T2"}, ["push"])
+        with mock.patch.object(notifications.deliver_push_task, "delay") as push, \
+                mock.patch.object(notifications.deliver_email_task, "delay") as email:
+            self.assertEqual(notifications.drain_outbox(), 2)
+        self.assertEqual(push.call_count, 1)
+        self.assertEqual(email.call_count, 1)
+
+        # once the window has passed, the next push goes out at once again
+        NotificationOutbox.objects.filter(channel="push").update(release_at=timezone.now() - timedelta(minutes=2))
+        notifications.enqueue_notification(alice, bob, "task_assigned", {"taskTitle": "T3"}, ["push"])
+        with mock.patch.object(notifications.deliver_push_task, "delay") as push:
+            self.assertEqual(notifications.drain_outbox(), 1)
+        self.assertEqual(NotificationOutbox.objects.filter(channel="push").count(), 1)
+
+@override_settings(NOTIFICATION_EMAIL_DIGEST=True, NOTIFICATION_EMAIL_DIGEST_HOURS=24)
+class EmailDigestTests(TestCase):
+    def test_period_is_only_marked_done_once_sent_and_text_is_escaped(self):
+        user = User.objects.create_user(email="digest@example.com", password="pass", name="Digest")
+        for title in ("<b>Bold</b>", "Plain"):
+            Notification.objects.create(user=user, verb="task_assigned", data={"taskTitle": title})
+        now = timezone.now() + timedelta(seconds=1)
+
+        with mock.patch.object(notifications, "_deliver_email_sms", side_effect=RuntimeError("worker died")):
+            with self.assertRaises(RuntimeError):
+                digests.send_email_digests(now=now)
+        self.assertLess(HighWaterMark.objects.get(name=digests.MARK).value, now - timedelta(hours=1))
+
+        with mock.patch.object(notifications, "_deliver_email_sms") as send:
+            self.assertEqual(digests.send_email_digests(now=now), 1)
+        self.assertEqual(HighWaterMark.objects.get(name=digests.MARK).value, now)
+        html = send.call_args.args[2]
+        self.assertIn("&lt;b&gt;Bold&lt;/b&gt;", html)
+        self.assertNotIn("<b>", html)
+
+class FakeFCM:
+    """Stands in for `firebase_admin.messaging`: records send_each calls and fails chosen tokens."""
+
+    class UnregisteredError(Exception):
+        pass
+
+    class SenderIdMismatchError(Exception):
+        pass
+
+    def __init__(self, failures):
+        self.failures = failures
+        self.requests = []
+        self.Message = lambda **kwargs: SimpleNamespace(**kwargs)
+        self.Notification = lambda **kwargs: SimpleNamespace(**kwargs)
+
+    def send_each(self, messages):
+        self.requests.append([m.token for m in messages])
+        return SimpleNamespace(responses=[
+            SimpleNamespace(success=m.token not in self.failures, exception=self.failures.get(m.token))
+            for m in messages
+        ])
+
+
+class PushDeliveryTests(TestCase):
+    @override_settings(FCM_BATCH_SIZE=3)
+    def test_batched_send_prunes_only_unregistered_tokens(self):
+        rows = []
+        for i in range(2):
+            user = User.objects.create_user(email=f"push{i}@example.com", password="pass", name=f"Push {i}")
+            for j in range(2):
+                PushToken.objects.create(user=user, token=f"t{i}{j}")
+            rows.append(Notification.objects.create(user=user, verb="created_project", data={"projectName": "P"}))
+        fcm = FakeFCM({"t00": FakeFCM.UnregisteredError("gone"), "t11": RuntimeError("unavailable")})
+
+        with mock.patch.multiple(notifications, fb_messaging=fcm, _have_firebase=True, firebase_admin=None):
+            with self.assertNumQueries(2):  # tokens for the batch, then one prune
+                notifications._deliver_many_sync(rows, ["push"])
+
+        self.assertEqual([len(r) for r in fcm.requests], [3, 1])
+        self.assertEqual(sorted(PushToken.objects.values_list("token", flat=True)), ["t01", "t10", "t11"])
+
+    def test_falls_back_to_send_all(self):
+        user = User.objects.create_user(email="push@example.com", password="pass", name="Push")
+        PushToken.objects.create(user=user, token="t")
+        fcm = FakeFCM({})
+        fcm.send_all, fcm.send_each = fcm.send_each, None
+        with mock.patch.multiple(notifications, fb_messaging=fcm, _have_firebase=True, firebase_admin=None):
+            notifications._deliver_many_sync([Notification.objects.create(user=user, verb="x")], ["push"])
+        self.assertEqual(fcm.requests, [["t"]])
+
+    def test_real_sdk_has_the_batch_call(self):
+        """The firebase-admin we pin (and the one installed, if any) provides what `_batch_sender` calls."""
+        requirements = Path(__file__).resolve().parent.parent / "requirements.txt"
+        pin = re.search(r"^firebase-admin==(\d+)\.(\d+)", requirements.read_text(encoding="utf-16"), re.M)
+        self.assertGreaterEqual((int(pin[1]), int(pin[2])), (6, 2), "send_each needs firebase-admin >= 6.2")
+        if notifications._have_firebase:
+            self.assertTrue(callable(getattr(notifications.fb_messaging, "send_each", None)))
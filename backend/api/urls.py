@@ -3,9 +3,10 @@ from rest_framework.routers import DefaultRouter
 from rest_framework_nested import routers
 from .views import (
     UserViewSet, TeamViewSet, ProjectViewSet, ColumnViewSet, TaskViewSet,
-    AttachmentViewSet, DirectMessageViewSet, 
+    AttachmentViewSet, DirectMessageViewSet, ConversationViewSet,
     AllDataView, SubtaskViewSet, NotificationViewSet, PushTokenViewSet, FolderViewSet,
 )
+from .realtime import event_stream
 
 router = DefaultRouter()
 router.register(r"users", UserViewSet)
@@ -15,6 +16,7 @@ router.register(r"columns", ColumnViewSet)
 router.register(r"tasks", TaskViewSet)
 router.register(r"attachments", AttachmentViewSet)
 router.register(r"messages", DirectMessageViewSet)
+router.register(r"conversations", ConversationViewSet, basename="conversation")
 router.register(r"notifications", NotificationViewSet)
 router.register(r"push-tokens", PushTokenViewSet)
 router.register(r"folders", FolderViewSet)
@@ -24,6 +26,7 @@ tasks_router = routers.NestedDefaultRouter(router, r"tasks", lookup="task")
 tasks_router.register(r"subtasks", SubtaskViewSet, basename="task-subtasks")
 
 urlpatterns = [
+    path("events/", event_stream, name="events"),
     path("", include(router.urls)),
     path("", include(tasks_router.urls)),
 ]
\ No newline at end of file
@@ -1,11 +1,14 @@
 from rest_framework import viewsets, status
 from rest_framework.decorators import action
 from rest_framework.response import Response
+from rest_framework.exceptions import ValidationError
 from django.db import transaction
 from django.shortcuts import get_object_or_404
 from django.contrib.auth import get_user_model
 from rest_framework.decorators import api_view
-from django.db.models import Max
+from django.db.models import F, Max, Q, prefetch_related_objects
+from django.utils import timezone
+from django.utils.http import parse_etags, quote_etag
 from django.core.files.storage import default_storage
 from django.conf import settings
 import os
@@ -14,12 +17,12 @@ import uuid
 
 from .models import (
     Team, TeamMember, Project, Column, Task, Subtask, Attachment, Comment, ChatMessage, DirectMessage,
-    PushToken, Notification, Folder
+    Conversation, PushToken, Notification, Folder, Tag
 )
 from .serializers import (
     UserSerializer, RegisterSerializer, TeamSerializer, NestedUserSerializer, ProjectSerializer,
     ColumnSerializer, TaskSerializer, SubtaskSerializer, AttachmentSerializer,
-    CommentSerializer, ChatMessageSerializer, DirectMessageSerializer,
+    CommentSerializer, ChatMessageSerializer, DirectMessageSerializer, ConversationSerializer,
     PushTokenSerializer, NotificationSerializer, FolderSerializer
 )
 from .permissions import IsTeamAdmin
@@ -28,6 +31,22 @@ from rest_framework.permissions import IsAuthenticated
 User = get_user_model()
 
 from . import notifications as notifier
+from . import archive as archiver
+from . import board
+from . import sync
+from . import changes
+from . import conversations
+from . import pagination
+from . import project_cache
+from . import ordering
+from . import ranking
+from . import task_batch
+from . import task_query
+from . import streaming
+from . import tags
+from .prefetch import (
+    COLUMN_PREFETCH, PROJECT_PREFETCH, TASK_PREFETCH, TEAM_PREFETCH, attachments_by_id, project_prefetch,
+)
 
 
 def _delete_storage_file_by_url(url):
@@ -76,6 +95,23 @@ def _delete_storage_file_by_url(url):
     except Exception:
         # ensure this helper never raises
         return
+
+
+def _conditional_response(request, version, build_response):
+    """Answer with 304 when the client already holds `version`, else build the response.
+
+    `build_response` is only called on a miss, so unchanged data is never
+    serialized. Clients are told to revalidate on every use.
+    """
+    etag = quote_etag(version)
+    if_none_match = request.headers.get("If-None-Match")
+    if if_none_match and (etag in parse_etags(if_none_match) or if_none_match.strip() == "*"):
+        response = Response(status=status.HTTP_304_NOT_MODIFIED)
+    else:
+        response = build_response()
+    response["ETag"] = etag
+    response["Cache-Control"] = "private, no-cache"
+    return response
     
     
 class UserViewSet(viewsets.ModelViewSet):
@@ -99,12 +135,38 @@ class UserViewSet(viewsets.ModelViewSet):
         # Return user in the same format as your frontend expects
         return Response(UserSerializer(user).data, status=status.HTTP_201_CREATED)
 
+    def perform_update(self, serializer):
+        # names and avatars are embedded in project payloads (assignees, comment authors)
+        with transaction.atomic():
+            user = serializer.save()
+            sync.touch_users([user.id], profile=True)
+
 
 class TeamViewSet(viewsets.ModelViewSet):
-    queryset = Team.objects.all()
+    queryset = Team.objects.all().prefetch_related(*TEAM_PREFETCH)
     serializer_class = TeamSerializer
     permission_classes = [IsAuthenticated]
 
+    def perform_create(self, serializer):
+        with transaction.atomic():
+            team = serializer.save()
+            changes.record("team", team.id, "create", team_id=team.id, actor=self.request.user)
+
+    def perform_update(self, serializer):
+        with transaction.atomic():
+            team = serializer.save()
+            changes.record("team", team.id, "update", team_id=team.id, actor=self.request.user)
+
+    def perform_destroy(self, instance):
+        # members lose the team and every project in it, so the deletes are user-scoped
+        member_ids = list(instance.team_members.values_list("user_id", flat=True))
+        project_ids = list(instance.projects.values_list("id", flat=True))
+        with transaction.atomic():
+            changes.record("team", instance.id, "delete", user_ids=member_ids, actor=self.request.user)
+            for project_id in project_ids:
+                changes.record("project", project_id, "delete", user_ids=member_ids, actor=self.request.user)
+            instance.delete()
+
     @action(detail=True, methods=["post"], url_path="invite", permission_classes=[IsAuthenticated, IsTeamAdmin])
     def invite(self, request, pk=None):
         team = self.get_object()
@@ -115,7 +177,9 @@ class TeamViewSet(viewsets.ModelViewSet):
             user = User.objects.get(email=email)
         except User.DoesNotExist:
             return Response({"error": "user not found"}, status=404)
-        TeamMember.objects.get_or_create(team=team, user=user, defaults={"role": "member"})
+        with transaction.atomic():
+            TeamMember.objects.get_or_create(team=team, user=user, defaults={"role": "member"})
+            changes.record("team", team.id, "update", team_id=team.id, user_ids=[user.id], actor=request.user, data={"addedUserId": str(user.id)})
         return Response(TeamSerializer(team).data)
 
     @action(detail=True, methods=["post"], url_path="join", permission_classes=[IsAuthenticated])
@@ -123,19 +187,20 @@ class TeamViewSet(viewsets.ModelViewSet):
         team = self.get_object()
         uid = str(request.user.id)
         if uid not in team.join_requests:
-            team.join_requests.append(uid)
-            team.save()
+            with transaction.atomic():
+                team.join_requests.append(uid)
+                team.save()
+                changes.record("team", team.id, "update", team_id=team.id, actor=request.user, data={"joinRequest": uid})
             # Notify team admins about join request
             try:
-                admins = [m.user for m in team.team_members.filter(role='admin')]
-                for admin in admins:
-                    notifier.enqueue_notification(
-                        user=admin,
-                        actor=request.user,
-                        verb='join_request',
-                        data={'teamId': str(team.id), 'teamName': team.name},
-                        channels=['push', 'email']
-                    )
+                admins = [m.user for m in team.team_members.filter(role='admin').select_related('user')]
+                notifier.fan_out(
+                    admins,
+                    actor=request.user,
+                    verb='join_request',
+                    data={'teamId': str(team.id), 'teamName': team.name},
+                    channels=['push', 'email']
+                )
             except Exception:
                 pass
         return Response({"message": "join request submitted", "name": team.name})
@@ -152,10 +217,12 @@ class TeamViewSet(viewsets.ModelViewSet):
             return Response({"error": "user not found"}, status=404)
 
         if action == "approve":
-            TeamMember.objects.get_or_create(team=team, user=user, defaults={"role": "member"})
-            if user_id in team.join_requests:
-                team.join_requests.remove(user_id)
-                team.save()
+            with transaction.atomic():
+                TeamMember.objects.get_or_create(team=team, user=user, defaults={"role": "member"})
+                if user_id in team.join_requests:
+                    team.join_requests.remove(user_id)
+                    team.save()
+                changes.record("team", team.id, "update", team_id=team.id, user_ids=[user.id], actor=request.user, data={"addedUserId": str(user.id)})
             # Notify the approved user
             try:
                 notifier.enqueue_notification(
@@ -170,8 +237,10 @@ class TeamViewSet(viewsets.ModelViewSet):
             return Response({"message": "approved", "team": TeamSerializer(team).data})
         else:
             if user_id in team.join_requests:
-                team.join_requests.remove(user_id)
-                team.save()
+                with transaction.atomic():
+                    team.join_requests.remove(user_id)
+                    team.save()
+                    changes.record("team", team.id, "update", team_id=team.id, actor=request.user)
             # Notify the denied user
             try:
                 notifier.enqueue_notification(
@@ -194,23 +263,25 @@ class ProjectViewSet(viewsets.ModelViewSet):
     def create(self, request, *args, **kwargs):
         serializer = self.get_serializer(data=request.data)
         serializer.is_valid(raise_exception=True)
-        project = serializer.save()
+        with transaction.atomic():
+            project = serializer.save()
 
-        todo = Column.objects.create(project=project, title="To Do", order=0)
-        inprog = Column.objects.create(project=project, title="In Progress", order=1)
-        done = Column.objects.create(project=project, title="Done", order=2)
+            todo = Column.objects.create(project=project, title="To Do", order=0)
+            inprog = Column.objects.create(project=project, title="In Progress", order=1)
+            done = Column.objects.create(project=project, title="Done", order=2)
 
-        # Create default columns
-        column_objects = [todo, inprog, done]
+            # Create default columns
+            column_objects = [todo, inprog, done]
 
-        # Update columnOrder on the project
-        project.column_order = [str(col.id) for col in column_objects]
-        project.save()
+            # Update columnOrder on the project
+            project.column_order = [str(col.id) for col in column_objects]
+            project.save()
 
-        # Add project ID to the team's project_ids
-        team = project.team
-        team.project_ids.append(str(project.id))  # Add new project ID
-        team.save()
+            # Add project ID to the team's project_ids
+            team = project.team
+            team.project_ids.append(str(project.id))  # Add new project ID
+            team.save()
+            changes.record("project", project.id, "create", project=project, actor=request.user)
 
         # Serialize the project with nested columns
         project_data = ProjectSerializer(project).data
@@ -220,14 +291,13 @@ class ProjectViewSet(viewsets.ModelViewSet):
 
         # Notify team members about new project
         try:
-            for member in project.team.team_members.all():
-                notifier.enqueue_notification(
-                    user=member.user,
-                    actor=request.user,
-                    verb='created_project',
-                    data={'projectId': str(project.id), 'projectName': project.name, 'teamId': str(project.team.id), 'teamName': project.team.name},
-                    channels=['push', 'email']
-                )
+            notifier.fan_out(
+                [member.user for member in project.team.team_members.select_related('user')],
+                actor=request.user,
+                verb='created_project',
+                data={'projectId': str(project.id), 'projectName': project.name, 'teamId': str(project.team.id), 'teamName': project.team.name},
+                channels=['push', 'email']
+            )
         except Exception:
             pass
 
@@ -235,8 +305,103 @@ class ProjectViewSet(viewsets.ModelViewSet):
             {"newProject": project_data, "updatedTeam": team_data},
             status=status.HTTP_201_CREATED
         )
+
+    def get_queryset(self):
+        queryset = super().get_queryset()
+        if self.action == "list":
+            queryset = queryset.prefetch_related(*PROJECT_PREFETCH)
+        return queryset
+
+    def retrieve(self, request, *args, **kwargs):
+        project = self.get_object()
+        version = sync.project_version(project)
+
+        def build():
+            # prefetch only when neither the client nor the payload cache has this version
+            data = project_cache.get_many({project.id: version}).get(project.id)
+            if data is None:
+                prefetch_related_objects([project], *PROJECT_PREFETCH)
+                data = self.get_serializer(project).data
+                project_cache.set_many({project.id: (version, data)})
+            return Response(data)
+
+        return _conditional_response(request, version, build)
+
+    @action(detail=True, methods=["get"], url_path="tags")
+    def tags(self, request, pk=None):
+        """GET /projects/<id>/tags/?q=<prefix>&limit=N
+
+        The project's tags with how many tasks carry each, most used first;
+        `q` narrows them to names starting with it (autocomplete).
+        """
+        project = self.get_object()
+        try:
+            limit = pagination.parse_limit(request.query_params.get("limit"))
+        except ValueError:
+            return Response({"error": "invalid limit"}, status=status.HTTP_400_BAD_REQUEST)
+        rows = Tag.objects.filter(project=project, task_count__gt=0)
+        if request.query_params.get("q"):
+            rows = rows.filter(name__startswith=request.query_params["q"].strip())
+        rows = rows.order_by("-task_count", "name").values_list("name", "task_count")[:limit]
+        return Response({"tags": [{"name": name, "taskCount": count} for name, count in rows]})
+
+    @action(detail=True, methods=["get"], url_path="board")
+    def board(self, request, pk=None):
+        """GET /projects/<id>/board/?limit=N
+
+        The board without its long tail: every column with its `taskCount`
+        and the ids of its first `limit` tasks (`BOARD_COLUMN_TASK_LIMIT` by
+        default), plus `nextCursor` for `/columns/<id>/tasks/` when more
+        follow. `tasks` only holds the tasks listed. Costs the same number of
+        queries however many tasks the columns hold.
+        """
+        project = self.get_object()
+        try:
+            limit = pagination.parse_limit(
+                request.query_params.get("limit"), default=getattr(settings, 'BOARD_COLUMN_TASK_LIMIT', 20),
+            )
+        except ValueError:
+            return Response({"error": "invalid limit"}, status=status.HTTP_400_BAD_REQUEST)
+        version = f"{sync.project_version(project)}:{limit}"
+
+        def build():
+            columns = list(project.columns.order_by("order", "id"))
+            windows = board.column_windows([col.id for col in columns], limit)
+            tasks = [task for col_tasks, _, _ in windows.values() for task in col_tasks]
+            prefetch_related_objects(tasks, *TASK_PREFETCH)
+            columns_data = {}
+            for col in columns:
+                col_tasks, count, next_cursor = windows[col.id]
+                columns_data[str(col.id)] = {
+                    "id": str(col.id),
+                    "title": col.title,
+                    "taskIds": [str(t.id) for t in col_tasks],
+                    "taskCount": count,
+                    "nextCursor": next_cursor,
+                }
+            return Response({
+                "id": str(project.id),
+                "name": project.name,
+                "description": project.description,
+                "teamId": str(project.team_id),
+                "columns": columns_data,
+                "columnOrder": [str(col.id) for col in columns],
+                "tasks": {str(t.id): TaskSerializer(t).data for t in tasks},
+            })
+
+        return _conditional_response(request, version, build)
+
+    def perform_update(self, serializer):
+        with transaction.atomic():
+            project = serializer.save()
+            changes.record("project", project.id, "update", project=project, actor=self.request.user)
+
+    def perform_destroy(self, instance):
+        with transaction.atomic():
+            changes.record("project", instance.id, "delete", project=instance, actor=self.request.user)
+            instance.delete()
     
-    @action(detail=True, methods=['post'])
+    @action(detail=True, methods=['get', 'post'])
     def chatmessages(self, request, pk=None):
         project_id = self.get_object().id
         try:
@@ -244,6 +409,9 @@ class ProjectViewSet(viewsets.ModelViewSet):
         except Project.DoesNotExist:
             return Response({"error": "Project not found"}, status=status.HTTP_404_NOT_FOUND)
 
+        if request.method == "GET":
+            return self._chat_history(request, project)
+
         content = request.data.get("content")
         if not content:
             return Response({"error": "Message content required"}, status=status.HTTP_400_BAD_REQUEST)
@@ -269,21 +437,54 @@ class ProjectViewSet(viewsets.ModelViewSet):
             att = Attachment.objects.create(name=f.name, url=saved_path)
             attachments.append(str(att.id))
 
-        message = ChatMessage.objects.create(
-            project=project,
-            author=request.user,
-            content=content,
-            attachments=list(dict.fromkeys(attachments)),
-            reply_to=reply_to
-        )
+        with transaction.atomic():
+            message = ChatMessage.objects.create(
+                project=project,
+                author=request.user,
+                content=content,
+                attachments=list(dict.fromkeys(attachments)),
+                reply_to=reply_to
+            )
+            changes.record("chatMessage", message.id, "create", project=project, actor=request.user)
 
         # Return serialized message
         serializer = ChatMessageSerializer(message)
         return Response(serializer.data, status=status.HTTP_201_CREATED)
 
+    def _chat_history(self, request, project):
+        """GET /projects/<id>/chatmessages/?before=<cursor>&limit=N
+
+        Returns the newest `limit` messages older than `before` (the latest
+        ones without it) in chronological order, and `nextCursor` to pass as
+        `before` for the page preceding them (null once the start is reached).
+        """
+        try:
+            limit = pagination.parse_limit(request.query_params.get("limit"))
+        except ValueError:
+            return Response({"error": "invalid limit"}, status=status.HTTP_400_BAD_REQUEST)
+        messages = ChatMessage.objects.filter(project=project).select_related("author", "reply_to__author")
+        try:
+            page, next_cursor = pagination.keyset_page(
+                messages, ("-timestamp", "-id"), request.query_params.get("before"), limit,
+            )
+        except pagination.InvalidCursor:
+            return Response({"error": "invalid before cursor"}, status=status.HTTP_400_BAD_REQUEST)
+        page.reverse()
+        context = {"attachments_by_id": attachments_by_id(page)}
+        return Response({
+            "messages": ChatMessageSerializer(page, many=True, context=context).data,
+            "nextCursor": next_cursor,
+        })
+
+
+def _columns_payload(project_id):
+    """`{column_id: column}` for a project's board, in two queries."""
+    columns = Column.objects.filter(project_id=project_id).prefetch_related(*COLUMN_PREFETCH)
+    return {str(col.id): ColumnSerializer(col).data for col in columns}
+
 
 class ColumnViewSet(viewsets.ModelViewSet):
-    queryset = Column.objects.all()
+    queryset = Column.objects.all().prefetch_related(*COLUMN_PREFETCH)
     serializer_class = ColumnSerializer
     permission_classes = [IsAuthenticated]
 
@@ -300,10 +501,12 @@ class ColumnViewSet(viewsets.ModelViewSet):
 
         # Determine order
         max_order = project.columns.aggregate(Max('order'))['order__max'] or -1
-        new_column = Column.objects.create(project=project, title=title, order=max_order + 1)
+        with transaction.atomic():
+            new_column = Column.objects.create(project=project, title=title, order=max_order + 1)
+            changes.record("column", new_column.id, "create", project=project, actor=request.user)
 
         column_order = [str(col.id) for col in project.columns.all().order_by('order')]
-        columns_data = { str(col.id): self.get_serializer(col).data for col in project.columns.all() }
+        columns_data = _columns_payload(project.id)
 
         return Response({
             "columns": columns_data,
@@ -324,32 +527,53 @@ class ColumnViewSet(viewsets.ModelViewSet):
         if not new_name:
             return Response({"error": "newTitle is required"}, status=status.HTTP_400_BAD_REQUEST)
         
-        column.title = new_name
-        column.save()
+        with transaction.atomic():
+            column.title = new_name
+            column.save()
+            changes.record("column", column.id, "update", project=column.project, actor=request.user)
 
         return Response(self.get_serializer(column).data, status=status.HTTP_200_OK)
 
+    @action(detail=True, methods=["get"], url_path="tasks")
+    def tasks(self, request, pk=None):
+        """GET /columns/<id>/tasks/?cursor=<cursor>&limit=N
+
+        The next page of a column's tasks in board order, continuing from a
+        `nextCursor` of `/projects/<id>/board/` (or from the top without one).
+        """
+        column = get_object_or_404(Column, id=pk)
+        try:
+            limit = pagination.parse_limit(request.query_params.get("limit"))
+        except ValueError:
+            return Response({"error": "invalid limit"}, status=status.HTTP_400_BAD_REQUEST)
+        try:
+            page, next_cursor = board.column_page(column, request.query_params.get("cursor"), limit)
+        except pagination.InvalidCursor:
+            return Response({"error": "invalid cursor"}, status=status.HTTP_400_BAD_REQUEST)
+        prefetch_related_objects(page, *TASK_PREFETCH)
+        return Response({
+            "tasks": TaskSerializer(page, many=True).data,
+            "nextCursor": next_cursor,
+        })
+
     @action(detail=False, methods=["put"], url_path="move")
     def move(self, request):
-        project_id = request.data["projectId"]
+        """PUT /columns/move/ - { "projectId", "newOrder": [columnId, ...] }
 
+        Returns the project's column ids in their stored order.
+        """
         try:
-            project = Project.objects.get(id=project_id)
+            project = Project.objects.get(id=request.data.get("projectId"))
         except Project.DoesNotExist:
             return Response({"error": "Project not found"}, status=status.HTTP_404_NOT_FOUND)
 
-        col_ids = request.data["newOrder"]
-
-        for index, col_id in enumerate(col_ids):
+        with transaction.atomic():
             try:
-                column = Column.objects.get(id=col_id, project=project)
-                column.order = index
-                column.save()
-            except Column.DoesNotExist:
-                continue
-
-        # Return updated column order
-        column_order = [str(col.id) for col in Column.objects.filter(project=project).order_by('order')]
+                column_order, changed = ordering.reorder(project.columns.all(), request.data.get("newOrder"))
+            except ValueError as exc:
+                return Response({"error": str(exc)}, status=status.HTTP_400_BAD_REQUEST)
+            if changed:
+                changes.record("project", project.id, "update", project=project, actor=request.user, data={"columnOrder": column_order})
 
         return Response(column_order, status=status.HTTP_200_OK)
     
@@ -374,120 +598,284 @@ class ColumnViewSet(viewsets.ModelViewSet):
         # Determine target column (first column in order)
         first_column = columns[0] if columns[0].id != column.id else columns[1]
 
-        # Move tasks from deleted column → first column
-        tasks_to_move = column.task_ids
-
-        for task in tasks_to_move:
-            first_column.task_ids.append(task)
-
-        first_column.save()
-
-        # Delete the column
-        column.delete()
-
-        # Re-order remaining columns (0,1,2,...)
-        remaining_columns = project.columns.all().order_by("order")
-        for i, col in enumerate(remaining_columns):
-            col.order = i
-            col.save()
-
-        # Update project.columnOrder
-        column_order = [str(col.id) for col in remaining_columns]
-        project.columnOrder = column_order
-        project.save()
+        with transaction.atomic():
+            # Move tasks from deleted column → end of the first column
+            tasks_to_move = list(Task.objects.filter(column=column, archived=False).order_by("rank", "id"))
+            new_ranks = ranking.ranks_between(ranking.last_rank(first_column), None, len(tasks_to_move))
+            for task, rank in zip(tasks_to_move, new_ranks):
+                task.column = first_column
+                task.rank = rank
+                task.position_version += 1
+            Task.objects.bulk_update(tasks_to_move, ["column", "rank", "position_version"], batch_size=500)
+            # archived tasks keep no board position; they are ranked again when restored
+            Task.objects.filter(column=column, archived=True).update(column=first_column)
+
+            # Delete the column
+            changes.record("column", column.id, "delete", project=project, actor=request.user, data={"movedTasksTo": str(first_column.id)})
+            column.delete()
+
+            # Close the gap in the remaining columns' order (0,1,2,...)
+            ordering.reorder(project.columns.all())
 
         return Response(status=status.HTTP_204_NO_CONTENT)
 
 
 class TaskViewSet(viewsets.ModelViewSet):
-    queryset = Task.objects.all().select_related("project")
+    queryset = Task.objects.all().select_related("project").prefetch_related(*TASK_PREFETCH)
     serializer_class = TaskSerializer
     permission_classes = [IsAuthenticated]
 
+    def list(self, request, *args, **kwargs):
+        """GET /tasks/?project=&assignee=&priority=&tag=&due_before=&due_after=&completed=&cursor=&limit=
+
+        Active tasks from the user's teams matching every given filter (see
+        api.task_query), newest first, one keyset page at a time.
+        """
+        try:
+            limit = pagination.parse_limit(request.query_params.get("limit"))
+        except ValueError:
+            return Response({"error": "invalid limit"}, status=status.HTTP_400_BAD_REQUEST)
+        try:
+            tasks = task_query.filter_tasks(
+                Task.objects.filter(archived=False, project__team__team_members__user=request.user),
+                request.query_params, request.user,
+            )
+        except ValueError as exc:
+            return Response({"error": str(exc)}, status=status.HTTP_400_BAD_REQUEST)
+        try:
+            page, next_cursor = pagination.keyset_page(
+                tasks, ("-created_at", "-id"), request.query_params.get("cursor"), limit,
+            )
+        except pagination.InvalidCursor:
+            return Response({"error": "invalid cursor"}, status=status.HTTP_400_BAD_REQUEST)
+        prefetch_related_objects(page, *TASK_PREFETCH)
+        return Response({"tasks": TaskSerializer(page, many=True).data, "nextCursor": next_cursor})
+
     # Override create to ensure task is linked to project and placed into column
     def create(self, request, *args, **kwargs):
         with transaction.atomic():
             column_id = request.data.get("columnId")  # column to insert into
             serializer = self.get_serializer(data=request.data)
             serializer.is_valid(raise_exception=True)
-            task = serializer.save()
-            # if column_id provided, append to column.task_ids
+            # if column_id provided, append to the end of that column
+            column = None
             if column_id:
-                col = get_object_or_404(Column, id=column_id, project=task.project)
-                col.task_ids.append(str(task.id))
-                col.save()
+                column = get_object_or_404(Column, id=column_id, project=serializer.validated_data["project"])
+            task = serializer.save(column=column, rank=ranking.rank_at(column, None) if column else "")
+            tags.sync([task])
+            changes.record("task", task.id, "create", project=task.project, actor=request.user, data={"columnId": column_id})
             # Notify assignees of new task assignment
             try:
-                for assignee in task.assignees.all():
-                    notifier.enqueue_notification(
-                        user=assignee,
-                        actor=request.user,
-                        verb='task_assigned',
-                        data={'taskId': str(task.id), 'taskTitle': task.title, 'projectId': str(task.project.id), 'projectName': task.project.name},
-                        channels=['push', 'email']
-                    )
+                notifier.fan_out(
+                    task.assignees.all(),
+                    actor=request.user,
+                    verb='task_assigned',
+                    data={'taskId': str(task.id), 'taskTitle': task.title, 'projectId': str(task.project.id), 'projectName': task.project.name},
+                    channels=['push', 'email']
+                )
             except Exception:
                 pass
             return Response(self.get_serializer(task).data, status=status.HTTP_201_CREATED)
 
+    def perform_update(self, serializer):
+        with transaction.atomic():
+            task = serializer.save()
+            if "tags" in serializer.validated_data:
+                tags.sync([task])
+            changes.record("task", task.id, "update", project=task.project, actor=self.request.user)
+
+    @staticmethod
+    def _placement(task):
+        """Where a task sits now: its column, index in that column and position version."""
+        position = None
+        if task.column_id:
+            position = Task.objects.filter(column_id=task.column_id, archived=False).filter(
+                Q(rank__lt=task.rank) | Q(rank=task.rank, id__lt=task.id)
+            ).count()
+        return {
+            "taskId": str(task.id),
+            "columnId": str(task.column_id) if task.column_id else None,
+            "position": position,
+            "positionVersion": task.position_version,
+        }
 
     @action(detail=True, methods=["patch"], url_path="move")
     def move(self, request, pk=None):
+        """PATCH /tasks/{id}/move/ - { "toColumnId", "position", "expectedVersion"? }
+
+        Runs as one transaction holding row locks on the target column (moves
+        into the same column compete for the same gaps) and the task. When
+        `expectedVersion` no longer matches the task's `positionVersion`,
+        someone else moved it first: nothing changes and a 409 carries the
+        task's current placement to retry from. The version is compared in
+        the UPDATE itself, so the check holds even where row locks are not
+        available (SQLite). Success returns only what
+        changed: the task's old and new column, new index and version.
+        """
         task = self.get_object()
         to_column_id = request.data.get("toColumnId")
         position = request.data.get("position", None)
+        expected_version = request.data.get("expectedVersion", None)
 
         if not to_column_id:
             return Response({"error": "toColumnId required"}, status=400)
 
-        to_column = get_object_or_404(Column, id=to_column_id)
-
-        if to_column.project_id != task.project_id:
-            return Response({"error": "column and task project mismatch"}, status=400)
+        try:
+            position = int(position) if position is not None else None
+            expected_version = int(expected_version) if expected_version is not None else None
+        except (TypeError, ValueError):
+            return Response({"error": "position and expectedVersion must be integers"}, status=400)
 
         with transaction.atomic():
-            # Get original column and index
-            original_column = next((col for col in Column.objects.filter(project=task.project)
-                                    if str(task.id) in col.task_ids), None)
-            original_index = None
-            if original_column:
-                original_index = original_column.task_ids.index(str(task.id))
+            to_column = get_object_or_404(Column.objects.select_for_update(), id=to_column_id)
+            if to_column.project_id != task.project_id:
+                return Response({"error": "column and task project mismatch"}, status=400)
+            task = Task.objects.select_for_update().select_related("project").get(id=task.id)
+            if task.archived:
+                return Response({"error": "task is archived; restore it first"}, status=400)
+            if expected_version is not None and expected_version != task.position_version:
+                return Response(
+                    {"error": "task was moved by someone else", **self._placement(task)},
+                    status=status.HTTP_409_CONFLICT,
+                )
 
-            task_id_str = str(task.id)
+            # Only the moved task's row changes: it takes a rank between its
+            # new neighbours (see api.ranking). The write only applies if the
+            # task still has the version the client expected.
+            from_column_id = task.column_id
+            rank = ranking.rank_at(to_column, position, exclude_id=task.id)
+            expected = {"position_version": expected_version} if expected_version is not None else {}
+            moved = Task.objects.filter(id=task.id, archived=False, **expected).update(
+                column=to_column, rank=rank, position_version=F("position_version") + 1, updated_at=timezone.now(),
+            )
+            task.refresh_from_db(fields=["column", "rank", "position_version", "archived"])
+            if not moved:
+                if task.archived:
+                    return Response({"error": "task is archived; restore it first"}, status=400)
+                return Response(
+                    {"error": "task was moved by someone else", **self._placement(task)},
+                    status=status.HTTP_409_CONFLICT,
+                )
+            placement = self._placement(task)
+            changes.record("task", task.id, "move", project=task.project, actor=request.user, data={
+                "fromColumnId": str(from_column_id) if from_column_id else None,
+                "toColumnId": str(to_column.id),
+                "position": placement["position"],
+            })
+
+        return Response({"fromColumnId": str(from_column_id) if from_column_id else None, **placement},
+                        status=status.HTTP_200_OK)
+
+    @action(detail=False, methods=["post"], url_path="batch")
+    def batch(self, request):
+        """POST /tasks/batch/ - { "operations": [{ "op": "create" | "update" | "move" | "delete", ... }] }
+
+        Operations take the same fields as the single-task endpoints (`id` for
+        all but create; move takes `toColumnId`, `position`, `expectedVersion`)
+        and apply in order, all or nothing. A failing operation returns
+        `{ "error", "index" }` (409 for a stale `expectedVersion`). New
+        assignees get one notification per project however many tasks they
+        were given.
+        """
+        try:
+            with transaction.atomic():
+                result, assignments, deleted_urls = task_batch.apply(request.user, request.data.get("operations"))
+        except task_batch.BatchError as exc:
+            code = status.HTTP_409_CONFLICT if exc.conflict else status.HTTP_400_BAD_REQUEST
+            return Response(exc.as_response_data(), status=code)
 
-            # Remove from all columns
-            all_columns = Column.objects.filter(project=task.project)
-            
-            # Remove from all columns
-            for col in all_columns:
-                # remove duplicates first
-                col.task_ids = list(dict.fromkeys(col.task_ids))
-                # remove the task if present
-                if task_id_str in col.task_ids:
-                    col.task_ids.remove(task_id_str)
-                    col.save()  # save immediately
+        for url in deleted_urls:
+            try:
+                _delete_storage_file_by_url(url)
+            except Exception:
+                pass
 
-            # Reload the target column to be safe
-            to_column = Column.objects.get(id=to_column_id)
-            to_column.task_ids = list(dict.fromkeys(to_column.task_ids))  # ensure unique
+        rows = []
+        for assignee, tasks in assignments.items():
+            by_project = {}
+            for task in tasks:
+                by_project.setdefault(task.project_id, []).append(task)
+            for project_tasks in by_project.values():
+                project = project_tasks[0].project
+                rows.append(Notification(
+                    user=assignee,
+                    actor=request.user,
+                    verb='task_assigned',
+                    data={
+                        'taskId': str(project_tasks[0].id),
+                        'taskIds': [str(t.id) for t in project_tasks],
+                        'taskCount': len(project_tasks),
+                        'taskTitle': project_tasks[0].title,
+                        'projectId': str(project.id),
+                        'projectName': project.name,
+                    },
+                ))
+        if rows:
+            try:
+                notifier.enqueue_many(rows, actor=request.user, channels=['push', 'email'])
+            except Exception:
+                pass
 
-            # Insert at position
-            if position is None or position >= len(to_column.task_ids) or position < 0:
-                to_column.task_ids.append(task_id_str)
-            else:
-                to_column.task_ids.insert(position, task_id_str)
+        return Response(result, status=status.HTTP_200_OK)
 
-            to_column.task_ids = list(dict.fromkeys(to_column.task_ids))  # final uniqueness
-            to_column.save()
+    @action(detail=False, methods=["get"], url_path="calendar")
+    def calendar(self, request):
+        """GET /tasks/calendar/?start=<date>&end=<date>&teams=<id,...>
 
+        The tasks due in a calendar window across the user's projects, as a
+        lean projection (see api.task_query.calendar).
+        """
+        try:
+            tasks = task_query.calendar(request.user, request.query_params)
+        except ValueError as exc:
+            return Response({"error": str(exc)}, status=status.HTTP_400_BAD_REQUEST)
+        return Response({"tasks": tasks})
 
-            # Build response object
-            columns_object = {
-                str(col.id): ColumnSerializer(col).data
-                for col in Column.objects.filter(project=task.project)
-            }
+    @action(detail=False, methods=["get"], url_path="archived")
+    def archived(self, request):
+        """GET /tasks/archived/?project=<id>&q=<text>&cursor=<cursor>&limit=N
 
-            return Response({"columns": columns_object}, status=status.HTTP_200_OK)
+        Archived tasks from the user's teams, most recently archived first,
+        optionally narrowed to a project and to titles containing `q`.
+        """
+        try:
+            limit = pagination.parse_limit(request.query_params.get("limit"))
+        except ValueError:
+            return Response({"error": "invalid limit"}, status=status.HTTP_400_BAD_REQUEST)
+        tasks = Task.objects.filter(archived=True, project__team__team_members__user=request.user)
+        if request.query_params.get("project"):
+            try:
+                tasks = tasks.filter(project_id=uuid.UUID(request.query_params["project"]))
+            except ValueError:
+                return Response({"error": "invalid project"}, status=status.HTTP_400_BAD_REQUEST)
+        if request.query_params.get("q"):
+            tasks = tasks.filter(title__icontains=request.query_params["q"])
+        try:
+            page, next_cursor = pagination.keyset_page(
+                tasks, ("-archived_at", "-id"), request.query_params.get("cursor"), limit,
+            )
+        except pagination.InvalidCursor:
+            return Response({"error": "invalid cursor"}, status=status.HTTP_400_BAD_REQUEST)
+        prefetch_related_objects(page, *TASK_PREFETCH)
+        return Response({"tasks": TaskSerializer(page, many=True).data, "nextCursor": next_cursor})
+
+    @action(detail=True, methods=["post"], url_path="archive")
+    def archive(self, request, pk=None):
+        """POST /tasks/{id}/archive/ - take a task off its board now"""
+        with transaction.atomic():
+            task = get_object_or_404(Task.objects.select_for_update().select_related("project"), id=pk)
+            archiver.archive([task], actor=request.user)
+        return Response(self.get_serializer(task).data)
+
+    @action(detail=True, methods=["post"], url_path="restore")
+    def restore(self, request, pk=None):
+        """POST /tasks/{id}/restore/ - put an archived task back at the end of its column"""
+        with transaction.atomic():
+            task = get_object_or_404(Task.objects.select_for_update().select_related("project", "column"), id=pk)
+            if not task.archived:
+                return Response({"error": "task is not archived"}, status=400)
+            archiver.restore(task, actor=request.user)
+        return Response({**self.get_serializer(task).data, **self._placement(task)})
 
     @action(detail=True, methods=["post"], url_path="comments")
     def comments(self, request, pk=None):
@@ -499,8 +887,10 @@ class TaskViewSet(viewsets.ModelViewSet):
         if not content:
             return Response({"error": "content required"}, status=400)
 
-        comment = Comment.objects.create(author=request.user, content=content)
-        task.comments.add(comment)
+        with transaction.atomic():
+            comment = Comment.objects.create(author=request.user, content=content)
+            task.comments.add(comment)
+            changes.record("comment", comment.id, "create", project=task.project, actor=request.user, data={"taskId": str(task.id)})
 
         return Response(CommentSerializer(comment).data, status=status.HTTP_201_CREATED)
 
@@ -534,8 +924,10 @@ class TaskViewSet(viewsets.ModelViewSet):
             rel_path = os.path.join('attachments', unique_name)
             saved_path = default_storage.save(rel_path, f)
 
-            att = Attachment.objects.create(name=f.name, url=saved_path)
-            task.attachments.add(att)
+            with transaction.atomic():
+                att = Attachment.objects.create(name=f.name, url=saved_path)
+                task.attachments.add(att)
+                changes.record("attachment", att.id, "create", project=task.project, actor=request.user, data={"taskId": str(task.id)})
             created.append(att)
 
         return Response(AttachmentSerializer(created, many=True).data, status=status.HTTP_201_CREATED)
@@ -545,13 +937,6 @@ class TaskViewSet(viewsets.ModelViewSet):
         task = self.get_object()
         project = task.project
         with transaction.atomic():
-            # remove task id from any column in project
-            cols = Column.objects.filter(project=project)
-            for c in cols:
-                if str(task.id) in c.task_ids:
-                    c.task_ids = [tid for tid in c.task_ids if tid != str(task.id)]
-                    c.save()
-
             # Delete attachments' stored files and attachment objects attached to this task
             try:
                 attachments = list(task.attachments.all())
@@ -580,6 +965,8 @@ class TaskViewSet(viewsets.ModelViewSet):
                 pass
 
             # finally delete the task itself
+            tags.forget([task.id])
+            changes.record("task", task.id, "delete", project=project, actor=request.user)
             task.delete()
         return Response(status=status.HTTP_204_NO_CONTENT)
     
@@ -596,7 +983,21 @@ class SubtaskViewSet(viewsets.ModelViewSet):
     
     def perform_create(self, serializer):
         task = self.get_task()
-        serializer.save(task=task)
+        with transaction.atomic():
+            subtask = serializer.save(task=task)
+            changes.record("subtask", subtask.id, "create", project=task.project, actor=self.request.user, data={"taskId": str(task.id)})
+
+    def perform_update(self, serializer):
+        with transaction.atomic():
+            subtask = serializer.save()
+            task = subtask.task
+            changes.record("subtask", subtask.id, "update", project=task.project, actor=self.request.user, data={"taskId": str(task.id)})
+
+    def perform_destroy(self, instance):
+        task = instance.task
+        with transaction.atomic():
+            changes.record("subtask", instance.id, "delete", project=task.project, actor=self.request.user, data={"taskId": str(task.id)})
+            instance.delete()
 
 
 class AttachmentViewSet(viewsets.ModelViewSet):
@@ -611,7 +1012,10 @@ class AttachmentViewSet(viewsets.ModelViewSet):
             _delete_storage_file_by_url(att.url)
         except Exception:
             pass
-        att.delete()
+        with transaction.atomic():
+            for task in att.task_set.select_related("project"):
+                changes.record("attachment", att.id, "delete", project=task.project, actor=request.user, data={"taskId": str(task.id)})
+            att.delete()
         return Response(status=status.HTTP_204_NO_CONTENT)
 
 
@@ -660,6 +1064,16 @@ class NotificationViewSet(viewsets.ModelViewSet):
         # allow marking as read via PATCH { read: true }
         return super().partial_update(request, *args, **kwargs)
 
+    def perform_update(self, serializer):
+        with transaction.atomic():
+            n = serializer.save()
+            changes.record("notification", n.id, "update", user_ids=[n.user_id], actor=self.request.user)
+
+    def perform_destroy(self, instance):
+        with transaction.atomic():
+            changes.record("notification", instance.id, "delete", user_ids=[instance.user_id], actor=self.request.user)
+            instance.delete()
+
 
 class FolderViewSet(viewsets.ModelViewSet):
     """ViewSet for managing user folders that organize projects."""
@@ -673,7 +1087,19 @@ class FolderViewSet(viewsets.ModelViewSet):
 
     def perform_create(self, serializer):
         # Automatically set the user to the current user
-        serializer.save(user=self.request.user)
+        with transaction.atomic():
+            folder = serializer.save(user=self.request.user)
+            changes.record("folder", folder.id, "create", user_ids=[folder.user_id], actor=self.request.user)
+
+    def perform_update(self, serializer):
+        with transaction.atomic():
+            folder = serializer.save()
+            changes.record("folder", folder.id, "update", user_ids=[folder.user_id], actor=self.request.user)
+
+    def perform_destroy(self, instance):
+        with transaction.atomic():
+            changes.record("folder", instance.id, "delete", user_ids=[instance.user_id], actor=self.request.user)
+            instance.delete()
 
     @action(detail=True, methods=["post"], url_path="move-project")
     def move_project(self, request, pk=None):
@@ -687,16 +1113,18 @@ class FolderViewSet(viewsets.ModelViewSet):
         if not project_id:
             return Response({"error": "projectId required"}, status=400)
 
-        if action == "add":
-            if project_id not in folder.project_ids:
-                folder.project_ids.append(project_id)
-                folder.save()
-        elif action == "remove":
-            if project_id in folder.project_ids:
+        if action not in ("add", "remove"):
+            return Response({"error": "action must be 'add' or 'remove'"}, status=400)
+
+        with transaction.atomic():
+            if action == "add":
+                if project_id not in folder.project_ids:
+                    folder.project_ids.append(project_id)
+                    folder.save()
+            elif project_id in folder.project_ids:
                 folder.project_ids.remove(project_id)
                 folder.save()
-        else:
-            return Response({"error": "action must be 'add' or 'remove'"}, status=400)
+            changes.record("folder", folder.id, "update", user_ids=[folder.user_id], actor=request.user)
 
         return Response(FolderSerializer(folder).data)
 
@@ -710,14 +1138,17 @@ class FolderViewSet(viewsets.ModelViewSet):
         if not isinstance(folder_ids, list):
             return Response({"error": "folderIds must be an array"}, status=400)
 
-        # Update order for each folder
-        for index, folder_id in enumerate(folder_ids):
+        with transaction.atomic():
             try:
-                folder = Folder.objects.get(id=folder_id, user=request.user)
-                folder.order = index
-                folder.save(update_fields=["order"])
-            except Folder.DoesNotExist:
-                pass  # Skip folders that don't exist or don't belong to user
+                _, changed = ordering.reorder(
+                    Folder.objects.filter(user=request.user), folder_ids, touch="updated_at",
+                )
+            except ValueError as exc:
+                return Response({"error": str(exc)}, status=400)
+            changes.record_many(
+                [("folder", folder.id, "update", None, None) for folder in changed],
+                actor=request.user, user_ids=[request.user.id],
+            )
 
         # Return updated folders
         folders = Folder.objects.filter(user=request.user)
@@ -738,6 +1169,18 @@ class DirectMessageViewSet(viewsets.ModelViewSet):
             receiver=self.request.user
         )
 
+    def perform_update(self, serializer):
+        with transaction.atomic():
+            message = serializer.save()
+            conversations.message_updated(message)
+            changes.record("directMessage", message.id, "update", user_ids=[message.sender_id, message.receiver_id], actor=self.request.user)
+
+    def perform_destroy(self, instance):
+        with transaction.atomic():
+            changes.record("directMessage", instance.id, "delete", user_ids=[instance.sender_id, instance.receiver_id], actor=self.request.user)
+            conversations.forget_message(instance)
+            instance.delete()
+
     def create(self, request, *args, **kwargs):
         receiver_id = request.data.get("receiverId")
         content = request.data.get("content")
@@ -775,19 +1218,81 @@ class DirectMessageViewSet(viewsets.ModelViewSet):
             att = Attachment.objects.create(name=f.name, url=saved_path)
             attachments.append(str(att.id))
 
-        message = DirectMessage.objects.create(
-            sender=request.user,
-            receiver=receiver,
-            content=content,
-            attachments=list(dict.fromkeys(attachments)),
-            reply_to=reply_to
-        )
+        with transaction.atomic():
+            message = DirectMessage.objects.create(
+                sender=request.user,
+                receiver=receiver,
+                content=content,
+                attachments=list(dict.fromkeys(attachments)),
+                reply_to=reply_to
+            )
+            conversations.record_message(message)
+            changes.record("directMessage", message.id, "create", user_ids=[request.user.id, receiver.id], actor=request.user)
 
         # Return serialized message
         serializer = DirectMessageSerializer(message)
         return Response(serializer.data, status=status.HTTP_201_CREATED)
 
 
+class ConversationViewSet(viewsets.GenericViewSet):
+    """Direct-message inbox, one entry per conversation partner.
+
+    GET  /conversations/?before=<cursor>&limit=N                 most recent first
+    GET  /conversations/<partnerId>/messages/?before=<cursor>&limit=N
+    POST /conversations/<partnerId>/read/                         reset the unread count
+
+    Both listings are keyset-paginated (see api.pagination) and return
+    `nextCursor` for the following page, so their cost does not depend on how
+    much history the user has.
+    """
+    serializer_class = ConversationSerializer
+    permission_classes = [IsAuthenticated]
+    lookup_field = "partner_id"
+
+    def get_queryset(self):
+        return Conversation.objects.filter(user=self.request.user).select_related("last_message__reply_to")
+
+    def _page(self, request, queryset, ordering):
+        try:
+            limit = pagination.parse_limit(request.query_params.get("limit"))
+            return pagination.keyset_page(queryset, ordering, request.query_params.get("before"), limit)
+        except pagination.InvalidCursor:
+            raise ValidationError({"error": "invalid before cursor"})
+        except ValueError:
+            raise ValidationError({"error": "invalid limit"})
+
+    def list(self, request):
+        page, next_cursor = self._page(
+            request, self.get_queryset().filter(last_message_at__isnull=False), ("-last_message_at", "-id"),
+        )
+        context = {"attachments_by_id": attachments_by_id([c.last_message for c in page if c.last_message])}
+        return Response({
+            "conversations": ConversationSerializer(page, many=True, context=context).data,
+            "nextCursor": next_cursor,
+        })
+
+    @action(detail=True, methods=['get'])
+    def messages(self, request, partner_id=None):
+        conversation = self.get_object()
+        messages = conversations.messages_between(request.user.id, conversation.partner_id).select_related("reply_to")
+        page, next_cursor = self._page(request, messages, ("-timestamp", "-id"))
+        page.reverse()
+        context = {"attachments_by_id": attachments_by_id(page)}
+        return Response({
+            "messages": DirectMessageSerializer(page, many=True, context=context).data,
+            "nextCursor": next_cursor,
+        })
+
+    @action(detail=True, methods=['post'])
+    def read(self, request, partner_id=None):
+        conversation = self.get_object()
+        with transaction.atomic():
+            conversations.mark_read(request.user, conversation.partner_id)
+            changes.record("conversation", conversation.id, "update", user_ids=[request.user.id], actor=request.user)
+        conversation.refresh_from_db()
+        return Response(ConversationSerializer(conversation).data)
+
+
 class AllDataView(viewsets.ViewSet):
     # This is a hack to create an endpoint that returns all data for the current user
     # GET /api/all-data/
@@ -797,55 +1302,258 @@ class AllDataView(viewsets.ViewSet):
     #   "teams": {...},
     #   "projects": {...},
     #   "users": {...},
-    #   "directMessages": [...],
-    #   "folders": [...]
+    #   "conversations": {partnerId: {...}},
+    #   "folders": [...],
+    #   "cursor": "..."
     # }
+    #
+    # GET /api/data/?since=<cursor> returns the same sections holding only what
+    # changed after <cursor>, plus "deleted": {"projects": [ids], ...}. A response
+    # without "deleted" is a full snapshot (e.g. the cursor outlived the change log).
+    #
+    # Responses carry an ETag built from the per-scope version counters
+    # (sync.snapshot_version); a matching If-None-Match gets a 304 without
+    # building the snapshot.
+    #
+    # GET /api/data/?stream=1 (or SNAPSHOT_STREAMING=True) writes the same JSON
+    # section by section through a StreamingHttpResponse instead of building it
+    # in memory first.
+    #
+    # GET /api/data/?include=directMessages,users only returns those sections
+    # (plus "cursor"), and ?fields[projects]=name,tasks,columns,columnOrder
+    # limits each entry of a section to the listed fields (plus "id"); sections
+    # and fields left out are neither loaded nor serialized. "directMessages"
+    # (every DM the user has) is only sent when included explicitly.
     def list(self, request):
         user = request.user
-        teams = {}
-        projects = {}
-        users_dict = {}
-
-        # 1. Get all teams the user is a member of
-        team_memberships = TeamMember.objects.filter(user=user)
-        for tm in team_memberships:
-            team = tm.team
-            teams[str(team.id)] = TeamSerializer(team).data
-
-        # 2. Get all projects in those teams
-        all_projects = Project.objects.filter(team__in=teams.keys())
-        for proj in all_projects:
-            projects[str(proj.id)] = ProjectSerializer(proj).data
+        now = timezone.now()
+        since = None
+        cursor = request.query_params.get("since")
+        if cursor:
+            try:
+                since = sync.decode_cursor(cursor)
+            except sync.InvalidCursor:
+                return Response({"error": "invalid since cursor"}, status=status.HTTP_400_BAD_REQUEST)
+            if sync.is_expired(since):
+                # the change log no longer covers this cursor; fall back to a full snapshot
+                since = None
 
-        # 3. All users across these teams
-        all_team_members = TeamMember.objects.filter(team__in=teams.keys()).select_related('user')
-        for tm in all_team_members:
-            user_obj = tm.user
-            users_dict[str(user_obj.id)] = UserSerializer(user_obj).data
+        try:
+            include, fields = self._selection(request)
+        except ValueError as exc:
+            return Response({"error": str(exc)}, status=status.HTTP_400_BAD_REQUEST)
+
+        team_ids = list(TeamMember.objects.filter(user=user).values_list("team_id", flat=True))
+        version = sync.snapshot_version(
+            user, team_ids, cursor if since is not None else None,
+            sorted(include), sorted((name, sorted(names)) for name, names in fields.items()),
+            sections=include,
+        )
+        if self._wants_stream(request):
+            # Sections are written as they are loaded, in chunks, so memory
+            # stays flat however large the snapshot is.
+            chunk_size = getattr(settings, 'SNAPSHOT_STREAM_CHUNK_SIZE', 100)
+            return _conditional_response(
+                request, version,
+                lambda: streaming.streaming_response(request, (
+                    (name, streaming.ObjectStream(value) if name in self.SECTIONS else value)
+                    for name, value in self._snapshot_parts(user, team_ids, since, now, include, fields, chunk_size)
+                )),
+            )
+        return _conditional_response(
+            request, version,
+            lambda: Response(self._snapshot(user, team_ids, since, now, include, fields)),
+        )
 
-        # 4. All direct messages
-        direct_messages = DirectMessage.objects.filter(
+    SECTIONS = ("teams", "projects", "users", "notifications", "directMessages", "conversations", "folders")
+    # only sent when asked for with ?include=; DM history is paged per
+    # conversation (/conversations/<partnerId>/messages/) instead
+    OPT_IN_SECTIONS = {"directMessages"}
+
+    # serializer behind each selectable part of the snapshot
+    SECTION_SERIALIZERS = {
+        "user": UserSerializer,
+        "teams": TeamSerializer,
+        "projects": ProjectSerializer,
+        "users": UserSerializer,
+        "notifications": NotificationSerializer,
+        "directMessages": DirectMessageSerializer,
+        "conversations": ConversationSerializer,
+        "folders": FolderSerializer,
+    }
+
+    def _selection(self, request):
+        """Parse `?include=` and `?fields[<section>]=` into (sections, {section: fields}).
+
+        Raises ValueError naming the first unknown section or field.
+        """
+        include = set(self.SECTION_SERIALIZERS) - self.OPT_IN_SECTIONS
+        raw = request.query_params.get("include")
+        if raw:
+            include = {name.strip() for name in raw.split(",") if name.strip()}
+            unknown = include - set(self.SECTION_SERIALIZERS)
+            if unknown:
+                raise ValueError(f"unknown section: {sorted(unknown)[0]}")
+
+        fields = {}
+        for key in request.query_params:
+            if not (key.startswith("fields[") and key.endswith("]")):
+                continue
+            section = key[len("fields["):-1]
+            serializer_class = self.SECTION_SERIALIZERS.get(section)
+            if serializer_class is None:
+                raise ValueError(f"unknown section: {section}")
+            names = {name.strip() for name in request.query_params[key].split(",") if name.strip()}
+            readable = {name for name, field in serializer_class().fields.items() if not field.write_only}
+            if names - readable:
+                raise ValueError(f"unknown field for {section}: {sorted(names - readable)[0]}")
+            fields[section] = names
+        return include, fields
+
+    def _wants_stream(self, request):
+        value = request.query_params.get("stream")
+        if value is None:
+            return getattr(settings, 'SNAPSHOT_STREAMING', False)
+        return value.lower() in ("1", "true", "yes")
+
+    def _snapshot(self, user, team_ids, since, now, include, fields):
+        return {
+            name: dict(value) if name in self.SECTIONS else value
+            for name, value in self._snapshot_parts(user, team_ids, since, now, include, fields)
+        }
+
+    def _snapshot_parts(self, user, team_ids, since, now, include, fields, chunk_size=None):
+        """Yield the snapshot's top-level `(key, value)` pairs in response order.
+
+        Section values are lazy iterables of `(id, payload)` pairs, and only the
+        `include`d sections are produced. Without a `chunk_size` each section is
+        loaded in one go, so the snapshot costs a fixed number of queries (see
+        api.prefetch); with one, querysets are walked with `.iterator()` and
+        prefetched chunk by chunk.
+        """
+        team_qs = Team.objects.filter(id__in=team_ids)
+        project_qs = Project.objects.filter(team__in=team_ids)
+        member_qs = TeamMember.objects.filter(team__in=team_ids).select_related('user')
+        direct_messages = (DirectMessage.objects.filter(
             sender=user
         ) | DirectMessage.objects.filter(
             receiver=user
-        )
-        dm_list = {str(dm.id): DirectMessageSerializer(dm).data for dm in direct_messages.order_by('timestamp')}
+        )).select_related("reply_to")
+        notifications = Notification.objects.filter(user=user).select_related("actor")
+        conversation_qs = Conversation.objects.filter(
+            user=user, last_message_at__isnull=False,
+        ).select_related("last_message__reply_to")
+        folders = Folder.objects.filter(user=user)
 
-        # 5. All notifications
-        notifications = Notification.objects.filter(user=user)
-        notifications_list = {str(n.id): NotificationSerializer(n).data for n in notifications}
+        if since is not None:
+            # a changed team (new member, new project, renamed) resends its projects and members
+            changed_team_ids = list(team_qs.filter(updated_at__gt=since).values_list("id", flat=True))
+            team_qs = team_qs.filter(id__in=changed_team_ids)
+            project_qs = project_qs.filter(Q(updated_at__gt=since) | Q(team__in=changed_team_ids))
+            member_qs = member_qs.filter(Q(team__in=changed_team_ids) | Q(user__updated_at__gt=since))
+            direct_messages = direct_messages.filter(updated_at__gt=since)
+            notifications = notifications.filter(updated_at__gt=since)
+            conversation_qs = conversation_qs.filter(updated_at__gt=since)
+            folders = folders.filter(updated_at__gt=since)
+
+        def batches(qs):
+            if chunk_size is None:
+                yield list(qs)
+                return
+            batch = []
+            for obj in qs.iterator(chunk_size=chunk_size):
+                batch.append(obj)
+                if len(batch) >= chunk_size:
+                    yield batch
+                    batch = []
+            if batch:
+                yield batch
+
+        def wants(section, field):
+            return section not in fields or field in fields[section]
 
-        # 6. All folders
-        folders = Folder.objects.filter(user=user)
-        folders_list = {str(f.id): FolderSerializer(f).data for f in folders}
-        
-        return Response({
-            "user": UserSerializer(user).data,
-            "teams": teams,
-            "projects": projects,
-            "users": users_dict,
-            "notifications": notifications_list,
-            "directMessages": dm_list,
-            "folders": folders_list,
-        })
+        # 1. Get all teams the user is a member of
+        def team_entries():
+            if wants("teams", "members"):
+                teams = team_qs.prefetch_related(*TEAM_PREFETCH)
+            else:
+                teams = team_qs
+            for batch in batches(teams):
+                for team in batch:
+                    yield str(team.id), TeamSerializer(team, fields=fields.get("teams")).data
+
+        # 2. Get all projects in those teams. Projects whose version is
+        # unchanged come from the payload cache and are neither prefetched
+        # nor serialized.
+        def project_entries():
+            project_fields = fields.get("projects")
+            variant = ",".join(sorted(project_fields)) if project_fields is not None else ""
+            for batch in batches(project_qs):
+                versions = sync.project_versions(batch)
+                cached = project_cache.get_many(versions, variant)
+                missing = [proj for proj in batch if proj.id not in cached]
+                prefetch_related_objects(missing, *project_prefetch(project_fields))
+                fresh = {proj.id: ProjectSerializer(proj, fields=project_fields).data for proj in missing}
+                project_cache.set_many({pid: (versions[pid], data) for pid, data in fresh.items()}, variant)
+                for proj in batch:
+                    yield str(proj.id), cached[proj.id] if proj.id in cached else fresh[proj.id]
 
+        # 3. All users across these teams
+        def user_entries():
+            seen = set()
+            for batch in batches(member_qs):
+                for tm in batch:
+                    if tm.user_id not in seen:
+                        seen.add(tm.user_id)
+                        yield str(tm.user_id), UserSerializer(tm.user, fields=fields.get("users")).data
+
+        # 4. All notifications
+        def notification_entries():
+            for batch in batches(notifications):
+                for n in batch:
+                    yield str(n.id), NotificationSerializer(n, fields=fields.get("notifications")).data
+
+        # 5. All direct messages
+        def direct_message_entries():
+            for batch in batches(direct_messages.order_by('timestamp')):
+                context = {"attachments_by_id": {}}
+                if wants("directMessages", "attachments"):
+                    context["attachments_by_id"] = attachments_by_id(batch)
+                for dm in batch:
+                    yield str(dm.id), DirectMessageSerializer(dm, context=context, fields=fields.get("directMessages")).data
+
+        # 6. The DM inbox (one entry per conversation partner)
+        def conversation_entries():
+            for batch in batches(conversation_qs):
+                context = {"attachments_by_id": {}}
+                if wants("conversations", "lastMessage"):
+                    context["attachments_by_id"] = attachments_by_id([c.last_message for c in batch if c.last_message])
+                for conversation in batch:
+                    yield str(conversation.partner_id), ConversationSerializer(
+                        conversation, context=context, fields=fields.get("conversations"),
+                    ).data
+
+        # 7. All folders
+        def folder_entries():
+            for batch in batches(folders):
+                for f in batch:
+                    yield str(f.id), FolderSerializer(f, fields=fields.get("folders")).data
+
+        if "user" in include:
+            yield "user", UserSerializer(user, fields=fields.get("user")).data
+        sections = {
+            "teams": team_entries,
+            "projects": project_entries,
+            "users": user_entries,
+            "notifications": notification_entries,
+            "directMessages": direct_message_entries,
+            "conversations": conversation_entries,
+            "folders": folder_entries,
+        }
+        for name, entries in sections.items():
+            if name in include:
+                yield name, entries()
+        yield "cursor", sync.encode_cursor(now)
+        if since is not None:
+            deleted = sync.deleted_since(user, team_ids, since)
+            yield "deleted", {name: ids for name, ids in deleted.items() if name in include}
@@ -192,9 +192,99 @@ DEFAULT_AUTO_FIELD = 'django.db.models.BigAutoField'
 CELERY_BROKER_URL = os.getenv('CELERY_BROKER_URL', 'redis://localhost:6379/0')
 CELERY_RESULT_BACKEND = os.getenv('CELERY_RESULT_BACKEND', CELERY_BROKER_URL)
 
+# Notification delivery runs one task per channel on its own queue, so push
+# never waits behind a slow email or SMS provider (see docker-compose.yml for
+# the workers consuming each queue).
+CELERY_TASK_ROUTES = {
+    'api.notifications.deliver_push_task': {'queue': 'push'},
+    'api.notifications.deliver_email_task': {'queue': 'email'},
+    'api.notifications.deliver_sms_task': {'queue': 'sms'},
+}
+# provider calls are I/O-bound: hand out one batch per worker slot at a time
+CELERY_WORKER_PREFETCH_MULTIPLIER = int(os.getenv('CELERY_WORKER_PREFETCH_MULTIPLIER', 1))
+
+# Redis pub/sub used to push change events to /api/events/ subscribers
+REALTIME_REDIS_URL = os.getenv('REALTIME_REDIS_URL', CELERY_BROKER_URL)
+
+# Cache for serialized project payloads (api.project_cache). Uses Redis when
+# CACHE_REDIS_URL is set, otherwise a per-process in-memory cache.
+CACHE_REDIS_URL = os.getenv('CACHE_REDIS_URL')
+if CACHE_REDIS_URL:
+    CACHES = {
+        'default': {
+            'BACKEND': 'django.core.cache.backends.redis.RedisCache',
+            'LOCATION': CACHE_REDIS_URL,
+        }
+    }
+else:
+    CACHES = {
+        'default': {
+            'BACKEND': 'django.core.cache.backends.locmem.LocMemCache',
+        }
+    }
+PROJECT_CACHE_TIMEOUT = int(os.getenv('PROJECT_CACHE_TIMEOUT', 600))
+
+# /api/data/ streaming: stream by default, and how many rows to load per chunk
+SNAPSHOT_STREAMING = os.getenv('SNAPSHOT_STREAMING', 'False') == 'True'
+SNAPSHOT_STREAM_CHUNK_SIZE = int(os.getenv('SNAPSHOT_STREAM_CHUNK_SIZE', 100))
+
+# /api/projects/<id>/board/: tasks loaded per column before paging with /columns/<id>/tasks/
+BOARD_COLUMN_TASK_LIMIT = int(os.getenv('BOARD_COLUMN_TASK_LIMIT', 20))
+# Longest window /api/tasks/calendar/ answers (a month view plus its leading/trailing weeks)
+CALENDAR_MAX_DAYS = int(os.getenv('CALENDAR_MAX_DAYS', 62))
+
+# Periodic jobs (run with `celery -A backend.celery:app beat`)
+CELERY_BEAT_SCHEDULE = {
+    'compact-change-events': {
+        'task': 'api.changes.compact_change_events',
+        'schedule': timedelta(minutes=30),
+    },
+    'archive-completed-tasks': {
+        'task': 'api.archive.archive_completed_tasks',
+        'schedule': timedelta(hours=6),
+    },
+    'relay-notification-outbox': {
+        'task': 'api.notifications.relay_notification_outbox',
+        'schedule': timedelta(minutes=1),
+    },
+    'send-email-digests': {
+        'task': 'api.digests.send_email_digests_task',
+        'schedule': timedelta(hours=int(os.getenv('NOTIFICATION_EMAIL_DIGEST_HOURS', 24))),
+    },
+    'send-due-reminders': {
+        'task': 'api.reminders.send_due_reminders_task',
+        'schedule': timedelta(minutes=5),
+    },
+}
+
+# Change log (api.ChangeEvent): how long events are kept at all, and after how
+# long per-entity history is collapsed to the latest event
+CHANGE_EVENT_RETENTION_DAYS = int(os.getenv('CHANGE_EVENT_RETENTION_DAYS', 7))
+CHANGE_EVENT_COMPACT_AFTER_HOURS = int(os.getenv('CHANGE_EVENT_COMPACT_AFTER_HOURS', 1))
+
+# Task ordering (api.ranking): a column is re-spread in the background once a
+# task rank grows longer than this many characters
+TASK_RANK_REBALANCE_LENGTH = int(os.getenv('TASK_RANK_REBALANCE_LENGTH', 24))
+# Upper bound on operations in one POST /api/tasks/batch/
+TASK_BATCH_MAX_OPERATIONS = int(os.getenv('TASK_BATCH_MAX_OPERATIONS', 500))
+# Completed tasks are archived off the board this many days after completion (0 disables)
+TASK_ARCHIVE_AFTER_DAYS = int(os.getenv('TASK_ARCHIVE_AFTER_DAYS', 30))
+# Assignees are reminded of open tasks this long before they are due (api.reminders)
+TASK_REMINDER_LEAD_MINUTES = int(os.getenv('TASK_REMINDER_LEAD_MINUTES', 24 * 60))
+
 # Notification provider configuration (set these in your environment in production)
 # Path to Firebase service account JSON file, or JSON string
 FIREBASE_SERVICE_ACCOUNT_JSON_PATH = str(BASE_DIR) + "/" + str(os.getenv('FIREBASE_SERVICE_ACCOUNT_JSON'))
+# Notifications from one event are delivered by one Celery task per this many rows
+NOTIFICATION_DELIVERY_BATCH_SIZE = int(os.getenv('NOTIFICATION_DELIVERY_BATCH_SIZE', 100))
+# The first notification a user gets on a channel goes out at once; follow-ups
+# within this many seconds are held and sent as one digest (0 sends all at once)
+NOTIFICATION_COALESCE_SECONDS = int(os.getenv('NOTIFICATION_COALESCE_SECONDS', 60))
+# Email notifications as a periodic digest (api.digests) instead of one by one
+NOTIFICATION_EMAIL_DIGEST = os.getenv('NOTIFICATION_EMAIL_DIGEST', 'False') == 'True'
+NOTIFICATION_EMAIL_DIGEST_HOURS = int(os.getenv('NOTIFICATION_EMAIL_DIGEST_HOURS', 24))
+# Push messages per FCM send_each request (FCM accepts at most 500)
+FCM_BATCH_SIZE = int(os.getenv('FCM_BATCH_SIZE', 500))
 # SendGrid / Twilio keys
 SENDGRID_API_KEY = os.getenv('SENDGRID_API_KEY')
 TWILIO_ACCOUNT_SID = os.getenv('TWILIO_ACCOUNT_SID')
@@ -10,5 +10,5 @@ echo "Running database migrations..."
 cd /app/backend
 python manage.py migrate --noinput
 
-echo "Starting Django development server..."
-python manage.py runserver 0.0.0.0:8000
\ No newline at end of file
+echo "Starting Django ASGI server..."
+uvicorn backend.asgi:application --host 0.0.0.0 --port 8000
\ No newline at end of file
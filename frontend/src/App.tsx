@@ -19,7 +19,7 @@ import CalendarPage from '@pages/CalendarPage';
 
 // Services & Types
 import { authService, projectService, taskService, subtaskService, columnService, teamService, messageService, userService, fetchVersion, registerForPush, unregisterPush, folderService } from '@services/index';
-import type { Project, Task, Subtask, User, Team, DirectMessage, Folder } from '@/types';
+import type { Project, Task, Subtask, User, Team, DirectMessage, Conversation, Folder, ChatMessage } from '@/types';
 import { Layout } from 'lucide-react';
 import { on } from 'events';
 
@@ -41,7 +41,12 @@ function App() {
     const [teams, setTeams] = useState<{ [key: string]: Team }>({});
     const [users, setUsers] = useState<{ [key: string]: User }>({});
     const [folders, setFolders] = useState<{ [key: string]: Folder }>({});
-    const [directMessages, setDirectMessages] = useState<{ [key: string]: DirectMessage }>({});
+    // DM inbox; each conversation's messages are paged by MessagesPage
+    const [conversations, setConversations] = useState<{ [partnerId: string]: Conversation }>({});
+    // Project chat is paginated separately from the project payload
+    const [chatMessages, setChatMessages] = useState<{ [projectId: string]: ChatMessage[] }>({});
+    // bumped on task create/edit/delete so views that query tasks by range (the calendar) refetch
+    const [taskRevision, setTaskRevision] = useState(0);
     const [notifications, setNotifications] = useState<any[]>([]);
 
     const [isLoading, setIsLoading] = useState(true);
@@ -104,8 +109,8 @@ function App() {
     // }, [teams]);
 
     // useEffect(() => {
-    //     console.log("Direct messages updated:", directMessages);
-    // }, [directMessages]);
+    //     console.log("Conversations updated:", conversations);
+    // }, [conversations]);
 
     // useEffect(() => {
     //     console.log("users updated:", users);
@@ -121,7 +126,7 @@ function App() {
                 if (v !== fetchVersion - 1) { throw new Error("Fetch version mismatch"); };
                 setProjects(data.projects);
                 setTeams(data.teams);
-                setDirectMessages(data.directMessages);
+                setConversations(data.conversations ?? {});
                 setUsers(data.users);
                 if (data.notifications) {
                     setNotifications(data.notifications);
@@ -145,6 +150,22 @@ function App() {
         return () => clearInterval(intervalId);
     }, [currentUser]);
 
+    // Keep the latest page of the open project's chat fresh
+    useEffect(() => {
+        if (!currentUser || currentPage !== 'project' || !currentProjectId) return;
+        const fetchChat = async () => {
+            try {
+                const page = await messageService.fetchChatMessages(currentProjectId);
+                setChatMessages(prev => ({ ...prev, [currentProjectId]: page.messages }));
+            } catch (err) {
+                console.error("Failed to fetch chat messages:", err);
+            }
+        };
+        fetchChat();
+        const intervalId = setInterval(fetchChat, 4500);
+        return () => clearInterval(intervalId);
+    }, [currentUser, currentPage, currentProjectId]);
+
 
 
     // Auth check on initial load
@@ -158,7 +179,7 @@ function App() {
                     const data = await userService.fetchAllUserData();
                     setProjects(data.projects);
                     setTeams(data.teams);
-                    setDirectMessages(data.directMessages);
+                    setConversations(data.conversations ?? {});
                     setUsers(data.users);
                     if (data.folders) {
                         setFolders(data.folders);
@@ -206,7 +227,7 @@ function App() {
             const data = await userService.fetchAllUserData();
             setProjects(data.projects);
             setTeams(data.teams);
-            setDirectMessages(data.directMessages);
+            setConversations(data.conversations ?? {});
             setUsers(data.users);
 
             // Check if it's the first login to show onboarding
@@ -242,7 +263,7 @@ function App() {
             const data = await userService.fetchAllUserData();
             setProjects(data.projects);
             setTeams(data.teams);
-            setDirectMessages(data.directMessages);
+            setConversations(data.conversations ?? {});
             setUsers(data.users);
 
             // Navigate to dashboard after registration
@@ -274,7 +295,7 @@ function App() {
         setCurrentUser(null);
         setProjects({});
         setTeams({});
-        setDirectMessages({});
+        setConversations({});
         setCurrentPage('dashboard');
         setCurrentProjectId(null);
         navigateURL("/");
@@ -410,6 +431,7 @@ function App() {
                         }
                     }
                 }))
+                setTaskRevision(rev => rev + 1);
                 addToast('task created successfully!', 'success');
                 return newTask;
             })
@@ -429,6 +451,7 @@ function App() {
                         }
                     }
                 }))
+                setTaskRevision(rev => rev + 1);
 
                 addToast('Task updated successfully!', 'success');
             })
@@ -439,15 +462,36 @@ function App() {
     };
 
     const handleMoveTask = async (projectId: string, taskId: string, toColumnId: string, position: number) => {
-        taskService.move(taskId, toColumnId, position)
-            .then(({ columns }) => {
-                setProjects(prev => ({
-                    ...prev,
-                    [projectId]: {
-                        ...prev[projectId],     // keep existing project data
-                        columns,                // update only the columns
+        const expectedVersion = projects[projectId]?.tasks[taskId]?.positionVersion;
+        taskService.move(taskId, toColumnId, position, expectedVersion)
+            .then((move) => {
+                setProjects(prev => {
+                    const project = prev[projectId];
+                    // apply the move to the two columns involved only
+                    const columns = { ...project.columns };
+                    if (move.fromColumnId && columns[move.fromColumnId]) {
+                        columns[move.fromColumnId] = {
+                            ...columns[move.fromColumnId],
+                            taskIds: columns[move.fromColumnId].taskIds.filter(id => id !== taskId),
+                        };
                     }
-                }));
+                    if (move.columnId && columns[move.columnId]) {
+                        const taskIds = columns[move.columnId].taskIds.filter(id => id !== taskId);
+                        taskIds.splice(move.position, 0, taskId);
+                        columns[move.columnId] = { ...columns[move.columnId], taskIds };
+                    }
+                    const task = project.tasks[taskId];
+                    return {
+                        ...prev,
+                        [projectId]: {
+                            ...project,
+                            columns,
+                            tasks: task
+                                ? { ...project.tasks, [taskId]: { ...task, columnId: move.columnId, positionVersion: move.positionVersion } }
+                                : project.tasks,
+                        }
+                    };
+                });
                 addToast('task moved successfully!', 'success');
             })
             .catch(() => addToast('Failed to move task.', 'error'));
@@ -456,6 +500,7 @@ function App() {
     const handleDeleteTask = async (taskId: string) => {
         taskService.delete(taskId)
             .then(() => {
+                setTaskRevision(rev => rev + 1);
                 addToast("Task deleted.", "info");;
             })
             .catch(() => addToast('Failed to delete task.', 'error'));
@@ -551,14 +596,10 @@ function App() {
         try {
             // Call backend API to save message
             const savedMessage = await messageService.sendChatMessage(projectId, content, attachments, parentId);
-            const updatedMessages = [...projects[projectId].chatMessages, savedMessage];
 
-            setProjects(prev => ({
+            setChatMessages(prev => ({
                 ...prev,
-                [projectId]: {
-                    ...prev[projectId],
-                    chatMessages: updatedMessages,
-                }
+                [projectId]: [...(prev[projectId] ?? []), savedMessage],
             }))
 
             addToast('Message sent!', 'success');
@@ -623,12 +664,19 @@ function App() {
         handleNavigate('messages');
     };
 
-    const handleSendDirectMessage = (receiverId: string, content: string, attachments?: File[], parentId?: string) => {
-        messageService.sendDirectMessage(receiverId, content, attachments, parentId)
+    const handleSendDirectMessage = (receiverId: string, content: string, attachments?: File[], parentId?: string): Promise<DirectMessage | null> => {
+        return messageService.sendDirectMessage(receiverId, content, attachments, parentId)
             .then(newDm => {
-                setDirectMessages(prev => ({ ...prev, [newDm.id]: newDm }));
+                setConversations(prev => ({
+                    ...prev,
+                    [receiverId]: { ...prev[receiverId], partnerId: receiverId, lastMessage: newDm, lastMessageAt: newDm.timestamp, unreadCount: prev[receiverId]?.unreadCount ?? 0 },
+                }));
+                return newDm;
             })
-            .catch(() => addToast('Failed to send message.', 'error'));
+            .catch(() => {
+                addToast('Failed to send message.', 'error');
+                return null;
+            });
     };
 
     const handleInviteMember = (teamId: string, email: string) => {
@@ -819,7 +867,9 @@ function App() {
     const userProjects = Object.values(projects).filter(p => userTeamIds.includes(p.teamId));
     const userNotifications = Object.values(notifications).filter(n => n.user === currentUser.id);
 
-    const currentProject = currentProjectId ? projects[currentProjectId] : null;
+    const currentProject = currentProjectId && projects[currentProjectId]
+        ? { ...projects[currentProjectId], chatMessages: chatMessages[currentProjectId] ?? projects[currentProjectId].chatMessages ?? [] }
+        : null;
     const currentTeamForProject = currentProject ? teams[currentProject.teamId] : null;
 
     return (
@@ -878,10 +928,10 @@ function App() {
                     {currentPage === 'project' && currentProject && currentTeamForProject && <ProjectPage project={currentProject} team={currentTeamForProject} currentUser={currentUser} onUpdateProject={handleUpdateProject} onDeleteProject={handleDeleteProject} onCreateColumn={handleCreateColumn} taskToOpen={taskToOpen} onClearTaskToOpen={clearTaskToOpen} onMoveColumn={handleMoveColumn} onSendMessage={handleSendMessage} onCreateTask={handleCreateTask} onUpdateTask={handleUpdateTask} onDeleteTask={handleDeleteTask} onMoveTask={handleMoveTask} onCreateComment={handleCreateComment} onUploadTaskAttachment={handleUploadTaskAttachment} onDeleteTaskAttachment={handleDeleteTaskAttachment} onCreateSubtask={handleCreateSubtask} onUpdateSubtask={handleUpdateSubtask} onDeleteSubtask={handleDeleteSubtask} onUpdateColumn={handleUpdateColumn} onDeleteColumn={handleDeleteColumn} addToast={addToast} />}
                     {currentPage === 'teams' && <div className="flex-1 min-h-0"><TeamsPage currentUser={currentUser} allUsers={users} allTeams={Object.values(teams)} allProjects={projects} onSelectProject={handleSelectProject} onCreateTeam={handleCreateTeam} onUpdateTeam={handleUpdateTeam} onDeleteTeam={handleDeleteTeam} onCreateProject={handleCreateProject} onStartConversation={handleStartConversation} onInviteMember={handleInviteMember} onRequestToJoin={handleRequestToJoinTeam} onManageJoinRequest={handleManageJoinRequest} teamToSelect={teamToSelect} onClearTeamToSelect={clearTeamToSelect} /></div>}
                     {currentPage === 'settings' && <ProfilePage currentUser={currentUser} projects={userProjects} isDarkMode={isDarkMode} onToggleTheme={() => setIsDarkMode(!isDarkMode)} onUpdateUser={handleUpdateUser} />}
-                    {currentPage === 'messages' && <MessagesPage currentUser={currentUser} users={users} directMessages={Object.values(directMessages)} onSendMessage={handleSendDirectMessage} initialPartnerId={currentConversationPartnerId} onNavigateToUser={handleStartConversation} onViewUser={handleViewUser} allUsers={users} allTeams={teams} />}
+                    {currentPage === 'messages' && <MessagesPage currentUser={currentUser} users={users} conversations={Object.values(conversations)} onSendMessage={handleSendDirectMessage} initialPartnerId={currentConversationPartnerId} onNavigateToUser={handleStartConversation} onViewUser={handleViewUser} allUsers={users} allTeams={teams} />}
                     {currentPage === 'search' && <SearchPage query={searchQuery} allProjects={Object.values(projects)} allTeams={Object.values(teams)} allUsers={Object.values(users)} onSelectProject={handleSelectProject} onSelectTask={handleSelectTaskFromSearch} onNavigateToTeam={handleNavigateToTeam} onStartConversation={handleStartConversation} onViewUser={handleViewUser} />}
                     {currentPage === 'notifications' && <NotificationsPage currentUser={currentUser} allUsers={users} notifications={userNotifications} onNotificationsUpdate={setNotifications} />}
-                    {currentPage === 'calendar' && <CalendarPage projects={userProjects} teams={userTeams} onSelectTask={handleSelectTaskFromSearch} onSelectProject={handleSelectProject} />}
+                    {currentPage === 'calendar' && <CalendarPage teams={userTeams} taskRevision={taskRevision} onSelectTask={handleSelectTaskFromSearch} onSelectProject={handleSelectProject} />}
                 </main>
             </div>
         </div>
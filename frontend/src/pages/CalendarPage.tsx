@@ -1,25 +1,27 @@
-import React, { useState, useMemo } from 'react';
-import type { Project, Task, Team } from '@/types';
+import React, { useState, useMemo, useEffect } from 'react';
+import type { CalendarEntry, Task, Team } from '@/types';
+import { taskService } from '@/services';
 import {
     ChevronLeft,
     ChevronRight,
     Calendar as CalendarIcon,
     Clock,
     CheckCircle2,
-    AlertCircle,
     Briefcase,
     Users
 } from 'lucide-react';
 import Avatar from '@/components/common/Avatar';
 
 interface CalendarPageProps {
-    projects: Project[];
     teams: Team[];
+    // bumped by the app whenever a task is created, edited or deleted
+    taskRevision: number;
     onSelectTask: (projectId: string, taskId: string) => void;
     onSelectProject: (projectId: string) => void;
 }
 
-interface CalendarTask extends Task {
+// The fields a calendar cell shows; GET /tasks/calendar/ returns exactly these
+interface CalendarTask extends Pick<Task, 'id' | 'title' | 'dueDate' | 'priority' | 'completed' | 'assignees'> {
     projectId: string;
     projectName: string;
     teamName?: string;
@@ -32,30 +34,67 @@ const MONTHS = [
     'July', 'August', 'September', 'October', 'November', 'December'
 ];
 
-const CalendarPage: React.FC<CalendarPageProps> = ({ projects, teams, onSelectTask, onSelectProject }) => {
+const CalendarPage: React.FC<CalendarPageProps> = ({ teams, taskRevision, onSelectTask, onSelectProject }) => {
     const [currentDate, setCurrentDate] = useState(new Date());
     const [selectedDate, setSelectedDate] = useState<Date | null>(null);
     const [view, setView] = useState<'month' | 'week'>('month');
 
-    // Get all tasks with due dates from all projects
-    const allTasks = useMemo((): CalendarTask[] => {
-        return projects.flatMap(project => {
-            const team = teams.find(t => t.id === project.teamId);
-            return Object.values(project.tasks)
-                .filter((task: Task) => task.dueDate)
-                .map((task: Task) => ({
-                    ...task,
-                    projectId: project.id,
-                    projectName: project.name,
-                    teamName: team?.name,
-                    teamIcon: team?.icon
-                }));
-        });
-    }, [projects, teams]);
+    // Visible window: the month, or the week in week view
+    const [rangeStart, rangeEnd] = useMemo(() => {
+        if (view === 'week') {
+            const start = new Date(currentDate);
+            start.setDate(start.getDate() - start.getDay());
+            start.setHours(0, 0, 0, 0);
+            const end = new Date(start);
+            end.setDate(end.getDate() + 6);
+            end.setHours(23, 59, 59, 999);
+            return [start.toISOString(), end.toISOString()];
+        }
+        const start = new Date(currentDate.getFullYear(), currentDate.getMonth(), 1);
+        const end = new Date(currentDate.getFullYear(), currentDate.getMonth() + 1, 0, 23, 59, 59, 999);
+        return [start.toISOString(), end.toISOString()];
+    }, [currentDate, view]);
+
+    // The next 7 days, for the "Today" and "Upcoming" stats and list
+    const [agendaStart, agendaEnd] = useMemo(() => {
+        const start = new Date();
+        start.setHours(0, 0, 0, 0);
+        const end = new Date(start);
+        end.setDate(end.getDate() + 7);
+        end.setHours(23, 59, 59, 999);
+        return [start.toISOString(), end.toISOString()];
+    }, [taskRevision]);
+
+    // Tasks due in the window, queried by date range; refetched only when the
+    // window moves or a task is changed, not on every background data poll
+    const [windowEntries, setWindowEntries] = useState<CalendarEntry[]>([]);
+    useEffect(() => {
+        let cancelled = false;
+        taskService.calendar(rangeStart, rangeEnd)
+            .then(({ tasks }) => { if (!cancelled) setWindowEntries(tasks); })
+            .catch(() => { if (!cancelled) setWindowEntries([]); });
+        return () => { cancelled = true; };
+    }, [rangeStart, rangeEnd, taskRevision]);
+
+    const [agendaEntries, setAgendaEntries] = useState<CalendarEntry[]>([]);
+    useEffect(() => {
+        let cancelled = false;
+        taskService.calendar(agendaStart, agendaEnd)
+            .then(({ tasks }) => { if (!cancelled) setAgendaEntries(tasks); })
+            .catch(() => { if (!cancelled) setAgendaEntries([]); });
+        return () => { cancelled = true; };
+    }, [agendaStart, agendaEnd]);
+
+    const withTeam = (entries: CalendarEntry[]): CalendarTask[] => entries.map(entry => {
+        const team = teams.find(t => t.id === entry.teamId);
+        return { ...entry, teamName: team?.name, teamIcon: team?.icon };
+    });
+    const windowTasks = useMemo(() => withTeam(windowEntries), [windowEntries, teams]);
+    const agendaTasks = useMemo(() => withTeam(agendaEntries), [agendaEntries, teams]);
 
     // Get tasks for a specific date
-    const getTasksForDate = (date: Date): CalendarTask[] => {
-        return allTasks.filter(task => {
+    const getTasksForDate = (date: Date, source: CalendarTask[] = windowTasks): CalendarTask[] => {
+        return source.filter(task => {
             if (!task.dueDate) return false;
             const taskDate = new Date(task.dueDate);
             return (
@@ -162,41 +201,26 @@ const CalendarPage: React.FC<CalendarPageProps> = ({ projects, teams, onSelectTa
         const nextWeek = new Date(today);
         nextWeek.setDate(nextWeek.getDate() + 7);
 
-        return allTasks
+        return agendaTasks
             .filter(task => {
                 if (!task.dueDate) return false;
                 const dueDate = new Date(task.dueDate);
                 return dueDate >= today && dueDate <= nextWeek && !task.completed;
             })
             .sort((a, b) => new Date(a.dueDate!).getTime() - new Date(b.dueDate!).getTime());
-    }, [allTasks]);
+    }, [agendaTasks]);
 
-    // Stats
+    // Stats, all from the two fetched windows
     const stats = useMemo(() => {
         const today = new Date();
         today.setHours(0, 0, 0, 0);
 
-        const thisMonth = allTasks.filter(task => {
-            if (!task.dueDate) return false;
-            const dueDate = new Date(task.dueDate);
-            return dueDate.getMonth() === currentDate.getMonth() &&
-                dueDate.getFullYear() === currentDate.getFullYear();
-        });
-
-        const overdue = allTasks.filter(task => {
-            if (!task.dueDate || task.completed) return false;
-            return new Date(task.dueDate) < today;
-        });
-
-        const todayTasks = getTasksForDate(today);
-
         return {
-            thisMonth: thisMonth.length,
-            overdue: overdue.length,
-            today: todayTasks.length,
+            visible: windowTasks.length,
+            today: getTasksForDate(today, agendaTasks).length,
             upcoming: upcomingTasks.length
         };
-    }, [allTasks, currentDate, upcomingTasks]);
+    }, [windowTasks, agendaTasks, upcomingTasks]);
 
     const getPriorityColor = (priority: string): string => {
         switch (priority) {
@@ -261,15 +285,15 @@ const CalendarPage: React.FC<CalendarPageProps> = ({ projects, teams, onSelectTa
             </div>
 
             {/* Stats Row */}
-            <section className="grid grid-cols-2 md:grid-cols-4 gap-4 opacity-0 animate-slide-up" style={{ animationDelay: '0.1s' }}>
+            <section className="grid grid-cols-1 sm:grid-cols-3 gap-4 opacity-0 animate-slide-up" style={{ animationDelay: '0.1s' }}>
                 <div className="glass-panel p-4 rounded-xl border border-white/50 dark:border-gray-700/50">
                     <div className="flex items-center gap-3">
                         <div className="p-2 bg-blue-100 dark:bg-blue-900/30 rounded-lg">
                             <CalendarIcon size={20} className="text-blue-600 dark:text-blue-400" />
                         </div>
                         <div>
-                            <p className="text-xs font-semibold text-gray-500 dark:text-gray-400 uppercase">This Month</p>
-                            <p className="text-2xl font-bold text-gray-800 dark:text-white">{stats.thisMonth}</p>
+                            <p className="text-xs font-semibold text-gray-500 dark:text-gray-400 uppercase">{view === 'week' ? 'This Week' : 'This Month'}</p>
+                            <p className="text-2xl font-bold text-gray-800 dark:text-white">{stats.visible}</p>
                         </div>
                     </div>
                 </div>
@@ -295,17 +319,6 @@ const CalendarPage: React.FC<CalendarPageProps> = ({ projects, teams, onSelectTa
                         </div>
                     </div>
                 </div>
-                <div className="glass-panel p-4 rounded-xl border border-white/50 dark:border-gray-700/50">
-                    <div className="flex items-center gap-3">
-                        <div className="p-2 bg-red-100 dark:bg-red-900/30 rounded-lg">
-                            <AlertCircle size={20} className="text-red-600 dark:text-red-400" />
-                        </div>
-                        <div>
-                            <p className="text-xs font-semibold text-gray-500 dark:text-gray-400 uppercase">Overdue</p>
-                            <p className="text-2xl font-bold text-gray-800 dark:text-white">{stats.overdue}</p>
-                        </div>
-                    </div>
-                </div>
             </section>
 
             <div className="grid grid-cols-1 xl:grid-cols-3 gap-6">
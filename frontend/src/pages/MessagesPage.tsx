@@ -1,17 +1,18 @@
 
 import React, { useState, useEffect, useRef, useMemo } from 'react';
 import { Send, Search, MessageSquare, Plus, Phone, Video, Info, Mail, Paperclip, Loader2, Check, CheckCheck, XCircle, CornerDownLeft, X, ChevronsLeft, ChevronsRight } from 'lucide-react';
-import type { User, DirectMessage, Attachment, Team } from '@/types';
+import type { User, DirectMessage, Conversation, Attachment, Team } from '@/types';
 import Avatar from '@components/common/Avatar';
 import NewChatModal from '@components/modals/NewChatModal'; // Import the new modal
 import Spinner from '@components/common/Spinner';
 import { API_URL } from '@/utils';
+import { messageService } from '@/services';
 
 interface MessagesPageProps {
     currentUser: User;
     users: { [key: string]: User };
-    directMessages: DirectMessage[];
-    onSendMessage: (receiverId: string, content: string, attachments?: File[], parentId?: string) => void;
+    conversations: Conversation[];
+    onSendMessage: (receiverId: string, content: string, attachments?: File[], parentId?: string) => Promise<DirectMessage | null>;
     initialPartnerId: string | null;
     onNavigateToUser: (userId: string) => void;
     onViewUser: (user: User) => void;
@@ -22,6 +23,15 @@ interface MessagesPageProps {
 const MIN_WIDTH = 280;
 const MAX_WIDTH = 450;
 const COLLAPSED_WIDTH = 80;
+// how often the open conversation's latest page is refreshed
+const POLL_INTERVAL_MS = 4500;
+
+// Merge a page of messages into those already loaded, oldest first
+const mergeMessages = (loaded: DirectMessage[], page: DirectMessage[]): DirectMessage[] => {
+    const byId = new Map(loaded.map(msg => [msg.id, msg]));
+    page.forEach(msg => byId.set(msg.id, msg));
+    return Array.from(byId.values()).sort((a, b) => new Date(a.timestamp).getTime() - new Date(b.timestamp).getTime());
+};
 
 
 const fileToAttachment = (file: File): Attachment => ({
@@ -52,7 +62,7 @@ const isDifferentDay = (d1: string, d2: string) => {
     return new Date(d1).toDateString() !== new Date(d2).toDateString();
 };
 
-export const MessagesPage: React.FC<MessagesPageProps> = ({ currentUser, users, directMessages, onSendMessage, initialPartnerId, onNavigateToUser, onViewUser, allUsers, allTeams }) => {
+export const MessagesPage: React.FC<MessagesPageProps> = ({ currentUser, users, conversations, onSendMessage, initialPartnerId, onNavigateToUser, onViewUser, allUsers, allTeams }) => {
     const [selectedPartnerId, setSelectedPartnerId] = useState<string | null>(null);
     const [newMessage, setNewMessage] = useState('');
     const [selectedFiles, setSelectedFiles] = useState<File[]>([]);
@@ -60,6 +70,10 @@ export const MessagesPage: React.FC<MessagesPageProps> = ({ currentUser, users,
     const [isUserListCollapsed, setUserListCollapsed] = useState(false);
     const [isResizing, setIsResizing] = useState(false);
     const [searchQuery, setSearchQuery] = useState('');
+    // the open conversation's loaded messages and the cursor of the next older page
+    const [conversationMessages, setConversationMessages] = useState<DirectMessage[]>([]);
+    const [olderCursor, setOlderCursor] = useState<string | null>(null);
+    const [isLoadingOlder, setIsLoadingOlder] = useState(false);
 
     const messagesEndRef = useRef<HTMLDivElement>(null);
     const fileInputRef = useRef<HTMLInputElement>(null);
@@ -77,26 +91,14 @@ export const MessagesPage: React.FC<MessagesPageProps> = ({ currentUser, users,
     }, [sidebarWidth]);
 
 
-    // --- Derived Data: Sorted Contacts with Last Message ---
+    // --- Derived Data: Sorted Contacts with Last Message (from the inbox) ---
     const contacts = useMemo(() => {
-        // Fix: Explicitly type 'otherUsers' to avoid 'unknown' inference in map
-        const otherUsers = (Object.values(users) as User[]).filter((u: User) => u.id !== currentUser.id);
-
-        return otherUsers.map(user => {
-            const msgs = directMessages.filter(
-                m => (m.senderId === currentUser.id && m.receiverId === user.id) ||
-                    (m.senderId === user.id && m.receiverId === currentUser.id)
-            );
-            // Sort to find last message
-            const sortedMsgs = msgs.sort((a, b) => new Date(b.timestamp).getTime() - new Date(a.timestamp).getTime());
-            const lastMsg = sortedMsgs[0];
-
-            return {
-                user,
-                lastMessage: lastMsg,
-                timestamp: lastMsg ? new Date(lastMsg.timestamp).getTime() : 0
-            };
-        }).sort((a, b) => {
+        return conversations.filter(c => c.partnerId !== currentUser.id && users[c.partnerId]).map(c => ({
+            user: users[c.partnerId] as User,
+            lastMessage: c.lastMessage ?? undefined,
+            unreadCount: c.unreadCount,
+            timestamp: c.lastMessageAt ? new Date(c.lastMessageAt).getTime() : 0
+        })).sort((a, b) => {
             // Sort contacts by most recent message, then alphabetical
             if (b.timestamp !== a.timestamp) return b.timestamp - a.timestamp;
             return a.user.name.localeCompare(b.user.name);
@@ -104,7 +106,7 @@ export const MessagesPage: React.FC<MessagesPageProps> = ({ currentUser, users,
             contact.user.name.toLowerCase().includes(searchQuery.toLowerCase()) ||
             contact.user.email?.toLowerCase().includes(searchQuery.toLowerCase())
         );
-    }, [users, directMessages, currentUser.id, searchQuery]);
+    }, [users, conversations, currentUser.id, searchQuery]);
 
     useEffect(() => {
         if (initialPartnerId) {
@@ -116,12 +118,56 @@ export const MessagesPage: React.FC<MessagesPageProps> = ({ currentUser, users,
         }
     }, [initialPartnerId, selectedPartnerId, onNavigateToUser]); // Removed contacts from deps to prevent auto-switching on search
 
-    // Scroll to bottom
+    // Load the open conversation's latest page and keep it fresh; older pages load on demand
+    useEffect(() => {
+        if (!selectedPartnerId) return;
+        let cancelled = false;
+        let isFirstPage = true;
+        setConversationMessages([]);
+        setOlderCursor(null);
+        const fetchLatest = async () => {
+            try {
+                const page = await messageService.fetchConversationMessages(selectedPartnerId);
+                if (cancelled) return;
+                setConversationMessages(prev => mergeMessages(prev, page.messages));
+                if (isFirstPage) {
+                    setOlderCursor(page.nextCursor);
+                    isFirstPage = false;
+                }
+            } catch (err) {
+                // no conversation with this partner yet; it starts with the first message sent
+            }
+        };
+        fetchLatest();
+        messageService.markConversationRead(selectedPartnerId).catch(() => { });
+        const intervalId = setInterval(fetchLatest, POLL_INTERVAL_MS);
+        return () => {
+            cancelled = true;
+            clearInterval(intervalId);
+        };
+    }, [selectedPartnerId]);
+
+    const handleLoadOlder = async () => {
+        if (!selectedPartnerId || !olderCursor) return;
+        setIsLoadingOlder(true);
+        try {
+            const page = await messageService.fetchConversationMessages(selectedPartnerId, olderCursor);
+            setConversationMessages(prev => mergeMessages(prev, page.messages));
+            setOlderCursor(page.nextCursor);
+        } catch (err) {
+            console.error("Failed to load older messages:", err);
+        } finally {
+            setIsLoadingOlder(false);
+        }
+    };
+
+    // Scroll to bottom when a newer message arrives (not when older ones are loaded)
+    const latestMessageId = conversationMessages[conversationMessages.length - 1]?.id;
     useEffect(() => {
         if (selectedPartnerId) {
             messagesEndRef.current?.scrollIntoView({ behavior: 'smooth' });
         }
-    }, [directMessages, selectedPartnerId]);
+    }, [latestMessageId, selectedPartnerId]);
 
     const handleSendMessage = () => {
         if (!newMessage.trim() && selectedFiles.length === 0 || !selectedPartnerId) return;
@@ -129,7 +175,12 @@ export const MessagesPage: React.FC<MessagesPageProps> = ({ currentUser, users,
         const parentId = replyingToMessage?.id;
 
         const files = Array.from(selectedFiles);
-        onSendMessage(selectedPartnerId!, newMessage.trim(), files, parentId);
+        const partnerId = selectedPartnerId;
+        onSendMessage(partnerId, newMessage.trim(), files, parentId).then(sent => {
+            if (sent && sent.receiverId === partnerId) {
+                setConversationMessages(prev => mergeMessages(prev, [sent]));
+            }
+        });
         setNewMessage('');
         setSelectedFiles([]);
         setReplyingToMessage(null);
@@ -184,19 +235,12 @@ export const MessagesPage: React.FC<MessagesPageProps> = ({ currentUser, users,
         }
     };
 
-    const getParentMessageSnippet = (parentId: string | undefined): DirectMessage | undefined => {
-        if (!parentId) return undefined;
-        return directMessages.find(msg => msg.id === parentId);
+    const getParentMessageSnippet = (replyTo: DirectMessage['replyTo']) => {
+        if (!replyTo) return undefined;
+        // the parent may be on an older page that is not loaded
+        return conversationMessages.find(msg => msg.id === replyTo.id) ?? replyTo;
     };
 
-    const conversationMessages = useMemo(() => {
-        if (!selectedPartnerId) return [];
-        return directMessages.filter(
-            dm => (dm.senderId === currentUser.id && dm.receiverId === selectedPartnerId) ||
-                (dm.senderId === selectedPartnerId && dm.receiverId === currentUser.id)
-        ).sort((a, b) => new Date(a.timestamp).getTime() - new Date(b.timestamp).getTime());
-    }, [directMessages, currentUser.id, selectedPartnerId]);
-
     const selectedPartner = selectedPartnerId ? (users[selectedPartnerId] as User) : null;
 
     const handleStartNewConversation = (partnerId: string) => {
@@ -244,7 +288,7 @@ export const MessagesPage: React.FC<MessagesPageProps> = ({ currentUser, users,
 
                 {/* Contacts List */}
                 <div className="flex-1 overflow-y-auto custom-scrollbar p-2 space-y-1">
-                    {contacts.map(({ user, lastMessage }) => lastMessage && (
+                    {contacts.map(({ user, lastMessage, unreadCount }) => lastMessage && (
                         <button
                             key={user.id}
                             onClick={() => { setSelectedPartnerId(user.id); onNavigateToUser(user.id); }}
@@ -255,6 +299,11 @@ export const MessagesPage: React.FC<MessagesPageProps> = ({ currentUser, users,
                         >
                             <div className="relative flex-shrink-0">
                                 <Avatar user={user} className={`h-10 w-10 ring-2 ${selectedPartnerId === user.id ? 'ring-brand-200 dark:ring-brand-800' : 'ring-transparent'}`} />
+                                {unreadCount > 0 && selectedPartnerId !== user.id && (
+                                    <span className="absolute -top-1 -right-1 min-w-[18px] h-[18px] px-1 rounded-full bg-brand-600 text-white text-[10px] font-bold flex items-center justify-center">
+                                        {unreadCount}
+                                    </span>
+                                )}
                             </div>
                             {!isUserListCollapsed && (
                                 <div className="flex-1 min-w-0 text-left">
@@ -330,6 +379,17 @@ export const MessagesPage: React.FC<MessagesPageProps> = ({ currentUser, users,
 
                         {/* Messages Feed */}
                         <div className="flex-1 overflow-y-auto p-4 sm:p-6 space-y-6 custom-scrollbar bg-brand-100/25 dark:bg-gray-900/50">
+                            {olderCursor && (
+                                <div className="flex justify-center">
+                                    <button
+                                        onClick={handleLoadOlder}
+                                        disabled={isLoadingOlder}
+                                        className="text-xs font-medium text-brand-600 dark:text-brand-400 hover:underline disabled:opacity-50"
+                                    >
+                                        {isLoadingOlder ? 'Loading...' : 'Load older messages'}
+                                    </button>
+                                </div>
+                            )}
                             {conversationMessages.length === 0 ? (
                                 <div className="h-full flex flex-col items-center justify-center text-center opacity-60">
                                     <Avatar user={selectedPartner} className="h-20 w-20 mb-4 ring-8 ring-gray-100 dark:ring-gray-800" />
@@ -339,7 +399,7 @@ export const MessagesPage: React.FC<MessagesPageProps> = ({ currentUser, users,
                             ) : (
                                 conversationMessages.map((msg, index) => {
                                     const isCurrentUser = msg.senderId === currentUser.id;
-                                    const parentMessage = getParentMessageSnippet(msg.replyTo?.id);
+                                    const parentMessage = getParentMessageSnippet(msg.replyTo);
                                     const formattedTime = new Date(msg.timestamp).toLocaleTimeString([], { hour: '2-digit', minute: '2-digit' });
 
                                     // Date Separator Logic
@@ -14,6 +14,7 @@ import { arrayMove, SortableContext, horizontalListSortingStrategy } from '@dnd-
 import { Columns, Calendar as CalendarIcon, PieChart, List, Info, Filter, ChevronDown, LayoutGrid, Plus } from 'lucide-react';
 
 import type { Project, User, Task, Team, Attachment, Comment, Subtask } from '@/types';
+import { projectService } from '@/services';
 import { KanbanBoard, KanbanColumn, KanbanTask, TaskModal, TasksListView } from '@/components/features/tasks';
 import { ConfirmationModal, CreateTaskModal } from '@components/modals';
 import { ProjectStats, ProjectInfo, ProjectFilters } from '@/components/features/projects';
@@ -66,6 +67,8 @@ const ProjectPage: React.FC<ProjectPageProps> = ({ project, team, currentUser, o
     const [selectedTask, setSelectedTask] = useState<Task | null>(null);
     const [isCreateTaskModalOpen, setCreateTaskModalOpen] = useState(false);
     const [columnForNewTask, setColumnForNewTask] = useState<string | null>(null);
+    // the project's tags, most used first, for the create-task suggestions
+    const [projectTags, setProjectTags] = useState<string[] | null>(null);
 
     const [chatWidth, setChatWidth] = useState(() => {
         const saved = localStorage.getItem("chatSidebarWidth");
@@ -97,6 +100,16 @@ const ProjectPage: React.FC<ProjectPageProps> = ({ project, team, currentUser, o
     });
     const [sortBy, setSortBy] = useState<string>('manual');
 
+    useEffect(() => {
+        if (!isCreateTaskModalOpen) return;
+        let cancelled = false;
+        setProjectTags(null);
+        projectService.tags(project.id)
+            .then(({ tags }) => { if (!cancelled) setProjectTags(tags.map(tag => tag.name)); })
+            .catch(() => { if (!cancelled) setProjectTags(null); });
+        return () => { cancelled = true; };
+    }, [isCreateTaskModalOpen, project.id]);
+
     useEffect(() => {
         setTasks(project.tasks);
         setColumns(project.columns);
@@ -695,7 +708,7 @@ const ProjectPage: React.FC<ProjectPageProps> = ({ project, team, currentUser, o
                     columnId={columnForNewTask}
                     projectMembers={projectMembers}
                     onUploadAttachment={handleUploadAttachment}
-                    allTags={Array.from(new Set(Object.values(tasks).flatMap((task: Task) => task.tags)))}
+                    allTags={projectTags ?? Array.from(new Set(Object.values(tasks).flatMap((task: Task) => task.tags)))}
                 />
             )}
 
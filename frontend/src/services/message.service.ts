@@ -2,12 +2,33 @@
  * Message Service
  */
 
-import type { DirectMessage } from '@/types';
+import type { ChatMessage, Conversation, DirectMessage, DirectMessagesPage } from '@/types';
 import { apiRequest, getAuthToken } from './http';
 
 const API_BASE_URL = import.meta.env.VITE_API_URL + "/api";
 
 export const messageService = {
+    fetchChatMessages: (projectId: string, before?: string, limit = 50): Promise<{ messages: ChatMessage[], nextCursor: string | null }> => {
+        const params = new URLSearchParams({ limit: String(limit) });
+        if (before) {
+            params.set('before', before);
+        }
+        return apiRequest(`/projects/${projectId}/chatmessages/?${params}`);
+    },
+
+    // A DM thread, newest page first; pass nextCursor back as `before` for older messages
+    fetchConversationMessages: (partnerId: string, before?: string, limit = 50): Promise<DirectMessagesPage> => {
+        const params = new URLSearchParams({ limit: String(limit) });
+        if (before) {
+            params.set('before', before);
+        }
+        return apiRequest(`/conversations/${partnerId}/messages/?${params}`);
+    },
+
+    markConversationRead: (partnerId: string): Promise<Conversation> => {
+        return apiRequest(`/conversations/${partnerId}/read/`, { method: 'POST' });
+    },
+
     sendDirectMessage: async (receiverId: string, content: string, attachments?: File[], parentId?: string): Promise<DirectMessage> => {
         const formData = new FormData();
 
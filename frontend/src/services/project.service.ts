@@ -21,6 +21,12 @@ export const projectService = {
         });
     },
 
+    // Tag usage, most used first; `q` filters by prefix for autocomplete
+    tags: (projectId: string, q?: string): Promise<{ tags: { name: string; taskCount: number }[] }> => {
+        const query = q ? `?q=${encodeURIComponent(q)}` : '';
+        return apiRequest(`/projects/${projectId}/tags/${query}`);
+    },
+
     delete: (projectId: string): Promise<void> => {
         return apiRequest<void>(`/projects/${projectId}/`, {
             method: 'DELETE',
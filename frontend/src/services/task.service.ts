@@ -2,7 +2,7 @@
  * Task Service
  */
 
-import type { Task, Column } from '@/types';
+import type { CalendarEntry, ColumnTasksPage, Task, TaskMove } from '@/types';
 import { apiRequest, uploadFile } from './http';
 
 export const taskService = {
@@ -28,16 +28,42 @@ export const taskService = {
         });
     },
 
-    move: (taskId: string, toColumnId: string, position: number): Promise<{ columns: { [key: string]: Column } }> => {
-        return apiRequest<{ columns: { [key: string]: Column } }>(`/tasks/${taskId}/move/`, {
+    move: (taskId: string, toColumnId: string, position: number, expectedVersion?: number): Promise<TaskMove> => {
+        return apiRequest<TaskMove>(`/tasks/${taskId}/move/`, {
             method: 'PATCH',
             body: JSON.stringify({
                 toColumnId,
-                position
+                position,
+                expectedVersion
             }),
         });
     },
 
+    archive: (taskId: string): Promise<Task> => {
+        return apiRequest<Task>(`/tasks/${taskId}/archive/`, { method: 'POST' });
+    },
+
+    restore: (taskId: string): Promise<Task & TaskMove> => {
+        return apiRequest<Task & TaskMove>(`/tasks/${taskId}/restore/`, { method: 'POST' });
+    },
+
+    // Tasks due between two ISO dates/datetimes across the user's projects (lean projection)
+    calendar: (start: string, end: string, teamIds?: string[]): Promise<{ tasks: CalendarEntry[] }> => {
+        const query = new URLSearchParams({ start, end });
+        if (teamIds?.length) query.set('teams', teamIds.join(','));
+        return apiRequest<{ tasks: CalendarEntry[] }>(`/tasks/calendar/?${query.toString()}`);
+    },
+
+    // Search archived tasks, most recently archived first
+    archived: (params: { projectId?: string; q?: string; cursor?: string | null } = {}): Promise<ColumnTasksPage> => {
+        const query = new URLSearchParams();
+        if (params.projectId) query.set('project', params.projectId);
+        if (params.q) query.set('q', params.q);
+        if (params.cursor) query.set('cursor', params.cursor);
+        const qs = query.toString();
+        return apiRequest<ColumnTasksPage>(`/tasks/archived/${qs ? `?${qs}` : ''}`);
+    },
+
     delete: (taskId: string): Promise<void> => {
         return apiRequest<void>(`/tasks/${taskId}/`, {
             method: 'DELETE',
@@ -2,7 +2,7 @@
  * User Service
  */
 
-import type { Project, Team, User } from '@/types';
+import type { Conversation, Project, Team, User } from '@/types';
 import { apiRequest, getAuthToken } from './http';
 import { API_BASE_URL } from '@/utils/constants';
 
@@ -46,7 +46,7 @@ export const userService = {
         users: { [key: string]: any };
         teams: { [key: string]: Team };
         projects: { [key: string]: Project };
-        directMessages: { [key: string]: any };
+        conversations: { [partnerId: string]: Conversation };
         notifications: any[];
         folders?: { [key: string]: any };
     }> => {
@@ -50,6 +50,20 @@ export interface Task {
   subtasks: Subtask[];
   createdAt: string;
   updatedAt: string; // New: Added updatedAt field
+  columnId?: string | null;
+  positionVersion?: number; // bumped on every move, sent back as expectedVersion
+  completedAt?: string | null;
+  archived?: boolean; // archived tasks are off the board, see taskService.archived
+  archivedAt?: string | null;
+}
+
+// Response of PATCH /tasks/{id}/move/: only what the move changed
+export interface TaskMove {
+  taskId: string;
+  fromColumnId: string | null;
+  columnId: string | null;
+  position: number;
+  positionVersion: number;
 }
 
 export interface Column {
@@ -58,6 +72,19 @@ export interface Column {
   taskIds: string[];
 }
 
+// Item of GET /tasks/calendar/
+export interface CalendarEntry extends Pick<Task, 'id' | 'title' | 'dueDate' | 'priority' | 'completed' | 'assignees'> {
+  projectId: string;
+  projectName: string;
+  teamId: string;
+}
+
+// Response of GET /tasks/archived/
+export interface ColumnTasksPage {
+  tasks: Task[];
+  nextCursor: string | null;
+}
+
 export interface ChatMessage {
   id: string;
   projectId: string;
@@ -112,4 +139,19 @@ export interface DirectMessage {
     timestamp: string;
     senderId: string;
   };
+}
+
+// Entry of the DM inbox (the "conversations" section of /data/), keyed by partnerId
+export interface Conversation {
+  id: string;
+  partnerId: string;
+  lastMessage: DirectMessage | null;
+  lastMessageAt: string | null;
+  unreadCount: number;
+}
+
+// Response of GET /conversations/{partnerId}/messages/: oldest first
+export interface DirectMessagesPage {
+  messages: DirectMessage[];
+  nextCursor: string | null;
 }
\ No newline at end of file